@@ -0,0 +1,121 @@
+"""Measure event dispatch throughput by replaying a frame recording.
+
+Without `--file`, a synthetic recording is generated for the appliances of the
+test data. Run from the repository root with `python -m benchmarks.event_replay`.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+from pathlib import Path
+
+import aiohttp
+
+from whirlpool.appliancesmanager import AppliancesManager, parse_appliance_info
+from whirlpool.attributestore import AttributeChange
+from whirlpool.auth import Auth
+from whirlpool.backendselector import BackendSelector
+from whirlpool.eventrecorder import FrameRecorder
+from whirlpool.stomp import encode_frame
+from whirlpool.types import Brand, Region
+
+DATA_DIR = Path(__file__).parent.parent / "tests" / "data"
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-f", "--file", help="Frame recording to replay", type=Path)
+parser.add_argument("-n", "--number", help="Synthetic events", type=int, default=50000)
+parser.add_argument(
+    "--speed",
+    help="Replay speed (1 is real time), default as fast as possible",
+    type=float,
+)
+args = parser.parse_args()
+
+
+class ChangeCounter:
+    """Attribute change callbacks, like an integration registers them"""
+
+    def __init__(self):
+        self.changes = 0
+        self.notifications = 0
+
+    def on_change(self, change: AttributeChange):
+        self.changes += 1
+
+    def on_update(self):
+        self.notifications += 1
+
+
+def add_test_appliances(manager: AppliancesManager, counter: ChangeCounter):
+    owned = json.loads((DATA_DIR / "owned_appliances.json").read_text())
+    shared = json.loads((DATA_DIR / "shared_appliances.json").read_text())
+    mock_data = json.loads((DATA_DIR / "mock_data.json").read_text())
+    infos = [
+        parse_appliance_info(appliance)
+        for location in owned.values()
+        for appliance in [*location["legacyAppliance"], *location["tsAppliance"]]
+    ] + [
+        parse_appliance_info(appliance)
+        for location in shared["sharedAppliances"]
+        for appliance in location["appliances"]
+    ]
+    for info in infos:
+        if not manager._add_appliance(info):
+            continue
+        appliance = manager.all_appliances[info.said]
+        # Events only change attributes the appliance already has
+        if info.said in mock_data:
+            appliance.load_attributes(mock_data[info.said]["attributes"])
+        appliance.register_attr_change_callback("", counter.on_change, prefix=True)
+        appliance.register_attr_callback(counter.on_update)
+
+
+def write_synthetic_recording(path: Path, number: int):
+    mock_data = json.loads((DATA_DIR / "mock_data.json").read_text())
+    attribute_names = {
+        said: list(data["attributes"]) for said, data in mock_data.items()
+    }
+    saids = list(attribute_names)
+    with FrameRecorder(path) as recorder:
+        for i in range(number):
+            said = random.choice(saids)
+            names = random.sample(attribute_names[said], 3)
+            body = json.dumps(
+                {
+                    "said": said,
+                    "attributeMap": {name: str(i % 10) for name in names},
+                    "timestamp": 1700000000000 + i,
+                }
+            )
+            frame = encode_frame("MESSAGE", {"destination": f"/topic/{said}"}, body)
+            recorder.record(frame, received=1700000000 + i / 1000)
+
+
+async def main():
+    async with aiohttp.ClientSession() as session:
+        backend_selector = BackendSelector(Brand.Whirlpool, Region.EU)
+        auth = Auth(backend_selector, "email", "password", session)
+        manager = AppliancesManager(backend_selector, auth, session)
+        counter = ChangeCounter()
+        add_test_appliances(manager, counter)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = args.file
+            if path is None:
+                path = Path(tmp_dir) / "frames.bin"
+                write_synthetic_recording(path, args.number)
+
+            result = await manager.replay_events(path, args.speed)
+
+    print(f"Appliances: {len(manager.all_appliances)}")
+    print(f"Frames: {result.frames}, events: {result.events}")
+    print(
+        f"Attribute changes: {counter.changes}, "
+        f"callback notifications: {counter.notifications}"
+    )
+    print(f"Elapsed: {result.elapsed:.3f} s ({result.events_per_second:,.0f} events/s)")
+
+
+asyncio.run(main())
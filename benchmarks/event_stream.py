@@ -0,0 +1,79 @@
+"""Measure event socket throughput against the local event server.
+
+Run from the repository root with `python -m benchmarks.event_stream`.
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+from whirlpool import jsoncodec
+from whirlpool.auth import Auth
+from whirlpool.backendselector import BackendSelector
+from whirlpool.eventdispatcher import EventDispatcher
+from whirlpool.eventserver import EventServer
+from whirlpool.eventsocket import EventSocket
+from whirlpool.metrics import Histogram
+from whirlpool.types import Brand, Region
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--fleet", help="Number of appliances", type=int, default=100)
+parser.add_argument("--rate", help="Events per second", type=float, default=5000)
+parser.add_argument("--duration", help="Seconds to run", type=float, default=5)
+args = parser.parse_args()
+
+
+async def main():
+    saids = [f"SAID{i:05d}" for i in range(args.fleet)]
+    lag = Histogram()
+
+    def handle_event(msg: str, received_at: float):
+        event = jsoncodec.loads(msg)
+        lag.observe(max(0.0, received_at - event["timestamp"] / 1000))
+
+    async with EventServer() as server, aiohttp.ClientSession() as session:
+        auth = Auth(BackendSelector(Brand.Whirlpool, Region.EU), "", "", session)
+        auth._auth_dict = {"access_token": "token", "expire_date": time.time() + 3600}
+        dispatcher = EventDispatcher(handle_event)
+        dispatcher.start()
+        connected = asyncio.Event()
+
+        async def on_connected():
+            connected.set()
+
+        event_socket = EventSocket(
+            server.url, auth, saids, dispatcher.put, on_connected, session
+        )
+        event_socket.start()
+        await connected.wait()
+        while event_socket.subscribe_latency is None:
+            await asyncio.sleep(0.01)
+
+        start = time.monotonic()
+        server.start_events(args.rate, saids)
+        await asyncio.sleep(args.duration)
+        await server.stop_events()
+        await dispatcher.join()
+        elapsed = time.monotonic() - start
+
+        await event_socket.stop()
+        await dispatcher.stop()
+
+    socket_metrics = event_socket.metrics
+    print(f"Fleet: {args.fleet}, target rate: {args.rate:,.0f} events/s")
+    print(f"Subscribed in {event_socket.subscribe_latency * 1000:.1f} ms")
+    print(
+        f"Events: sent {server.stats.events_sent}, received {socket_metrics.events}"
+        f" ({socket_metrics.events / elapsed:,.0f} events/s)"
+    )
+    print(
+        f"Parse: mean {socket_metrics.parse_time.mean * 1e6:.1f} us,"
+        f" dispatch: mean {dispatcher.metrics.dispatch_time.mean * 1e6:.1f} us,"
+        f" max queue depth {dispatcher.metrics.max_depth}"
+    )
+    print(f"Lag: mean {lag.mean * 1000:.1f} ms, p99 <= {lag.percentile(99):.2f} s")
+
+
+asyncio.run(main())
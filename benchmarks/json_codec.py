@@ -0,0 +1,40 @@
+"""Compare the available JSON codecs on the oven data payload.
+
+Run from the repository root with `python -m benchmarks.json_codec`.
+"""
+
+import argparse
+import timeit
+from functools import partial
+from pathlib import Path
+
+from whirlpool.jsoncodec import CODEC_FACTORIES
+
+PAYLOAD_FILE = Path(__file__).parent.parent / "tests" / "data" / "oven_data.json"
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--number", help="Iterations", type=int, default=1000)
+args = parser.parse_args()
+
+
+def main():
+    raw = PAYLOAD_FILE.read_bytes()
+    print(f"Payload: {PAYLOAD_FILE.name} ({len(raw) / 1024:.1f} KiB)")
+
+    for name, factory in CODEC_FACTORIES.items():
+        try:
+            codec = factory()
+        except ImportError:
+            print(f"{name:>8}: not installed")
+            continue
+
+        obj = codec.loads(raw)
+        loads_time = timeit.timeit(partial(codec.loads, raw), number=args.number)
+        dumps_time = timeit.timeit(partial(codec.dumps, obj), number=args.number)
+        print(
+            f"{name:>8}: loads {loads_time / args.number * 1e6:8.1f} us"
+            f"  dumps {dumps_time / args.number * 1e6:8.1f} us"
+        )
+
+
+main()
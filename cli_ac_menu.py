@@ -89,7 +89,7 @@ async def show_aircon_menu(ac: Aircon) -> None:
             await ac.fetch_data()
             print_status(ac)
         elif choice == "v":
-            print(json.dumps(ac._data_dict, indent=4))
+            print(json.dumps(ac._attributes.to_dict(), indent=4))
         elif choice == "c":
             cmd = await aioconsole.ainput("Command: ")
             val = await aioconsole.ainput("Value: ")
@@ -62,7 +62,7 @@ async def show_dryer_menu(dr: Dryer) -> None:
             await dr.fetch_data()
             print_status(dr)
         elif choice == "v":
-            print(json.dumps(dr._data_dict, indent=4))
+            print(json.dumps(dr._attributes.to_dict(), indent=4))
         elif choice == "c":
             cmd = await aioconsole.ainput("Command: ")
             val = await aioconsole.ainput("Value: ")
@@ -124,7 +124,7 @@ async def show_oven_menu(ov: Oven) -> None:
             await ov.fetch_data()
             print_status(ov)
         elif choice == "v":
-            print(json.dumps(ov._data_dict, indent=4))
+            print(json.dumps(ov._attributes.to_dict(), indent=4))
         elif choice == "c":
             cmd = await aioconsole.ainput("Command: ")
             val = await aioconsole.ainput("Value: ")
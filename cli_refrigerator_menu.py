@@ -59,7 +59,7 @@ async def show_refrigerator_menu(rf: Refrigerator) -> None:
             await rf.fetch_data()
             print_status(rf)
         elif choice == "r":
-            print(json.dumps(rf._data_dict, indent=4))
+            print(json.dumps(rf._attributes.to_dict(), indent=4))
         elif choice == "c":
             cmd = await aioconsole.ainput("Command: ")
             val = await aioconsole.ainput("Value: ")
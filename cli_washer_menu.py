@@ -42,7 +42,7 @@ async def show_washer_menu(wr: Washer) -> None:
             await wr.fetch_data()
             print_status(wr)
         elif choice == "v":
-            print(json.dumps(wr._data_dict, indent=4))
+            print(json.dumps(wr._attributes.to_dict(), indent=4))
         elif choice == "c":
             cmd = await aioconsole.ainput("Command: ")
             val = await aioconsole.ainput("Value: ")
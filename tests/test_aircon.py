@@ -1,3 +1,4 @@
+import asyncio
 from collections.abc import Callable
 from typing import Any
 
@@ -7,6 +8,7 @@ from yarl import URL
 
 from whirlpool.aircon import Aircon, FanSpeed, Mode
 from whirlpool.appliancesmanager import AppliancesManager
+from whirlpool.attributestore import AttributeChange
 from whirlpool.auth import Auth
 from whirlpool.backendselector import BackendSelector
 
@@ -116,3 +118,65 @@ async def test_setters_invalid_arg(
         await method(aircon, argument)
 
     assert message in str(exc_info.value)
+
+
+async def test_attr_change_callbacks(appliances_manager: AppliancesManager):
+    aircon = appliances_manager.aircons[0]
+    exact_changes: list[AttributeChange] = []
+    prefix_changes: list[AttributeChange] = []
+    updates: list[None] = []
+
+    aircon.register_attr_change_callback("Sys_OpSetPowerOn", exact_changes.append)
+    aircon.register_attr_change_callback("Cavity_", prefix_changes.append, prefix=True)
+    aircon.register_attr_callback(lambda: updates.append(None))
+
+    # no value changes, so no callbacks fire
+    aircon.update_attributes({"Sys_OpSetPowerOn": "0", "Cavity_OpSetMode": "3"}, 1)
+    assert not exact_changes and not prefix_changes and not updates
+
+    aircon.update_attributes({"Sys_OpSetPowerOn": "1", "Cavity_OpSetMode": "1"}, 2)
+    assert exact_changes == [AttributeChange("Sys_OpSetPowerOn", "0", "1", 2)]
+    assert prefix_changes == [AttributeChange("Cavity_OpSetMode", "3", "1", 2)]
+    assert len(updates) == 1
+
+    aircon.unregister_attr_change_callback("Sys_OpSetPowerOn", exact_changes.append)
+    aircon.update_attributes({"Sys_OpSetPowerOn": "0"}, 3)
+    assert len(exact_changes) == 1
+    assert len(updates) == 2
+
+
+async def test_setters_coalesced(
+    appliances_manager: AppliancesManager,
+    auth: Auth,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+):
+    aircon = appliances_manager.aircons[0]
+    aircon.command_coalesce_window = 0.01
+    url = backend_selector.appliance_command_url
+    aiointercept_mock.post(url)
+
+    results = await asyncio.gather(
+        aircon.set_power_on(True),
+        aircon.set_mode(Mode.Cool),
+        aircon.set_temp(22),
+        aircon.set_fanspeed(FanSpeed.Auto),
+    )
+
+    assert results == [True, True, True, True]
+    aiointercept_mock.assert_called_with(
+        url=url,
+        method="POST",
+        data=None,
+        json={
+            "body": {
+                "Sys_OpSetPowerOn": "1",
+                "Cavity_OpSetMode": "1",
+                "Sys_OpSetTargetTemp": "220",
+                "Cavity_OpSetFanSpeed": "1",
+            },
+            "header": {"said": aircon.said, "command": "setAttributes"},
+        },
+        headers=auth.create_headers(),
+    )
+    assert len(aiointercept_mock.requests[("POST", URL(url))]) == 1
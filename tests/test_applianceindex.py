@@ -0,0 +1,76 @@
+from whirlpool.aircon import Aircon
+from whirlpool.appliancesmanager import AppliancesManager
+from whirlpool.types import ApplianceInfo
+
+
+def test_index_groups_appliances(appliances_manager: AppliancesManager):
+    index = appliances_manager.appliance_index
+
+    assert set(index.by_type(Aircon)) == {"SAIDAIRCON1", "SAIDAIRCON2"}
+    assert set(index.by_category("FabricCare")) == {"SAIDWASHER1", "SAIDDRYER1"}
+    assert set(index.by_data_model("airconditioner")) == {
+        "SAIDAIRCON1",
+        "SAIDAIRCON2",
+    }
+    assert set(index.by_model_number("WTW8127LW1")) == {"SAIDWASHER1"}
+    assert set(index.by_online(False)) == {"SAIDAIRCON1", "SAIDFRIDGE1"}
+    assert len(index.by_online(True)) == len(index) - 2
+    assert index.by_category("Unknown") == {}
+
+
+def test_views_are_cached_and_read_only(appliances_manager: AppliancesManager):
+    index = appliances_manager.appliance_index
+
+    assert index.typed_list(Aircon) is index.typed_list(Aircon)
+    appliances_manager.aircons.clear()
+    assert len(appliances_manager.aircons) == 2
+    assert index.by_category("Climate") is index.by_category("Climate")
+    assert appliances_manager.all_appliances is appliances_manager.all_appliances
+    assert not hasattr(appliances_manager.all_appliances, "__setitem__")
+
+
+def test_index_follows_online_changes(appliances_manager: AppliancesManager):
+    index = appliances_manager.appliance_index
+    aircon = appliances_manager.all_appliances["SAIDAIRCON1"]
+
+    aircon.update_attributes({"Online": "1"}, 1)
+
+    assert "SAIDAIRCON1" in index.by_online(True)
+    assert "SAIDAIRCON1" not in index.by_online(False)
+
+
+def test_index_follows_added_removed_and_changed_appliances(
+    appliances_manager: AppliancesManager,
+):
+    index = appliances_manager.appliance_index
+    aircons = appliances_manager.aircons
+    aircon = appliances_manager.all_appliances["SAIDAIRCON2"]
+
+    appliances_manager._remove_appliance("SAIDAIRCON1")
+    appliances_manager._update_appliance(
+        aircon,
+        ApplianceInfo(
+            "SAIDAIRCON2", "Aircon", "airconditioner", "Bedroom", "WAC1234XX3", ""
+        ),
+    )
+    appliances_manager._add_appliance(
+        ApplianceInfo(
+            "SAIDAIRCON3", "Aircon", "airconditioner", "Climate", "WAC1234XX4", ""
+        )
+    )
+
+    assert [a.said for a in aircons] == ["SAIDAIRCON1", "SAIDAIRCON2"]
+    assert [a.said for a in appliances_manager.aircons] == [
+        "SAIDAIRCON2",
+        "SAIDAIRCON3",
+    ]
+    assert set(index.by_category("Bedroom")) == {"SAIDAIRCON2"}
+    assert set(index.by_model_number("WAC1234XX4")) == {"SAIDAIRCON3"}
+    assert index.by_model_number("WAC1234XX2") == {}
+    assert set(index.by_online(None)) == {"SAIDAIRCON3"}
+    assert "SAIDAIRCON1" not in index.by_online(False)
+
+    # Removed appliances no longer move between online groups
+    appliances_manager._remove_appliance("SAIDAIRCON2")
+    aircon.update_attributes({"Online": "0"}, 2)
+    assert "SAIDAIRCON2" not in index.by_online(False)
@@ -0,0 +1,80 @@
+import aiohttp
+import pytest
+
+from whirlpool.aircon import Aircon
+from whirlpool.applianceregistry import ApplianceRegistry, create_default_registry
+from whirlpool.appliancesmanager import AppliancesManager
+from whirlpool.auth import Auth
+from whirlpool.backendselector import BackendSelector
+from whirlpool.dryer import Dryer
+from whirlpool.oven import Oven
+from whirlpool.refrigerator import Refrigerator
+from whirlpool.types import ApplianceInfo
+from whirlpool.washer import Washer
+
+
+class Dishwasher(Washer):
+    pass
+
+
+@pytest.mark.parametrize(
+    ("data_model", "expected"),
+    [
+        ("airconditioner", Aircon),
+        ("DDM_LAUNDRY_VMAX20_MAYTAG_DRYER_6_V1", Dryer),
+        ("DDM_LAUNDRY_VMAX20_WHIRLPOOL_WASHER8_V2", Washer),
+        ("DDM_COOKING_BIO_SELF_CLEAN_TOURMALINE_V2", Oven),
+        ("ddm_cooking_bio_self_clean_tourmaline_v2_extra", Oven),
+        ("ddm_ted_refrigerator_v12", Refrigerator),
+        ("ddm_unknown_appliance", None),
+    ],
+)
+def test_default_registry_classifies_data_models(
+    data_model: str, expected: type | None
+):
+    assert create_default_registry().classify(data_model) is expected
+
+
+def test_classify_is_cached_until_registration_changes():
+    registry = create_default_registry()
+    assert registry.classify("ddm_dishwasher_v1") is Washer
+
+    registry.register(Dishwasher, ["DDM_DISHWASHER_V1"])
+    assert registry.classify("ddm_dishwasher_v1") is Dishwasher
+    assert Dishwasher in registry.appliance_classes
+
+    registry.unregister(Dishwasher)
+    assert registry.classify("ddm_dishwasher_v1") is Washer
+    assert Dishwasher not in registry.appliance_classes
+
+
+def test_patterns_match_in_registration_order():
+    registry = ApplianceRegistry()
+    registry.register(Dishwasher, patterns=["dish"])
+    registry.register(Washer, patterns=["washer"])
+    assert registry.classify("ddm_dishwasher_v1") is Dishwasher
+    assert registry.classify("ddm_washer_v1") is Washer
+
+
+async def test_manager_uses_custom_registry(
+    backend_selector: BackendSelector,
+    auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+):
+    registry = create_default_registry()
+    registry.register(Dishwasher, ["ddm_dishwasher_v1"])
+    manager = AppliancesManager(
+        backend_selector, auth, client_session_fixture, appliance_registry=registry
+    )
+
+    assert manager._add_appliance(
+        ApplianceInfo(
+            "SAIDDISHWASHER1", "Dishwasher", "DDM_DISHWASHER_V1", "Dishwasher", "", ""
+        )
+    )
+
+    assert [a.said for a in manager.appliances_of_type(Dishwasher)] == [
+        "SAIDDISHWASHER1"
+    ]
+    assert manager.washers == []
+    assert "SAIDDISHWASHER1" in manager.all_appliances
@@ -1,13 +1,19 @@
 import asyncio
+import json
+import time
 
+import aiohttp
 import pytest
-from aiointercept import aiointercept
+from aiointercept import CallbackResult, aiointercept
+from pytest_mock import MockerFixture
 
-from tests import ACCOUNT_ID
+from tests import ACCOUNT_ID, DATA_DIR
 from whirlpool import appliancesmanager
-from whirlpool.appliancesmanager import AppliancesManager
+from whirlpool.appliancesmanager import AppliancesManager, KeepalivePolicy
 from whirlpool.auth import Auth
 from whirlpool.backendselector import BackendSelector
+from whirlpool.retrypolicy import RetryPolicy
+from whirlpool.types import ApplianceInfo
 
 
 @pytest.mark.usefixtures("appliances_manager")
@@ -34,9 +40,8 @@ async def test_keepalive_periodically_fetches_an_appliance(
     appliances_manager: AppliancesManager,
     backend_selector: BackendSelector,
     aiointercept_mock: aiointercept,
-    monkeypatch: pytest.MonkeyPatch,
 ):
-    monkeypatch.setattr(appliancesmanager, "KEEPALIVE_INTERVAL_SECONDS", 0.01)
+    appliances_manager._keepalive_policy = KeepalivePolicy(interval=0.01)
 
     mocks = {
         said: aiointercept_mock.get(
@@ -55,13 +60,63 @@ async def test_keepalive_periodically_fetches_an_appliance(
     assert kept_alive_mock.call_count > count_after_start
 
 
+async def test_keepalive_pings_the_account(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+    mocker: MockerFixture,
+):
+    appliances_manager._keepalive_policy = KeepalivePolicy(
+        interval=0.01, account_ping=True
+    )
+    mocker.patch.object(appliances_manager, "fetch_all_data")
+    ping_mock = aiointercept_mock.get(
+        backend_selector.user_details_url,
+        payload={"accountId": ACCOUNT_ID},
+        repeat=True,
+    )
+
+    await appliances_manager.stop_event_listener()
+    await appliances_manager.start_event_listener()
+
+    await asyncio.sleep(0.05)
+    assert ping_mock.call_count > 1
+
+
+async def test_keepalive_skips_requests_after_recent_activity(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+    mocker: MockerFixture,
+):
+    appliances_manager._keepalive_policy = KeepalivePolicy(
+        interval=0.2, account_ping=True
+    )
+    mocker.patch.object(appliances_manager, "fetch_all_data")
+    ping_mock = aiointercept_mock.get(
+        backend_selector.user_details_url,
+        payload={"accountId": ACCOUNT_ID},
+        repeat=True,
+    )
+    await appliances_manager.stop_event_listener()
+    await appliances_manager.start_event_listener()
+
+    for _ in range(3):
+        # A command sent for an appliance counts as activity on the account
+        appliances_manager.aircons[0].last_request_at = time.monotonic()
+        await asyncio.sleep(0.1)
+    assert ping_mock.call_count == 0
+
+    await asyncio.sleep(0.25)
+    assert ping_mock.call_count == 1
+
+
 async def test_keepalive_stops_with_event_listener(
     appliances_manager: AppliancesManager,
     backend_selector: BackendSelector,
     aiointercept_mock: aiointercept,
-    monkeypatch: pytest.MonkeyPatch,
 ):
-    monkeypatch.setattr(appliancesmanager, "KEEPALIVE_INTERVAL_SECONDS", 0.01)
+    appliances_manager._keepalive_policy = KeepalivePolicy(interval=0.01)
 
     mocks = {
         said: aiointercept_mock.get(
@@ -78,3 +133,384 @@ async def test_keepalive_stops_with_event_listener(
     count_after_stop = kept_alive_mock.call_count
     await asyncio.sleep(0.05)
     assert kept_alive_mock.call_count == count_after_stop
+
+
+async def test_fetch_all_data_reports_per_appliance_outcome(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+):
+    saids = list(appliances_manager.all_appliances)
+    failing_said, broken_said, *ok_saids = saids
+    for said in ok_saids:
+        aiointercept_mock.get(backend_selector.get_appliance_data_url(said), payload={})
+    aiointercept_mock.get(
+        backend_selector.get_appliance_data_url(failing_said), status=404
+    )
+    aiointercept_mock.get(
+        backend_selector.get_appliance_data_url(broken_said), exception=True
+    )
+    # fail on the first connection error instead of retrying
+    appliances_manager.all_appliances[broken_said]._retry_policy = RetryPolicy(
+        attempts=1
+    )
+
+    result = await appliances_manager.fetch_all_data(concurrency=2)
+
+    assert not result.success
+    assert result.results == {
+        failing_said: False,
+        broken_said: False,
+        **dict.fromkeys(ok_saids, True),
+    }
+    assert list(result.errors) == [broken_said]
+    assert result.elapsed > 0
+
+
+async def test_fetch_all_data_respects_concurrency_limit(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def slow_response(url, **kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return CallbackResult(payload={})
+
+    for said in appliances_manager.all_appliances:
+        aiointercept_mock.get(
+            backend_selector.get_appliance_data_url(said), callback=slow_response
+        )
+
+    result = await appliances_manager.fetch_all_data(concurrency=3)
+
+    assert result.success
+    assert max_in_flight == 3
+
+
+async def test_events_are_dispatched_off_the_read_loop(
+    appliances_manager: AppliancesManager,
+):
+    aircon = appliances_manager.aircons[0]
+    event = {
+        "said": aircon.said,
+        "attributeMap": {"Online": "0"},
+        "timestamp": 1,
+    }
+
+    await appliances_manager._event_dispatcher.put(json.dumps(event))
+    await appliances_manager._event_dispatcher.join()
+
+    assert not aircon.get_online()
+    assert appliances_manager.dispatch_metrics.dispatched == 1
+
+
+def test_event_socket_shard_is_stable_and_balanced():
+    saids = [f"WPR{i:05d}" for i in range(1000)]
+    shards = [appliancesmanager.event_socket_shard(said, 4) for said in saids]
+    assert shards == [appliancesmanager.event_socket_shard(said, 4) for said in saids]
+    assert all(200 < shards.count(shard) < 300 for shard in range(4))
+
+
+async def test_event_sockets_are_sharded(
+    appliances_manager: AppliancesManager, mocker: MockerFixture
+):
+    event_socket = mocker.patch.object(appliancesmanager, "EventSocket", autospec=True)
+    mocker.patch.object(appliances_manager, "fetch_all_data")
+    await appliances_manager.stop_event_listener()
+    appliances_manager._event_socket_shards = 2
+
+    await appliances_manager.start_event_listener()
+
+    shard_saids = [call.args[2] for call in event_socket.call_args_list]
+    assert sorted(said for saids in shard_saids for said in saids) == sorted(
+        appliances_manager.all_appliances
+    )
+    for saids in shard_saids:
+        assert (
+            len({appliancesmanager.event_socket_shard(said, 2) for said in saids}) == 1
+        )
+    assert len(appliances_manager._event_sockets) == len(shard_saids) == 2
+
+
+async def test_fetch_appliances_updates_live_subscriptions(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+    mocker: MockerFixture,
+):
+    event_socket = mocker.patch.object(appliancesmanager, "EventSocket", autospec=True)
+    mocker.patch.object(appliances_manager, "fetch_all_data")
+    fetch_data_for = mocker.patch.object(appliances_manager, "fetch_data_for")
+    await appliances_manager.stop_event_listener()
+    await appliances_manager.start_event_listener()
+
+    with open(DATA_DIR / "owned_appliances.json") as f:
+        owned_appliance_data = json.load(f)
+    with open(DATA_DIR / "shared_appliances.json") as f:
+        shared_appliance_data = json.load(f)
+    legacy_appliances = owned_appliance_data["KEY1"]["legacyAppliance"]
+    washer = next(a for a in legacy_appliances if a["SAID"] == "SAIDWASHER1")
+    washer["SAID"] = "SAIDWASHER2"
+    aiointercept_mock.get(
+        backend_selector.user_details_url, payload={"accountId": ACCOUNT_ID}
+    )
+    aiointercept_mock.get(
+        backend_selector.get_owned_appliances_url(ACCOUNT_ID),
+        payload={ACCOUNT_ID: owned_appliance_data},
+    )
+    aiointercept_mock.get(
+        backend_selector.shared_appliances_url, payload=shared_appliance_data
+    )
+
+    assert await appliances_manager.fetch_appliances()
+
+    assert "SAIDWASHER1" not in appliances_manager.all_appliances
+    assert "SAIDWASHER2" in appliances_manager.all_appliances
+    event_socket.return_value.unsubscribe.assert_awaited_once_with("SAIDWASHER1")
+    event_socket.return_value.subscribe.assert_awaited_once_with("SAIDWASHER2")
+    fetch_data_for.assert_awaited_once_with({"SAIDWASHER2"})
+
+
+async def test_gap_fill_refetches_active_appliances_after_short_outage(
+    appliances_manager: AppliancesManager,
+):
+    saids = list(appliances_manager.all_appliances)
+    for said in ["SAIDAIRCON1", "SAIDWASHER1"]:
+        event = {"said": said, "attributeMap": {}, "timestamp": 1}
+        appliances_manager._event_socket_callback(json.dumps(event))
+
+    now = time.monotonic()
+    assert appliances_manager._gap_fill_saids(saids, now - 30) == [
+        "SAIDWASHER1",
+        "SAIDAIRCON1",
+    ]
+    assert set(appliances_manager._stale_saids) == set(saids) - {
+        "SAIDAIRCON1",
+        "SAIDWASHER1",
+    }
+    # The first connection after fetching everything only refreshes active ones
+    appliances_manager._stale_saids.clear()
+    assert len(appliances_manager._gap_fill_saids(saids, None)) == 2
+    assert not appliances_manager._stale_saids
+    # Long outages refresh everything
+    assert len(appliances_manager._gap_fill_saids(saids, now - 600)) == len(saids)
+
+
+async def test_keepalive_refreshes_stale_appliances_first(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+    mocker: MockerFixture,
+):
+    appliances_manager._keepalive_policy = KeepalivePolicy(interval=0.01)
+    mocker.patch.object(appliances_manager, "fetch_all_data")
+    dryer_mock = aiointercept_mock.get(
+        backend_selector.get_appliance_data_url("SAIDDRYER1"), payload={}
+    )
+    await appliances_manager.stop_event_listener()
+    appliances_manager._stale_saids["SAIDDRYER1"] = None
+    await appliances_manager.start_event_listener()
+
+    await asyncio.sleep(0.05)
+    assert dryer_mock.call_count == 1
+    assert not appliances_manager._stale_saids
+
+
+async def test_event_lag_is_measured_per_appliance(
+    appliances_manager: AppliancesManager,
+):
+    event = {
+        "said": "SAIDAIRCON1",
+        "attributeMap": {},
+        "timestamp": int((time.time() - 2) * 1000),
+    }
+    appliances_manager._event_socket_callback(json.dumps(event))
+
+    lag = appliances_manager.event_lag_metrics["SAIDAIRCON1"]
+    assert lag.count == 1
+    assert 2 <= lag.max < 3
+    exported = json.loads(json.dumps(appliances_manager.event_stream_metrics()))
+    assert exported["event_lag"]["SAIDAIRCON1"]["count"] == 1
+    assert "dispatch" in exported
+
+
+async def test_dropped_events_refetch_their_appliances(
+    backend_selector: BackendSelector,
+    auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    mocker: MockerFixture,
+):
+    manager = AppliancesManager(
+        backend_selector, auth, client_session_fixture, event_queue_size=1
+    )
+    for said in ["SAIDAIRCON1", "SAIDWASHER1"]:
+        manager._add_appliance(
+            ApplianceInfo(said, said, "airconditioner", "Climate", "", "")
+        )
+    fetch_data_for = mocker.patch.object(manager, "fetch_data_for")
+
+    # The queue holds one event, so each put drops the one before
+    for said in ["SAIDAIRCON1", "SAIDWASHER1", "SAIDUNKNOWN", "SAIDAIRCON1"]:
+        event = {"said": said, "attributeMap": {}, "timestamp": 1}
+        await manager._event_dispatcher.put(json.dumps(event))
+    assert manager._refetch_task is not None
+    await manager._refetch_task
+
+    # Unknown appliances are not fetched, and each appliance only once
+    fetch_data_for.assert_awaited_once_with(["SAIDAIRCON1", "SAIDWASHER1"])
+    assert manager._refetch_task is None
+
+
+async def test_event_lag_excludes_queueing_delay(
+    appliances_manager: AppliancesManager,
+):
+    received_at = time.time() - 5
+    event = {
+        "said": "SAIDAIRCON1",
+        "attributeMap": {},
+        "timestamp": int((received_at - 1) * 1000),
+    }
+    appliances_manager._event_socket_callback(json.dumps(event), received_at)
+
+    lag = appliances_manager.event_lag_metrics["SAIDAIRCON1"]
+    assert 1 <= lag.max < 2
+
+
+async def test_discovery_lists_owned_and_shared_appliances_concurrently(
+    auth: Auth,
+    backend_selector: BackendSelector,
+    client_session_fixture: aiohttp.ClientSession,
+    aiointercept_mock: aiointercept,
+):
+    with open(DATA_DIR / "owned_appliances.json") as f:
+        owned_appliance_data = json.load(f)
+    with open(DATA_DIR / "shared_appliances.json") as f:
+        shared_appliance_data = json.load(f)
+    shared_requested = asyncio.Event()
+
+    async def owned_appliances(url, **kwargs):
+        await asyncio.wait_for(shared_requested.wait(), 1)
+        return CallbackResult(payload={ACCOUNT_ID: owned_appliance_data})
+
+    async def shared_appliances(url, **kwargs):
+        shared_requested.set()
+        return CallbackResult(payload=shared_appliance_data)
+
+    aiointercept_mock.get(
+        backend_selector.user_details_url, payload={"accountId": ACCOUNT_ID}
+    )
+    aiointercept_mock.get(
+        backend_selector.get_owned_appliances_url(ACCOUNT_ID),
+        callback=owned_appliances,
+    )
+    aiointercept_mock.get(
+        backend_selector.shared_appliances_url, callback=shared_appliances
+    )
+    manager = AppliancesManager(backend_selector, auth, client_session_fixture)
+
+    diff = await manager.discover_appliances()
+
+    assert diff is not None
+    assert {info.said for info in diff.added} == set(manager.all_appliances)
+    assert len(manager.all_appliances) == 9
+
+
+async def test_rediscovery_updates_appliances_in_place(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+):
+    appliances = dict(appliances_manager.all_appliances)
+    event = {"said": "SAIDDRYER1", "attributeMap": {}, "timestamp": 1}
+    appliances_manager._event_socket_callback(json.dumps(event))
+    with open(DATA_DIR / "owned_appliances.json") as f:
+        owned_appliance_data = json.load(f)
+    with open(DATA_DIR / "shared_appliances.json") as f:
+        shared_appliance_data = json.load(f)
+    location = owned_appliance_data["KEY1"]
+    location["legacyAppliance"] = [
+        a for a in location["legacyAppliance"] if a["SAID"] != "SAIDDRYER1"
+    ]
+    oven = next(a for a in location["legacyAppliance"] if a["SAID"] == "SAIDOVEN1")
+    oven["APPLIANCE_NAME"] = "Renamed oven"
+    aiointercept_mock.get(
+        backend_selector.user_details_url, payload={"accountId": ACCOUNT_ID}
+    )
+    aiointercept_mock.get(
+        backend_selector.get_owned_appliances_url(ACCOUNT_ID),
+        payload={ACCOUNT_ID: owned_appliance_data},
+    )
+    aiointercept_mock.get(
+        backend_selector.shared_appliances_url, payload=shared_appliance_data
+    )
+
+    diff = await appliances_manager.discover_appliances()
+
+    assert diff is not None
+    assert diff.added == []
+    assert [info.said for info in diff.changed] == ["SAIDOVEN1"]
+    assert [info.said for info in diff.removed] == ["SAIDDRYER1"]
+    assert appliances_manager.all_appliances["SAIDOVEN1"] is appliances["SAIDOVEN1"]
+    assert appliances["SAIDOVEN1"].name == "Renamed oven"
+    assert "SAIDDRYER1" not in appliances_manager.all_appliances
+    # Nothing is tracked for removed appliances
+    assert "SAIDDRYER1" not in appliances_manager._last_event_time
+    assert "SAIDDRYER1" not in appliances_manager._last_fetch_time
+    assert "SAIDDRYER1" not in appliances_manager.event_lag_metrics
+    assert all(
+        appliances_manager.all_appliances[said] is appliance
+        for said, appliance in appliances.items()
+        if said != "SAIDDRYER1"
+    )
+
+
+@pytest.mark.parametrize("missed_change", [False, True])
+async def test_probe_restarts_event_sockets_after_missed_changes(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+    mocker: MockerFixture,
+    missed_change: bool,
+):
+    restart = mocker.patch.object(appliances_manager, "_restart_event_sockets")
+    said = next(iter(appliances_manager.all_appliances))
+    with open(DATA_DIR / "mock_data.json") as f:
+        payload = json.load(f)[said]
+    if missed_change:
+        online = payload["attributes"]["Online"]
+        online["value"] = "0" if online["value"] == "1" else "1"
+    aiointercept_mock.get(
+        backend_selector.get_appliance_data_url(said), payload=payload
+    )
+
+    await appliances_manager._probe_event_stream()
+
+    assert restart.called == missed_change
+
+
+def test_probes_back_off_while_event_stream_is_quiet(
+    appliances_manager: AppliancesManager,
+):
+    appliances_manager._keepalive_policy = KeepalivePolicy(
+        quiet_after=10, max_probe_interval=30
+    )
+    appliances_manager._last_event_at = 100
+    assert appliances_manager._next_probe_at() == 110
+
+    appliances_manager._last_probe_at = 110
+    appliances_manager._quiet_probes = 1
+    assert appliances_manager._next_probe_at() == 130
+    appliances_manager._last_probe_at = 130
+    appliances_manager._quiet_probes = 2
+    assert appliances_manager._next_probe_at() == 160
+
+    # An event restarts the backoff
+    appliances_manager._last_event_at = 140
+    assert appliances_manager._next_probe_at() == 150
@@ -0,0 +1,76 @@
+import json
+import sys
+
+from whirlpool.attributestore import AttributeChange, AttributeStore
+
+from . import DATA_DIR
+
+
+def test_load_and_get():
+    store = AttributeStore()
+    store.load(
+        {
+            "Online": {"value": "1", "updateTime": 100},
+            "Sys_OpSetTargetTemp": {"value": "300", "updateTime": 200},
+        }
+    )
+
+    assert len(store) == 2
+    assert "Online" in store
+    assert store.get("Online") == "1"
+    assert store.get_int("Sys_OpSetTargetTemp") == 300
+    assert store.get("Missing") is None
+    assert store.get_int("Missing") is None
+    assert store.to_dict()["Sys_OpSetTargetTemp"] == {"value": "300", "updateTime": 200}
+
+
+def test_set_invalidates_decoded_value():
+    store = AttributeStore()
+    store.load({"Sys_OpSetTargetTemp": {"value": "300", "updateTime": 200}})
+    assert store.get_int("Sys_OpSetTargetTemp") == 300
+
+    assert store.set("Sys_OpSetTargetTemp", "250", 300) == AttributeChange(
+        "Sys_OpSetTargetTemp", "300", "250", 300
+    )
+    assert store.get_int("Sys_OpSetTargetTemp") == 250
+    entry = store.get_entry("Sys_OpSetTargetTemp")
+    assert entry is not None
+    assert entry.update_time == 300
+
+    # unchanged values only bump the update time
+    assert store.set("Sys_OpSetTargetTemp", "250", 400) is None
+    assert entry.update_time == 400
+
+    # unknown attributes are not added
+    assert store.set("Missing", "1", 300) is None
+    assert "Missing" not in store
+
+
+def test_entries_are_smaller_than_raw_json():
+    with open(DATA_DIR / "oven_data.json") as f:
+        attributes = json.load(f)["DATA1"]["attributes"]
+
+    store = AttributeStore()
+    store.load(attributes)
+
+    raw_size = sum(sys.getsizeof(attr) for attr in attributes.values())
+    store_size = sum(sys.getsizeof(store.get_entry(name)) for name in store)
+    assert store_size < raw_size
+
+
+def test_load_reports_changes():
+    store = AttributeStore()
+    changes = store.load({"Online": {"value": "1", "updateTime": 100}})
+    assert changes == [AttributeChange("Online", None, "1", 100)]
+
+    changes = store.load(
+        {
+            "Online": {"value": "1", "updateTime": 200},
+            "Sys_OpSetTargetTemp": {"value": "300", "updateTime": 200},
+        }
+    )
+    assert changes == [AttributeChange("Sys_OpSetTargetTemp", None, "300", 200)]
+
+    changes = store.load({"Online": {"value": "0", "updateTime": 300}})
+    assert changes == [AttributeChange("Online", "1", "0", 300)]
+    assert "Sys_OpSetTargetTemp" not in store
@@ -1,3 +1,4 @@
+import asyncio
 import sys
 from http import HTTPStatus
 
@@ -7,8 +8,10 @@ from aiointercept import aiointercept
 from yarl import URL
 
 from tests import ACCOUNT_ID
+from whirlpool import auth as auth_module
 from whirlpool.auth import AccountLockedError, Auth
 from whirlpool.backendselector import BackendSelector
+from whirlpool.retrypolicy import RetryPolicy
 from whirlpool.types import Brand, Region
 
 AUTH_HEADERS = {
@@ -187,3 +190,141 @@ async def test_auth_invalid_region_brand_combo(
     assert auth.is_access_token_valid() is False
     assert auth.get_said_list() is None
     assert "No credentials for brand Maytag in region EU" in caplog.text
+
+
+async def test_concurrent_auth_is_single_flight(
+    auth: Auth, backend_selector: BackendSelector, aiointercept_mock: aiointercept
+):
+    auth_url = get_auth_url(backend_selector)
+    aiointercept_mock.post(
+        auth_url,
+        payload={"access_token": "token_1", "expires_in": 21599},
+        repeat=True,
+    )
+
+    results = await asyncio.gather(*(auth.do_auth() for _ in range(10)))
+
+    assert results == [True] * 10
+    assert auth.get_access_token() == "token_1"
+    assert len(aiointercept_mock.requests[("POST", URL(auth_url))]) == 1
+
+
+async def test_renew_access_token_reuses_renewed_token(
+    auth: Auth, backend_selector: BackendSelector, aiointercept_mock: aiointercept
+):
+    auth_url = get_auth_url(backend_selector)
+    aiointercept_mock.post(
+        auth_url,
+        payload={"access_token": "token_1", "expires_in": 21599},
+        repeat=True,
+    )
+
+    assert await auth.do_auth()
+
+    # a request made with an older token was rejected after the renewal
+    assert await auth.renew_access_token("token_0")
+    assert len(aiointercept_mock.requests[("POST", URL(auth_url))]) == 1
+
+    # the current token was rejected, so it must be renewed
+    assert await auth.renew_access_token("token_1")
+    assert len(aiointercept_mock.requests[("POST", URL(auth_url))]) == 2
+
+
+async def test_token_refresh_renews_before_expiry(
+    backend_selector: BackendSelector,
+    client_session_fixture: aiohttp.ClientSession,
+    aiointercept_mock: aiointercept,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(auth_module, "TOKEN_REFRESH_RETRY_DELAY", 0.01)
+    auth = Auth(
+        backend_selector,
+        "email",
+        "secretpass",
+        client_session_fixture,
+        retry_policy=RetryPolicy(attempts=1),
+    )
+    auth_url = get_auth_url(backend_selector)
+    aiointercept_mock.post(
+        auth_url,
+        payload={"access_token": "token_1", "refresh_token": "r", "expires_in": 1},
+    )
+    # the first renewal fails transiently for both the refresh token and
+    # user/pass requests
+    aiointercept_mock.post(auth_url, status=HTTPStatus.SERVICE_UNAVAILABLE)
+    aiointercept_mock.post(auth_url, status=HTTPStatus.SERVICE_UNAVAILABLE)
+    aiointercept_mock.post(
+        auth_url,
+        payload={"access_token": "token_2", "expires_in": 3600},
+    )
+
+    assert await auth.do_auth()
+    auth.start_token_refresh(margin=0.9)
+    await asyncio.sleep(0.3)
+    await auth.stop_token_refresh()
+
+    assert auth.get_access_token() == "token_2"
+    assert len(aiointercept_mock.requests[("POST", URL(auth_url))]) == 4
+
+
+async def test_token_refresh_stops_when_credentials_are_rejected(
+    auth: Auth,
+    backend_selector: BackendSelector,
+    aiointercept_mock: aiointercept,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(auth_module, "TOKEN_REFRESH_RETRY_DELAY", 0.01)
+    auth_url = get_auth_url(backend_selector)
+    aiointercept_mock.post(
+        auth_url,
+        payload={"access_token": "token_1", "refresh_token": "r", "expires_in": 1},
+    )
+
+    assert await auth.do_auth()
+    aiointercept_mock.post(auth_url, status=HTTPStatus.BAD_REQUEST, repeat=True)
+    auth.start_token_refresh(margin=0.9)
+    await asyncio.sleep(0.3)
+
+    assert auth.credentials_rejected
+    assert auth._refresh_task is not None and auth._refresh_task.done()
+    # one refused renewal with the refresh token and one with user/pass
+    assert len(aiointercept_mock.requests[("POST", URL(auth_url))]) == 3
+    await auth.stop_token_refresh()
+
+
+@pytest.mark.parametrize(
+    ("status", "expires_in", "kept"),
+    [
+        (HTTPStatus.SERVICE_UNAVAILABLE, 3600, True),
+        (HTTPStatus.BAD_REQUEST, 3600, False),
+        (HTTPStatus.SERVICE_UNAVAILABLE, 0, False),
+    ],
+)
+async def test_failed_renewal_keeps_token_unless_rejected_or_expired(
+    backend_selector: BackendSelector,
+    client_session_fixture: aiohttp.ClientSession,
+    aiointercept_mock: aiointercept,
+    status: HTTPStatus,
+    expires_in: int,
+    kept: bool,
+):
+    auth = Auth(
+        backend_selector,
+        "email",
+        "secretpass",
+        client_session_fixture,
+        retry_policy=RetryPolicy(base_delay=0.001),
+    )
+    auth_url = get_auth_url(backend_selector)
+    aiointercept_mock.post(
+        auth_url,
+        payload={"access_token": "token", "refresh_token": "r", "expires_in": 3600},
+    )
+    assert await auth.do_auth()
+    auth._auth_dict["expire_date"] -= 3600 - expires_in
+    aiointercept_mock.post(auth_url, status=status, repeat=True)
+
+    assert not await auth.do_auth()
+
+    assert auth.get_access_token() == ("token" if kept else None)
+    assert auth._auth_dict.get("refresh_token") == ("r" if kept else None)
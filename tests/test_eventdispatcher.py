@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from whirlpool.eventdispatcher import EventDispatcher, OverflowPolicy
+
+
+async def test_dispatches_in_order_and_survives_handler_errors():
+    handled: list[str] = []
+
+    def handler(msg: str, received_at: float):
+        if msg == "bad":
+            raise ValueError(msg)
+        handled.append(msg)
+
+    dispatcher = EventDispatcher(handler)
+    dispatcher.start()
+    for msg in ["1", "bad", "2"]:
+        await dispatcher.put(msg)
+    await dispatcher.join()
+    await dispatcher.stop()
+
+    assert handled == ["1", "2"]
+    assert dispatcher.metrics.dispatched == 2
+    assert dispatcher.metrics.errors == 1
+    assert dispatcher.metrics.queue_latency.count == 3
+    assert dispatcher.metrics.dispatch_time.count == 3
+
+
+@pytest.mark.parametrize(
+    ("overflow_policy", "expected", "expected_dropped"),
+    [
+        (OverflowPolicy.DropOldest, ["2", "3"], ["1"]),
+        (OverflowPolicy.DropNewest, ["1", "2"], ["3"]),
+    ],
+)
+async def test_overflow_drops_events(
+    overflow_policy: OverflowPolicy, expected: list[str], expected_dropped: list[str]
+):
+    handled: list[str] = []
+    dropped: list[str] = []
+    dispatcher = EventDispatcher(
+        lambda msg, _: handled.append(msg), 2, overflow_policy, dropped.append
+    )
+    for msg in ["1", "2", "3"]:
+        await dispatcher.put(msg)
+    assert dispatcher.metrics.max_depth == 2
+
+    dispatcher.start()
+    await dispatcher.join()
+    await dispatcher.stop()
+
+    assert handled == expected
+    assert dropped == expected_dropped
+    assert dispatcher.metrics.dropped == 1
+
+
+async def test_overflow_blocks_until_there_is_room():
+    handled: list[str] = []
+    dispatcher = EventDispatcher(
+        lambda msg, _: handled.append(msg), 1, OverflowPolicy.Block
+    )
+    await dispatcher.put("1")
+    put = asyncio.create_task(dispatcher.put("2"))
+    await asyncio.sleep(0.01)
+    assert not put.done()
+
+    dispatcher.start()
+    await put
+    await dispatcher.join()
+    await dispatcher.stop()
+
+    assert handled == ["1", "2"]
+    assert dispatcher.metrics.dropped == 0
+
+
+async def test_other_tasks_run_between_events():
+    reader_steps = 0
+    steps_at_dispatch: list[int] = []
+    dispatcher = EventDispatcher(lambda msg, _: steps_at_dispatch.append(reader_steps))
+    for msg in ["1", "2", "3"]:
+        await dispatcher.put(msg)
+
+    async def reader():
+        nonlocal reader_steps
+        while True:
+            reader_steps += 1
+            await asyncio.sleep(0)
+
+    reader_task = asyncio.get_running_loop().create_task(reader())
+    dispatcher.start()
+    await dispatcher.join()
+    await dispatcher.stop()
+    reader_task.cancel()
+
+    # The backlog is not drained in a single step of the event loop
+    assert steps_at_dispatch[0] < steps_at_dispatch[1] < steps_at_dispatch[2]
+
+
+async def test_handler_gets_the_receive_time():
+    received: list[tuple[float, float]] = []
+    dispatcher = EventDispatcher(
+        lambda msg, received_at: received.append((received_at, time.time()))
+    )
+    before = time.time()
+    await dispatcher.put("1")
+    await asyncio.sleep(0.05)
+    dispatcher.start()
+    await dispatcher.join()
+    await dispatcher.stop()
+
+    [(received_at, handled_at)] = received
+    assert before <= received_at < handled_at - 0.04
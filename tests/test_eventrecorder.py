@@ -0,0 +1,115 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from whirlpool.appliancesmanager import AppliancesManager
+from whirlpool.eventrecorder import (
+    FrameRecorder,
+    RecordingFormatError,
+    read_recording,
+    replay_recording,
+)
+from whirlpool.stomp import encode_frame
+
+
+def event_frame(said: str, attributes: dict[str, str], timestamp: int = 1) -> str:
+    body = json.dumps(
+        {"said": said, "attributeMap": attributes, "timestamp": timestamp}
+    )
+    return encode_frame("MESSAGE", {"destination": f"/topic/{said}"}, body)
+
+
+def test_record_and_read(tmp_path: Path):
+    path = tmp_path / "frames.bin"
+    with FrameRecorder(path) as recorder:
+        recorder.record("CONNECTED\n\n\0", received=10)
+        recorder.record(b"\n", received=11)
+    # Appending keeps the existing records
+    with FrameRecorder(path) as recorder:
+        recorder.record("MESSAGE\n\nbody ção\0", received=12)
+
+    frames = list(read_recording(path))
+    assert [frame.received for frame in frames] == [10, 11, 12]
+    assert frames[2].data.decode() == "MESSAGE\n\nbody ção\0"
+
+
+def test_read_truncated_and_invalid_recordings(tmp_path: Path):
+    path = tmp_path / "frames.bin"
+    with FrameRecorder(path) as recorder:
+        recorder.record("first")
+        recorder.record("second")
+    path.write_bytes(path.read_bytes()[:-2])
+    assert [frame.data for frame in read_recording(path)] == [b"first"]
+
+    path.write_bytes(b"not a recording")
+    with pytest.raises(RecordingFormatError):
+        list(read_recording(path))
+
+
+async def test_replay_as_fast_as_possible_and_paced(tmp_path: Path):
+    path = tmp_path / "frames.bin"
+    now = time.time()
+    frame = event_frame("SAID1", {"Online": "1"})
+    with FrameRecorder(path) as recorder:
+        # A frame split across two websocket messages
+        recorder.record(frame[:10], received=now)
+        recorder.record(frame[10:] + frame, received=now + 0.1)
+
+    bodies: list[str] = []
+    result = await replay_recording(path, bodies.append)
+    assert result.frames == 2
+    assert result.events == 2
+    assert [json.loads(body)["said"] for body in bodies] == ["SAID1", "SAID1"]
+    assert result.elapsed < 0.1
+
+    result = await replay_recording(path, bodies.append, speed=2)
+    assert result.elapsed >= 0.05
+
+
+async def test_replay_resets_parsers_per_connection(tmp_path: Path):
+    path = tmp_path / "frames.bin"
+    frame = event_frame("SAID1", {"Online": "1"})
+    with FrameRecorder(path) as recorder:
+        first, second = recorder.new_stream(), recorder.new_stream()
+        recorder.record_connected(first)
+        recorder.record_connected(second)
+        # Split frames of two sockets are interleaved
+        recorder.record(frame[:10], stream=first)
+        recorder.record(frame[:20], stream=second)
+        recorder.record(frame[10:], stream=first)
+        # The second socket reconnects with a frame cut off
+        recorder.record_connected(second)
+        recorder.record("CONNECTED\nversion:1.2\n\n\0", stream=second)
+        recorder.record(frame, stream=second)
+        # Data that cannot be parsed is skipped without ending the replay
+        recorder.record("MESSAGE\ndestination:/topic/X\n", stream=first)
+        recorder.record("CONNECTED\nversion:1.2\n\n\0", stream=first)
+        recorder.record(frame, stream=first)
+
+    bodies: list[str] = []
+    result = await replay_recording(path, bodies.append)
+
+    assert result.events == 3
+    assert result.parse_errors == 1
+    assert [json.loads(body)["said"] for body in bodies] == ["SAID1"] * 3
+
+
+async def test_manager_replays_events(
+    appliances_manager: AppliancesManager, tmp_path: Path
+):
+    aircon = appliances_manager.aircons[0]
+    path = tmp_path / "frames.bin"
+    with FrameRecorder(path) as recorder:
+        recorder.record(event_frame(aircon.said, {"Online": "0"}))
+    last_event_at = appliances_manager._last_event_at
+
+    result = await appliances_manager.replay_events(path)
+
+    assert result.events == 1
+    assert aircon.get_online() is False
+    # Replayed events are not live activity
+    assert aircon.said not in appliances_manager._last_event_time
+    assert aircon.said not in appliances_manager.event_lag_metrics
+    assert appliances_manager._last_event_at == last_event_at
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import time
+from collections.abc import AsyncGenerator, Callable
+from pathlib import Path
+
+import aiohttp
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+
+from whirlpool.auth import Auth
+from whirlpool.eventrecorder import FrameRecorder, read_recording
+from whirlpool.eventserver import EventServer
+from whirlpool.eventsocket import EventSocket
+from whirlpool.reconnect import (
+    DisconnectReason,
+    ExponentialReconnectStrategy,
+    FixedReconnectStrategy,
+    ReconnectStrategy,
+)
+
+
+@pytest_asyncio.fixture
+async def event_server() -> AsyncGenerator[EventServer]:
+    async with EventServer() as server:
+        yield server
+
+
+@pytest.fixture
+def token_auth(auth: Auth, mocker: MockerFixture) -> Auth:
+    mocker.patch.object(auth, "get_access_token", return_value="token")
+    mocker.patch.object(auth, "is_access_token_valid", return_value=True)
+    return auth
+
+
+async def wait_for(condition: Callable[[], bool]):
+    async with asyncio.timeout(5):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+async def start_subscribed(event_socket: EventSocket):
+    event_socket.start()
+    await wait_for(lambda: event_socket.subscribe_latency is not None)
+
+
+@pytest.mark.parametrize(
+    ("pipeline_subscribe", "expected_messages"), [(True, 1), (False, 2)]
+)
+async def test_subscribe_batching(
+    event_server: EventServer,
+    token_auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    mocker: MockerFixture,
+    pipeline_subscribe: bool,
+    expected_messages: int,
+):
+    con_up_listener = mocker.AsyncMock()
+    event_socket = EventSocket(
+        event_server.url,
+        token_auth,
+        ["SAID1", "SAID2", "SAID3"],
+        lambda msg: None,
+        con_up_listener,
+        client_session_fixture,
+        pipeline_subscribe=pipeline_subscribe,
+    )
+    await start_subscribed(event_socket)
+    [connection] = event_server.connections
+    await event_socket.stop()
+
+    assert [frame.command for frame in connection.received] == [
+        "CONNECT",
+        "SUBSCRIBE",
+        "SUBSCRIBE",
+        "SUBSCRIBE",
+    ]
+    # All subscriptions are sent in a single websocket message
+    assert connection.messages == expected_messages
+    con_up_listener.assert_awaited_once()
+    assert (event_socket.subscribe_latency or 0) > 0
+    assert event_socket.metrics.connects == 1
+    assert event_socket.metrics.subscriptions == 3
+    assert not event_socket.metrics.connected
+
+
+async def test_live_subscribe_and_unsubscribe(
+    event_server: EventServer,
+    token_auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    mocker: MockerFixture,
+):
+    event_socket = EventSocket(
+        event_server.url,
+        token_auth,
+        ["SAID1", "SAID2"],
+        lambda msg: None,
+        mocker.AsyncMock(),
+        client_session_fixture,
+    )
+    await start_subscribed(event_socket)
+    [connection] = event_server.connections
+
+    await event_socket.subscribe("SAID3")
+    await event_socket.subscribe("SAID3")
+    await event_socket.unsubscribe("SAID1")
+    await wait_for(lambda: len(connection.received) == 5)
+    await event_socket.stop()
+
+    assert [frame.command for frame in connection.received[3:]] == [
+        "SUBSCRIBE",
+        "UNSUBSCRIBE",
+    ]
+    assert set(connection.subscriptions) == {"SAID2", "SAID3"}
+    assert event_socket.said_list == ["SAID2", "SAID3"]
+    assert event_socket.metrics.subscriptions == 2
+
+
+async def test_receives_published_events(
+    event_server: EventServer,
+    token_auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    mocker: MockerFixture,
+):
+    received: list[str] = []
+    event_socket = EventSocket(
+        event_server.url,
+        token_auth,
+        ["SAID1", "SAID2"],
+        received.append,
+        mocker.AsyncMock(),
+        client_session_fixture,
+    )
+    await start_subscribed(event_socket)
+
+    assert await event_server.publish("SAID1", {"Online": "1"}, timestamp=5) == 1
+    assert await event_server.publish("SAID3", {"Online": "1"}) == 0
+    event_server.start_events(rate=500)
+    await wait_for(lambda: len(received) >= 20)
+    await event_server.stop_events()
+    await event_socket.stop()
+
+    assert json.loads(received[0]) == {
+        "said": "SAID1",
+        "attributeMap": {"Online": "1"},
+        "timestamp": 5,
+    }
+    assert {json.loads(msg)["said"] for msg in received} == {"SAID1", "SAID2"}
+    assert event_socket.metrics.events == len(received)
+
+
+@pytest.mark.parametrize(
+    "reconnect_strategy",
+    [
+        FixedReconnectStrategy(short_delay=0.05, going_away_delay=0.1),
+        ExponentialReconnectStrategy(
+            first_delay=0.05, base_delay=0.1, going_away_delay=0.1
+        ),
+    ],
+)
+async def test_reconnects_after_going_away(
+    event_server: EventServer,
+    token_auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    mocker: MockerFixture,
+    reconnect_strategy: ReconnectStrategy,
+):
+    con_up_listener = mocker.AsyncMock()
+    event_socket = EventSocket(
+        event_server.url,
+        token_auth,
+        ["SAID1"],
+        lambda msg: None,
+        con_up_listener,
+        client_session_fixture,
+        reconnect_strategy=reconnect_strategy,
+    )
+    await start_subscribed(event_socket)
+    await event_server.close_all()
+    await wait_for(lambda: con_up_listener.await_count == 2)
+    recovered = time.monotonic()
+    disconnected_at = event_socket.disconnected_at
+    await event_socket.stop()
+
+    assert disconnected_at is not None
+    # Delays are at most 0.15s for both strategies
+    assert 0 < recovered - disconnected_at < 0.5
+    metrics = event_socket.metrics
+    assert metrics.connects == 2
+    assert metrics.reconnects == 1
+    assert 0 < metrics.downtime < 0.5
+    assert metrics.messages >= metrics.frames_parsed >= 3
+    assert metrics.parse_time.count == metrics.messages
+    assert metrics.bytes_received > 0
+    assert metrics.messages_dropped == 0
+
+
+class RecordingReconnectStrategy:
+    def __init__(self):
+        self.attempts: list[int] = []
+
+    def delay(self, attempt: int, reason: DisconnectReason) -> float:
+        self.attempts.append(attempt)
+        return 0.01
+
+
+@pytest.mark.parametrize(
+    ("healthy_session_time", "said_list", "expected_attempts"),
+    [
+        (60, ["SAID1"], [0, 1, 2]),
+        (0, ["SAID1"], [0, 0, 0]),
+        # Nothing to subscribe to, so no receipt is ever requested
+        (0, [], [0, 0, 0]),
+    ],
+)
+async def test_backoff_resets_only_after_healthy_session(
+    event_server: EventServer,
+    token_auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    mocker: MockerFixture,
+    healthy_session_time: float,
+    said_list: list[str],
+    expected_attempts: list[int],
+):
+    mocker.patch("whirlpool.eventsocket.HEALTHY_SESSION_TIME", healthy_session_time)
+    reconnect_strategy = RecordingReconnectStrategy()
+    event_socket = EventSocket(
+        event_server.url,
+        token_auth,
+        said_list,
+        lambda msg: None,
+        mocker.AsyncMock(),
+        client_session_fixture,
+        reconnect_strategy=reconnect_strategy,
+    )
+    event_socket.start()
+    await wait_for(lambda: event_socket.metrics.connected)
+    # Each session is dropped right after connecting
+    for attempts in range(1, 4):
+        await event_server.close_all()
+        await wait_for(lambda n=attempts: len(reconnect_strategy.attempts) == n)
+        await wait_for(lambda: event_socket.metrics.connected)
+    await event_socket.stop()
+
+    assert reconnect_strategy.attempts == expected_attempts
+
+
+async def test_reauths_on_token_invalid(
+    event_server: EventServer,
+    auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    mocker: MockerFixture,
+):
+    tokens = iter(["token1", "token2"])
+    token = next(tokens)
+    event_server.tokens = {token}
+
+    async def renew_access_token(rejected_token: str | None) -> bool:
+        nonlocal token
+        assert rejected_token == token
+        token = next(tokens)
+        assert event_server.tokens is not None
+        event_server.tokens.add(token)
+        return True
+
+    mocker.patch.object(auth, "get_access_token", side_effect=lambda: token)
+    mocker.patch.object(auth, "is_access_token_valid", return_value=True)
+    renew = mocker.patch.object(
+        auth, "renew_access_token", side_effect=renew_access_token
+    )
+    con_up_listener = mocker.AsyncMock()
+    event_socket = EventSocket(
+        event_server.url,
+        auth,
+        ["SAID1"],
+        lambda msg: None,
+        con_up_listener,
+        client_session_fixture,
+        reconnect_strategy=FixedReconnectStrategy(short_delay=0.01),
+    )
+    await start_subscribed(event_socket)
+    await event_server.invalidate_tokens()
+    await wait_for(lambda: con_up_listener.await_count == 2)
+    await event_socket.stop()
+
+    renew.assert_awaited_once()
+    assert event_server.stats.connections == 2
+
+
+async def test_records_received_frames(
+    event_server: EventServer,
+    token_auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    mocker: MockerFixture,
+    tmp_path: Path,
+):
+    recorder = FrameRecorder(tmp_path / "frames.bin")
+    event_socket = EventSocket(
+        event_server.url,
+        token_auth,
+        ["SAID1"],
+        lambda msg: None,
+        mocker.AsyncMock(),
+        client_session_fixture,
+        recorder=recorder,
+    )
+    await start_subscribed(event_socket)
+    await event_socket.stop()
+    recorder.close()
+
+    frames = list(read_recording(recorder.path))
+    assert frames[0].connected
+    assert [frame.data.split(b"\n")[0] for frame in frames[1:]] == [
+        b"CONNECTED",
+        b"RECEIPT",
+    ]
+    assert {frame.stream for frame in frames} == {1}
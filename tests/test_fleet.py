@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from aiointercept import aiointercept
+from pytest_mock import MockerFixture
+
+from tests import ACCOUNT_ID
+from whirlpool import appliancesmanager
+from whirlpool.backendselector import BackendSelector
+from whirlpool.eventserver import EventServer
+from whirlpool.fleet import AccountConfig, FleetManager
+from whirlpool.types import Brand, Region
+
+
+def mock_account(
+    aiointercept_mock: aiointercept, brand: Brand, region: Region, saids: list[str]
+):
+    backend_selector = BackendSelector(brand, region)
+    aiointercept_mock.post(
+        backend_selector.oauth_token_url,
+        payload={"access_token": "token", "expires_in": 21599},
+    )
+    aiointercept_mock.get(
+        backend_selector.user_details_url, payload={"accountId": ACCOUNT_ID}
+    )
+    appliances = [
+        {
+            "SAID": said,
+            "APPLIANCE_NAME": said,
+            "DATA_MODEL_KEY": "DDM_LAUNDRY_VMAX20_WHIRLPOOL_WASHER8_V2",
+            "CATEGORY_NAME": "FabricCare",
+        }
+        for said in saids
+    ]
+    aiointercept_mock.get(
+        backend_selector.get_owned_appliances_url(ACCOUNT_ID),
+        payload={
+            ACCOUNT_ID: {"KEY1": {"legacyAppliance": appliances, "tsAppliance": []}}
+        },
+    )
+    aiointercept_mock.get(
+        backend_selector.shared_appliances_url, payload={"sharedAppliances": []}
+    )
+    aiointercept_mock.get(
+        backend_selector.websocket_url, payload={"url": "wss://something"}
+    )
+    for said in saids:
+        aiointercept_mock.get(
+            backend_selector.get_appliance_data_url(said),
+            payload={"attributes": {}},
+            repeat=True,
+        )
+
+
+async def test_fleet_indexes_appliances_across_accounts(
+    aiointercept_mock: aiointercept,
+):
+    mock_account(aiointercept_mock, Brand.Whirlpool, Region.EU, ["SAID1", "SAID2"])
+    mock_account(aiointercept_mock, Brand.Maytag, Region.US, ["SAID3"])
+    fleet = FleetManager(startup_interval=0)
+    eu = fleet.add_account(
+        AccountConfig(
+            brand=Brand.Whirlpool, region=Region.EU, username="eu", password="pw"
+        )
+    )
+    us = fleet.add_account(
+        AccountConfig(
+            brand=Brand.Maytag, region=Region.US, username="us", password="pw"
+        )
+    )
+
+    assert await fleet.start() == {eu.config.key: True, us.config.key: True}
+
+    assert set(fleet.appliances) == {"SAID1", "SAID2", "SAID3"}
+    assert fleet.get_account("SAID3") is us
+    assert fleet.get_appliance("SAID1") is eu.manager.all_appliances["SAID1"]
+    # Every account shares the fleet's session and metrics
+    assert eu.manager._session is us.manager._session is fleet.session
+    assert fleet.request_metrics.get("owned_appliances") is not None
+
+    await fleet.remove_account(us.config.key)
+    assert set(fleet.appliances) == {"SAID1", "SAID2"}
+    await fleet.stop()
+    assert not eu.started
+
+
+async def test_fleet_reports_failed_accounts(aiointercept_mock: aiointercept):
+    backend_selector = BackendSelector(Brand.Whirlpool, Region.EU)
+    aiointercept_mock.post(backend_selector.oauth_token_url, status=400)
+    fleet = FleetManager(startup_interval=0)
+    account = fleet.add_account(
+        AccountConfig(
+            brand=Brand.Whirlpool, region=Region.EU, username="eu", password="pw"
+        )
+    )
+
+    assert await fleet.start() == {account.config.key: False}
+    assert not account.started
+    assert not fleet.appliances
+    await fleet.stop()
+
+
+async def test_fleet_rejects_duplicate_accounts():
+    fleet = FleetManager()
+    config = AccountConfig(
+        brand=Brand.Whirlpool, region=Region.EU, username="eu", password="pw"
+    )
+    fleet.add_account(config)
+    with pytest.raises(ValueError):
+        fleet.add_account(config)
+    await fleet.stop()
+
+
+async def test_fleet_spreads_keepalives():
+    fleet = FleetManager()
+    phases = [fleet._keepalive_phase(index) for index in range(4)]
+    interval = appliancesmanager.KEEPALIVE_INTERVAL_SECONDS
+    assert phases == [0, interval / 2, interval / 4, interval * 3 / 4]
+    await fleet.stop()
+
+
+async def test_fleet_requests_are_not_blocked_by_event_sockets(mocker: MockerFixture):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handle_data(request: web.Request) -> web.Response:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get("/data", handle_data)
+    fleet = FleetManager(connection_limit=2)
+    async with EventServer() as event_server, TestServer(app) as rest_server:
+        # More accounts with an open event socket than the connection limit
+        accounts = []
+        for index in range(3):
+            account = fleet.add_account(
+                AccountConfig(
+                    brand=Brand.Whirlpool,
+                    region=Region.EU,
+                    username=f"user{index}",
+                    password="pw",
+                )
+            )
+            mocker.patch.object(account.auth, "get_access_token", return_value="t")
+            mocker.patch.object(
+                account.auth, "is_access_token_valid", return_value=True
+            )
+            account.manager._event_socket_url = event_server.url
+            account.manager._start_event_socket(0, [f"SAID{index}"])
+            accounts.append(account)
+        async with asyncio.timeout(5):
+            while len(event_server.connections) < 3 or not all(
+                connection.subscriptions for connection in event_server.connections
+            ):
+                await asyncio.sleep(0.01)
+
+        url = str(rest_server.make_url("/data"))
+        async with asyncio.timeout(5):
+            responses = await asyncio.gather(
+                *(
+                    fleet.retry_policy.request(fleet.session, "GET", url)
+                    for _ in range(5)
+                )
+            )
+
+        assert all(response.ok for response in responses)
+        assert max_in_flight == 2
+        for account in accounts:
+            for event_socket in account.manager._event_sockets.values():
+                await event_socket.stop()
+    await fleet.stop()
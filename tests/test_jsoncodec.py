@@ -0,0 +1,29 @@
+import pytest
+
+from whirlpool import jsoncodec
+from whirlpool.jsoncodec import CODEC_FACTORIES
+
+from . import DATA_DIR
+
+
+@pytest.mark.parametrize("name", list(CODEC_FACTORIES))
+def test_codecs_round_trip_oven_payload(name: str):
+    try:
+        codec = jsoncodec.create_codec(name)
+    except ImportError:
+        pytest.skip(f"{name} not installed")
+
+    raw = (DATA_DIR / "oven_data.json").read_bytes()
+    data = codec.loads(raw)
+    assert codec.loads(raw.decode()) == data
+    assert codec.loads(codec.dumps(data)) == data
+
+
+def test_set_codec():
+    default = jsoncodec.get_codec()
+    try:
+        jsoncodec.set_codec("json")
+        assert jsoncodec.get_codec().name == "json"
+        assert jsoncodec.loads(b'{"said": "SAID1"}') == {"said": "SAID1"}
+    finally:
+        jsoncodec.set_codec(default)
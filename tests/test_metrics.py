@@ -0,0 +1,93 @@
+import json
+
+import aiohttp
+from aiointercept import aiointercept
+
+from whirlpool.auth import Auth
+from whirlpool.backendselector import ENDPOINT_OAUTH_TOKEN, BackendSelector
+from whirlpool.metrics import Histogram, RequestMetrics
+from whirlpool.retrypolicy import RetryPolicy
+
+
+def test_histogram():
+    histogram = Histogram(bounds=(1, 2, 5))
+    for value in [0.5, 0.7, 1.5, 4]:
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.mean == 1.675
+    assert histogram.max == 4
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(75) == 2
+    assert histogram.percentile(100) == 4
+
+
+def test_request_metrics_export():
+    metrics = RequestMetrics()
+    metrics.record("appliance_data", 0.2, attempts=2, status=200, bytes_received=10)
+    metrics.record("appliance_data", 0.4, attempts=1)
+
+    appliance_data = metrics.get("appliance_data")
+    assert appliance_data is not None
+    assert appliance_data.requests == 2
+    assert appliance_data.retries == 1
+    assert appliance_data.errors == 1
+    assert appliance_data.statuses == {200: 1}
+    assert appliance_data.bytes_received == 10
+
+    exported = json.loads(json.dumps(metrics.as_dict()))
+    assert exported["appliance_data"]["latency"]["count"] == 2
+
+    metrics.reset()
+    assert not metrics.endpoints
+
+
+async def test_retried_request_is_recorded_once(
+    aiointercept_mock: aiointercept, client_session_fixture: aiohttp.ClientSession
+):
+    url = "https://api.whrcloud.com/api/v1/appliance/SAID1"
+    aiointercept_mock.get(url, status=503)
+    aiointercept_mock.get(url, body=b"0123456789")
+
+    metrics = RequestMetrics()
+    policy = RetryPolicy(base_delay=0.001)
+    await policy.request(
+        client_session_fixture,
+        "GET",
+        url,
+        endpoint="appliance_data",
+        metrics=metrics,
+    )
+
+    appliance_data = metrics.get("appliance_data")
+    assert appliance_data is not None
+    assert appliance_data.requests == 1
+    assert appliance_data.retries == 1
+    assert appliance_data.statuses == {200: 1}
+    assert appliance_data.bytes_received == 10
+
+
+async def test_auth_requests_are_recorded(
+    backend_selector: BackendSelector,
+    client_session_fixture: aiohttp.ClientSession,
+    aiointercept_mock: aiointercept,
+):
+    aiointercept_mock.post(
+        backend_selector.oauth_token_url,
+        payload={"access_token": "token", "expires_in": 21599},
+    )
+    metrics = RequestMetrics()
+    auth = Auth(
+        backend_selector,
+        "email",
+        "secretpass",
+        client_session_fixture,
+        request_metrics=metrics,
+    )
+
+    assert await auth.do_auth()
+
+    oauth_token = metrics.get(ENDPOINT_OAUTH_TOKEN)
+    assert oauth_token is not None
+    assert oauth_token.statuses == {200: 1}
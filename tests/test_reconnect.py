@@ -0,0 +1,30 @@
+from whirlpool.reconnect import (
+    DisconnectReason,
+    ExponentialReconnectStrategy,
+    FixedReconnectStrategy,
+)
+
+
+def test_fixed_strategy_matches_legacy_delays():
+    strategy = FixedReconnectStrategy()
+    assert strategy.delay(0, DisconnectReason.Error) == 30
+    assert strategy.delay(3, DisconnectReason.Error) == 30 + 240
+    assert strategy.delay(0, DisconnectReason.GoingAway) == 300
+
+
+def test_exponential_strategy_without_jitter():
+    strategy = ExponentialReconnectStrategy(
+        first_delay=1, base_delay=5, max_delay=60, jitter=False
+    )
+    delays = [strategy.delay(attempt, DisconnectReason.Error) for attempt in range(6)]
+    assert delays == [1, 5, 10, 20, 40, 60]
+    assert strategy.delay(1000, DisconnectReason.Error) == 60
+    assert strategy.delay(0, DisconnectReason.GoingAway) == 60
+
+
+def test_exponential_strategy_full_jitter():
+    strategy = ExponentialReconnectStrategy(base_delay=5, max_delay=60)
+    delays = [strategy.delay(4, DisconnectReason.Error) for _ in range(100)]
+    assert all(0 <= delay <= 40 for delay in delays)
+    # Clients reconnecting at the same time spread out
+    assert len(set(delays)) > 90
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import aiohttp
+import pytest
+from aiointercept import CallbackResult, aiointercept
+from yarl import URL
+
+from whirlpool.retrypolicy import RetryPolicy, parse_retry_after
+
+URL_UNDER_TEST = "https://api.whrcloud.com/api/v1/appliance/SAID1"
+FAST_POLICY = RetryPolicy(base_delay=0.001, attempt_timeout=0.2)
+
+
+def test_backoff_grows_exponentially_up_to_max():
+    policy = RetryPolicy(base_delay=1, max_delay=5, jitter=False)
+    assert [policy.backoff(attempt) for attempt in range(5)] == [1, 2, 4, 5, 5]
+
+
+def test_backoff_jitter_stays_within_bounds():
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+    for attempt in range(5):
+        assert 0 <= policy.backoff(attempt) <= min(2**attempt, 5)
+
+
+def test_backoff_uses_retry_after():
+    policy = RetryPolicy(max_delay=10)
+    assert policy.backoff(0, "3") == 3
+    assert policy.backoff(0, "120") == 10
+    assert RetryPolicy(respect_retry_after=False, jitter=False).backoff(0, "3") == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("not a date") is None
+    retry_date = datetime.now(UTC) + timedelta(seconds=30)
+    delay = parse_retry_after(format_datetime(retry_date, usegmt=True))
+    assert delay is not None and 25 < delay <= 30
+
+
+def test_policy_needs_one_attempt():
+    with pytest.raises(ValueError):
+        RetryPolicy(attempts=0)
+
+
+async def test_retries_retryable_status(
+    aiointercept_mock: aiointercept, client_session_fixture: aiohttp.ClientSession
+):
+    aiointercept_mock.get(URL_UNDER_TEST, status=503, headers={"Retry-After": "0"})
+    aiointercept_mock.get(URL_UNDER_TEST, payload={"said": "SAID1"})
+
+    r = await FAST_POLICY.request(client_session_fixture, "GET", URL_UNDER_TEST)
+
+    assert r.ok
+    assert r.attempts == 2
+    assert r.json() == {"said": "SAID1"}
+
+
+async def test_does_not_retry_client_errors(
+    aiointercept_mock: aiointercept, client_session_fixture: aiohttp.ClientSession
+):
+    aiointercept_mock.get(URL_UNDER_TEST, status=404, repeat=True)
+
+    r = await FAST_POLICY.request(client_session_fixture, "GET", URL_UNDER_TEST)
+
+    assert r.status == 404
+    assert len(aiointercept_mock.requests[("GET", URL(URL_UNDER_TEST))]) == 1
+
+
+async def test_retries_timeouts(
+    aiointercept_mock: aiointercept, client_session_fixture: aiohttp.ClientSession
+):
+    async def slow_response(url, **kwargs):
+        await asyncio.sleep(1)
+        return CallbackResult(payload={})
+
+    aiointercept_mock.get(URL_UNDER_TEST, callback=slow_response)
+    aiointercept_mock.get(URL_UNDER_TEST, payload={})
+
+    r = await FAST_POLICY.request(client_session_fixture, "GET", URL_UNDER_TEST)
+
+    assert r.ok
+    assert r.attempts == 2
+
+
+async def test_raises_last_error(
+    aiointercept_mock: aiointercept, client_session_fixture: aiohttp.ClientSession
+):
+    aiointercept_mock.post(URL_UNDER_TEST, exception=True, repeat=True)
+
+    with pytest.raises(aiohttp.ClientError):
+        await FAST_POLICY.request(client_session_fixture, "POST", URL_UNDER_TEST)
+
+    assert len(aiointercept_mock.requests[("POST", URL(URL_UNDER_TEST))]) == 3
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import aiohttp
+import pytest
+from pytest_mock import MockerFixture
+
+from whirlpool.appliancesmanager import AppliancesManager
+from whirlpool.auth import Auth
+from whirlpool.backendselector import BackendSelector
+from whirlpool.snapshot import (
+    SNAPSHOT_VERSION,
+    ApplianceSnapshot,
+    SnapshotFormatError,
+    read_snapshot,
+    write_snapshot,
+)
+from whirlpool.types import ApplianceInfo
+
+ATTRIBUTES = {"Online": {"value": "1", "updateTime": 1}}
+
+
+def test_snapshot_round_trip(tmp_path: Path):
+    path = tmp_path / "snapshot.json"
+    snapshot = ApplianceSnapshot(
+        ApplianceInfo("SAID1", "Oven", "cooking_vsi", "Cooking", "", ""),
+        ATTRIBUTES,
+        123.5,
+    )
+
+    write_snapshot(path, [snapshot])
+
+    assert read_snapshot(path) == [snapshot]
+    assert [p.name for p in tmp_path.iterdir()] == ["snapshot.json"]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"not json",
+        json.dumps({"version": SNAPSHOT_VERSION + 1, "appliances": []}).encode(),
+        json.dumps({"version": SNAPSHOT_VERSION, "appliances": [{}]}).encode(),
+        *(
+            json.dumps(
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "appliances": [
+                        {
+                            "info": asdict(
+                                ApplianceInfo("SAID1", "Oven", "oven", "", "", "")
+                            ),
+                            "attributes": attributes,
+                            "updated_at": 1,
+                        }
+                    ],
+                }
+            ).encode()
+            for attributes in [
+                [],
+                {"Online": "1"},
+                {"Online": {"value": "1"}},
+                {"Online": {"updateTime": 1}},
+            ]
+        ),
+    ],
+)
+def test_read_invalid_snapshot(tmp_path: Path, data: bytes):
+    path = tmp_path / "snapshot.json"
+    path.write_bytes(data)
+    with pytest.raises(SnapshotFormatError):
+        read_snapshot(path)
+
+
+async def test_manager_restores_saved_snapshot(
+    appliances_manager: AppliancesManager,
+    backend_selector: BackendSelector,
+    auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    tmp_path: Path,
+):
+    path = tmp_path / "snapshot.json"
+    appliances_manager._snapshot_path = path
+    assert await appliances_manager.save_snapshot()
+
+    manager = AppliancesManager(
+        backend_selector, auth, client_session_fixture, snapshot_path=path
+    )
+    assert manager.restore_snapshot()
+
+    assert set(manager.all_appliances) == set(appliances_manager.all_appliances)
+    for said, appliance in manager.all_appliances.items():
+        original = appliances_manager.all_appliances[said]
+        assert appliance.appliance_info == original.appliance_info
+        assert appliance.export_attributes() == original.export_attributes()
+    assert [a.get_online() for a in manager.aircons] == [False, True]
+
+
+async def test_snapshot_is_saved_periodically_off_the_event_loop(
+    appliances_manager: AppliancesManager,
+    tmp_path: Path,
+    mocker: MockerFixture,
+):
+    threads: list[threading.Thread] = []
+    write = mocker.patch(
+        "whirlpool.appliancesmanager.write_snapshot",
+        side_effect=lambda *args: threads.append(threading.current_thread()),
+    )
+    mocker.patch.object(appliances_manager, "fetch_all_data")
+    await appliances_manager.stop_event_listener()
+    appliances_manager._snapshot_path = tmp_path / "snapshot.json"
+    appliances_manager._snapshot_save_interval = 0.01
+    await appliances_manager.start_event_listener()
+
+    await asyncio.sleep(0.05)
+
+    assert write.call_count > 1
+    assert threading.main_thread() not in threads
+
+
+def test_missing_snapshot_is_not_restored(
+    backend_selector: BackendSelector,
+    auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    tmp_path: Path,
+):
+    manager = AppliancesManager(
+        backend_selector,
+        auth,
+        client_session_fixture,
+        snapshot_path=tmp_path / "snapshot.json",
+    )
+    assert not manager.restore_snapshot()
+
+
+def test_snapshot_with_invalid_attributes_is_not_restored(
+    backend_selector: BackendSelector,
+    auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    tmp_path: Path,
+):
+    path = tmp_path / "snapshot.json"
+    write_snapshot(
+        path,
+        [
+            ApplianceSnapshot(
+                ApplianceInfo("SAID1", "Oven", "cooking_vsi", "Cooking", "", ""),
+                {"Online": {"value": "1"}},
+                time.time(),
+            )
+        ],
+    )
+    manager = AppliancesManager(
+        backend_selector, auth, client_session_fixture, snapshot_path=path
+    )
+
+    assert not manager.restore_snapshot()
+    assert not manager.all_appliances
+
+
+async def test_only_old_snapshot_entries_are_refetched(
+    backend_selector: BackendSelector,
+    auth: Auth,
+    client_session_fixture: aiohttp.ClientSession,
+    tmp_path: Path,
+    mocker: MockerFixture,
+):
+    path = tmp_path / "snapshot.json"
+    now = time.time()
+    write_snapshot(
+        path,
+        [
+            ApplianceSnapshot(
+                ApplianceInfo(said, "Aircon", "airconditioner", "Climate", "", ""),
+                ATTRIBUTES,
+                updated_at,
+            )
+            for said, updated_at in [("SAIDOLD", now - 7200), ("SAIDNEW", now - 60)]
+        ],
+    )
+    manager = AppliancesManager(
+        backend_selector,
+        auth,
+        client_session_fixture,
+        snapshot_path=path,
+        snapshot_max_age=3600,
+    )
+    fetch_data_for = mocker.patch.object(manager, "fetch_data_for")
+    assert manager.restore_snapshot()
+
+    await manager._revalidate_snapshot()
+
+    fetch_data_for.assert_awaited_once_with(["SAIDOLD"])
+    assert list(manager._stale_saids) == ["SAIDNEW"]
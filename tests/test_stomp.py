@@ -0,0 +1,95 @@
+import pytest
+
+from whirlpool.stomp import StompFrame, StompParseError, StompParser, encode_frame
+
+EVENT_BODY = '{"said":"SAID1","attributeMap":{"Online":"1"},"timestamp":1}'
+
+
+def test_parse_single_frame():
+    parser = StompParser()
+    frames = parser.feed(
+        f"MESSAGE\ndestination:/topic/SAID1\nsubscription:1\n\n{EVENT_BODY}\0"
+    )
+    assert frames == [
+        StompFrame(
+            "MESSAGE",
+            {"destination": "/topic/SAID1", "subscription": "1"},
+            EVENT_BODY,
+        )
+    ]
+    assert parser.buffered == 0
+
+
+def test_parse_multiple_frames_and_heartbeats():
+    parser = StompParser()
+    data = (
+        "CONNECTED\nversion:1.2\n\n\0\n"
+        + encode_frame("MESSAGE", {"subscription": "1"}, EVENT_BODY)
+        + "\n\n"
+        + encode_frame("RECEIPT", {"receipt-id": "2"})
+    )
+    frames = parser.feed(data)
+    assert [frame.command for frame in frames] == ["CONNECTED", "MESSAGE", "RECEIPT"]
+    assert frames[1].body == EVENT_BODY
+
+
+def test_parse_frame_split_across_messages():
+    parser = StompParser()
+    data = encode_frame("MESSAGE", {"subscription": "1"}, EVENT_BODY)
+    chunks = [data[:5], data[5:20], data[20:-1], data[-1:]]
+
+    assert parser.feed(chunks[0]) == []
+    assert parser.feed(chunks[1]) == []
+    assert parser.feed(chunks[2]) == []
+    assert parser.buffered == len(data) - 1
+    frames = parser.feed(chunks[3])
+    assert [frame.body for frame in frames] == [EVENT_BODY]
+    assert parser.buffered == 0
+
+
+def test_parse_content_length():
+    parser = StompParser()
+    body = "with\0null"
+    frames = parser.feed(
+        f"MESSAGE\ncontent-length:{len(body)}\n\n{body}\0MESSAGE\n\nnext\0"
+    )
+    assert [frame.body for frame in frames] == [body, "next"]
+
+
+def test_parse_content_length_counts_octets():
+    parser = StompParser()
+    body = '{"name":"Forno Cozinha ção"}'
+    length = len(body.encode())
+    assert parser.feed(f"MESSAGE\ncontent-length:{length}\n\n{body[:-3]}") == []
+    frames = parser.feed(f"{body[-3:]}\0")
+    assert [frame.body for frame in frames] == [body]
+
+
+def test_parse_bytes_and_crlf():
+    parser = StompParser()
+    frames = parser.feed(b"MESSAGE\r\nsubscription:1\r\n\r\nbody\0")
+    assert frames == [StompFrame("MESSAGE", {"subscription": "1"}, "body")]
+
+
+def test_parse_header_escapes():
+    parser = StompParser()
+    frames = parser.feed(
+        "ERROR\nmessage:Token Invalid\\c expired\nmessage:ignored\n\n\0"
+        "CONNECTED\nserver:a\\cb\n\n\0"
+    )
+    assert frames[0].headers == {"message": "Token Invalid: expired"}
+    # CONNECTED frames are not escaped
+    assert frames[1].headers == {"server": "a\\cb"}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "MESSAGE\ninvalid header\n\n\0",
+        "MESSAGE\nbad:escape\\t\n\n\0",
+        "MESSAGE\ncontent-length:2\n\nlonger\0",
+    ],
+)
+def test_parse_invalid_frames(data: str):
+    with pytest.raises(StompParseError):
+        StompParser().feed(data)
@@ -1,24 +1,31 @@
-import json
+import asyncio
 import logging
+import time
 from collections.abc import Callable
 from typing import Any
 
 import aiohttp
-import async_timeout
 
+from .attributestore import AttributeChange, AttributeStore
 from .auth import Auth
-from .backendselector import BackendSelector
+from .backendselector import (
+    ENDPOINT_APPLIANCE_COMMAND,
+    ENDPOINT_APPLIANCE_DATA,
+    BackendSelector,
+)
+from .metrics import RequestMetrics
+from .retrypolicy import DEFAULT_RETRY_POLICY, RetryPolicy
 from .types import ApplianceInfo
 
 LOGGER = logging.getLogger(__name__)
 
-REQUEST_RETRY_COUNT = 3
-
 ATTR_ONLINE = "Online"
 
 SETVAL_VALUE_OFF = "0"
 SETVAL_VALUE_ON = "1"
 
+AttrChangeCallback = Callable[[AttributeChange], None]
+
 
 class Appliance:
     """Whirlpool appliance class"""
@@ -29,14 +36,29 @@ class Appliance:
         auth: Auth,
         session: aiohttp.ClientSession,
         appliance_info: ApplianceInfo,
+        command_coalesce_window: float = 0,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        request_metrics: RequestMetrics | None = None,
     ):
         self._backend_selector = backend_selector
         self._auth = auth
         self._session = session
+        self._retry_policy = retry_policy
+        self._request_metrics = request_metrics
+
+        # Attribute writes issued within this many seconds of each other are
+        # merged into one setAttributes command. Disabled when 0.
+        self.command_coalesce_window = command_coalesce_window
+        self._pending_attributes: dict[str, str] | None = None
+        self._pending_command: asyncio.Task[bool] | None = None
 
         self._attr_changed: list[Callable] = []
-        self._data_dict: dict = {}
+        self._attr_change_callbacks: dict[str, list[AttrChangeCallback]] = {}
+        self._attr_prefix_change_callbacks: dict[str, list[AttrChangeCallback]] = {}
+        self._attributes = AttributeStore()
         self.appliance_info = appliance_info
+        # Monotonic time of the last successful request for this appliance
+        self.last_request_at: float | None = None
 
     def __repr__(self):
         return f"<{self.__class__.__name__}> {self.said} | {self.name}"
@@ -56,28 +78,59 @@ class Appliance:
         if not self._session:
             LOGGER.error("Session not started")
             return False
-        uri = self._backend_selector.get_appliance_data_url(self.said)
-        for _ in range(REQUEST_RETRY_COUNT):
-            async with async_timeout.timeout(30):
-                async with self._session.get(
-                    uri, headers=self._auth.create_headers()
-                ) as r:
-                    if r.status == 200:
-                        self._data_dict = json.loads(await r.text())
-                        for callback in self._attr_changed:
-                            callback()
-                        return True
-                    elif r.status == 401:
-                        LOGGER.error(
-                            "Fetching data failed (%s). Doing reauth", r.status
-                        )
-                        await self._auth.do_auth()
-                    else:
-                        LOGGER.error("Fetching data failed (%s)", r.status)
-        return False
+        r = await self._retry_policy.request(
+            self._session,
+            "GET",
+            self._backend_selector.get_appliance_data_url(self.said),
+            auth=self._auth,
+            endpoint=ENDPOINT_APPLIANCE_DATA,
+            metrics=self._request_metrics,
+        )
+        if not r.ok:
+            LOGGER.error("Fetching data failed (%s)", r.status)
+            return False
+        self.last_request_at = time.monotonic()
+
+        data = r.json()
+        self.load_attributes(data.get("attributes", {}))
+        return True
+
+    def load_attributes(self, attributes: dict[str, dict[str, Any]]):
+        """Replace all attributes with the `attributes` map of a data payload"""
+        self._notify_attr_changes(self._attributes.load(attributes))
+
+    def export_attributes(self) -> dict[str, dict[str, Any]]:
+        """Return all attributes in the shape of the data payload"""
+        return self._attributes.to_dict()
 
     async def send_attributes(self, attributes: dict[str, str]) -> bool:
-        """Send attributes to appliance api"""
+        """Send attributes to appliance api.
+
+        With command coalescing enabled, the attributes are merged with any
+        other writes within the window and all callers share one result. Later
+        writes to the same attribute override earlier ones.
+        """
+        if self.command_coalesce_window <= 0:
+            return await self._post_attributes(attributes)
+
+        if self._pending_attributes is None or self._pending_command is None:
+            self._pending_attributes = {}
+            self._pending_command = asyncio.get_running_loop().create_task(
+                self._send_pending_attributes()
+            )
+        self._pending_attributes.update(attributes)
+        # Shield the shared command so one cancelled caller does not cancel it
+        # for everyone else.
+        return await asyncio.shield(self._pending_command)
+
+    async def _send_pending_attributes(self) -> bool:
+        await asyncio.sleep(self.command_coalesce_window)
+        attributes = self._pending_attributes or {}
+        self._pending_attributes = None
+        self._pending_command = None
+        return await self._post_attributes(attributes)
+
+    async def _post_attributes(self, attributes: dict[str, str]) -> bool:
         if not self._session:
             LOGGER.error("Session not started")
             return False
@@ -88,21 +141,21 @@ class Appliance:
             "body": attributes,
             "header": {"said": self.said, "command": "setAttributes"},
         }
-        for _ in range(REQUEST_RETRY_COUNT):
-            async with async_timeout.timeout(30):
-                async with self._session.post(
-                    self._backend_selector.appliance_command_url,
-                    json=cmd_data,
-                    headers=self._auth.create_headers(),
-                ) as r:
-                    LOGGER.debug(f"Reply: {await r.text()}")
-                    if r.status == 200:
-                        return True
-                    elif r.status == 401:
-                        await self._auth.do_auth()
-                        continue
-                    LOGGER.error(f"Sending attributes failed ({r.status})")
-        return False
+        r = await self._retry_policy.request(
+            self._session,
+            "POST",
+            self._backend_selector.appliance_command_url,
+            auth=self._auth,
+            endpoint=ENDPOINT_APPLIANCE_COMMAND,
+            metrics=self._request_metrics,
+            json=cmd_data,
+        )
+        LOGGER.debug(f"Reply: {r.text()}")
+        if not r.ok:
+            LOGGER.error(f"Sending attributes failed ({r.status})")
+            return False
+        self.last_request_at = time.monotonic()
+        return True
 
     def register_attr_callback(self, update_callback: Callable):
         """Register Callback function."""
@@ -117,36 +170,87 @@ class Appliance:
         except ValueError:
             LOGGER.error("Attr callback not found")
 
+    def register_attr_change_callback(
+        self, attribute: str, callback: AttrChangeCallback, prefix: bool = False
+    ):
+        """Register a callback for value changes of one attribute.
+
+        With `prefix`, the callback fires for every attribute whose name starts
+        with `attribute`, e.g. `OvenUpperCavity_`.
+        """
+        callbacks = (
+            self._attr_prefix_change_callbacks
+            if prefix
+            else self._attr_change_callbacks
+        )
+        callbacks.setdefault(attribute, []).append(callback)
+        LOGGER.debug("Registered attr change callback for %s", attribute)
+
+    def unregister_attr_change_callback(
+        self, attribute: str, callback: AttrChangeCallback, prefix: bool = False
+    ):
+        """Unregister a callback registered with register_attr_change_callback."""
+        callbacks = (
+            self._attr_prefix_change_callbacks
+            if prefix
+            else self._attr_change_callbacks
+        )
+        attr_callbacks = callbacks.get(attribute, [])
+        if callback not in attr_callbacks:
+            LOGGER.error("Attr change callback not found")
+            return
+        attr_callbacks.remove(callback)
+        if not attr_callbacks:
+            del callbacks[attribute]
+        LOGGER.debug("Unregistered attr change callback for %s", attribute)
+
     def update_attributes(self, attrs: dict[str, Any], timestamp: int):
+        changes: list[AttributeChange] = []
         for attr, val in attrs.items():
-            if self.has_attribute(attr):
-                self._set_attribute(attr, str(val), timestamp)
+            change = self._set_attribute(attr, str(val), timestamp)
+            if change is not None:
+                changes.append(change)
+
+        self._notify_attr_changes(changes)
+
+    def _notify_attr_changes(self, changes: list[AttributeChange]):
+        if not changes:
+            return
+
+        if self._attr_change_callbacks or self._attr_prefix_change_callbacks:
+            for change in changes:
+                for callback in self._attr_change_callbacks.get(change.name, ()):
+                    callback(change)
+                for prefix, callbacks in self._attr_prefix_change_callbacks.items():
+                    if change.name.startswith(prefix):
+                        for callback in callbacks:
+                            callback(change)
 
         for callback in self._attr_changed:
             callback()
 
-    def _set_attribute(self, attribute: str, value: str, timestamp: int):
-        LOGGER.debug(f"Updating attribute {attribute} with {value} ({timestamp})")
-        self._data_dict["attributes"][attribute]["value"] = value
-        self._data_dict["attributes"][attribute]["updateTime"] = timestamp
+    def _set_attribute(
+        self, attribute: str, value: str, timestamp: int
+    ) -> AttributeChange | None:
+        change = self._attributes.set(attribute, value, timestamp)
+        if change is not None:
+            LOGGER.debug(f"Updated attribute {attribute} with {value} ({timestamp})")
+        return change
 
     def _get_attribute(self, attribute: str) -> str | None:
-        """Get attribute from local data dictionary"""
-        if not self.has_attribute(attribute):
-            return None
-        return self._data_dict["attributes"][attribute]["value"]
+        """Get attribute from local attribute store"""
+        return self._attributes.get(attribute)
 
     def _get_int_attribute(self, attribute: str) -> int | None:
-        """Get attribute from local data as int"""
-        val = self._get_attribute(attribute)
-        return None if val is None else int(val)
+        """Get attribute from local attribute store as int"""
+        return self._attributes.get_int(attribute)
 
     def has_attribute(self, attribute: str) -> bool:
-        """Check for attribute in local data dictionary"""
-        if not self._data_dict:
+        """Check for attribute in local attribute store"""
+        if not self._attributes:
             LOGGER.error("No data available")
             return False
-        return attribute in self._data_dict.get("attributes", {})
+        return attribute in self._attributes
 
     def bool_to_attr_value(self, b: bool) -> str:
         """Convert bool to attribute value"""
@@ -0,0 +1,152 @@
+from collections.abc import Hashable, Mapping
+from functools import partial
+from types import MappingProxyType
+
+from .appliance import ATTR_ONLINE, Appliance
+from .attributestore import AttributeChange
+from .types import ApplianceInfo
+
+EMPTY_VIEW: Mapping[str, Appliance] = MappingProxyType({})
+
+
+class _KeyIndex:
+    """Appliances grouped by one key, each group with a read-only view"""
+
+    __slots__ = ("_groups", "_views")
+
+    def __init__(self):
+        self._groups: dict[Hashable, dict[str, Appliance]] = {}
+        self._views: dict[Hashable, Mapping[str, Appliance]] = {}
+
+    def add(self, key: Hashable, appliance: Appliance):
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = {}
+            self._views[key] = MappingProxyType(group)
+        group[appliance.said] = appliance
+
+    def remove(self, key: Hashable, said: str):
+        group = self._groups.get(key)
+        if group is None:
+            return
+        group.pop(said, None)
+        if not group:
+            del self._groups[key]
+            del self._views[key]
+
+    def get(self, key: Hashable) -> Mapping[str, Appliance]:
+        return self._views.get(key, EMPTY_VIEW)
+
+
+class ApplianceIndex:
+    """Appliances by SAID, with secondary indexes maintained incrementally.
+
+    Lookups return live read-only views, so they neither copy nor allocate.
+    The online index follows the `Online` attribute of each appliance.
+    """
+
+    def __init__(self):
+        self._appliances: dict[str, Appliance] = {}
+        self._view: Mapping[str, Appliance] = MappingProxyType(self._appliances)
+        self._types = _KeyIndex()
+        self._categories = _KeyIndex()
+        self._data_models = _KeyIndex()
+        self._model_numbers = _KeyIndex()
+        self._online = _KeyIndex()
+        # The info and online state each appliance is indexed under
+        self._indexed_info: dict[str, ApplianceInfo] = {}
+        self._online_state: dict[str, bool | None] = {}
+        self._online_callbacks: dict[str, partial[None]] = {}
+        self._typed_lists: dict[type[Appliance], tuple[Appliance, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._appliances)
+
+    def __contains__(self, said: str) -> bool:
+        return said in self._appliances
+
+    @property
+    def appliances(self) -> Mapping[str, Appliance]:
+        return self._view
+
+    def add(self, appliance: Appliance):
+        said = appliance.said
+        if said in self._appliances:
+            self.remove(said)
+        self._appliances[said] = appliance
+        self._index_info(appliance)
+        self._types.add(type(appliance), appliance)
+        self._typed_lists.pop(type(appliance), None)
+
+        online = appliance.get_online()
+        self._online_state[said] = online
+        self._online.add(online, appliance)
+        callback = partial(self._on_online_change, appliance)
+        self._online_callbacks[said] = callback
+        appliance.register_attr_change_callback(ATTR_ONLINE, callback)
+
+    def remove(self, said: str) -> Appliance | None:
+        appliance = self._appliances.pop(said, None)
+        if appliance is None:
+            return None
+        self._unindex_info(said)
+        self._types.remove(type(appliance), said)
+        self._typed_lists.pop(type(appliance), None)
+
+        self._online.remove(self._online_state.pop(said), said)
+        appliance.unregister_attr_change_callback(
+            ATTR_ONLINE, self._online_callbacks.pop(said)
+        )
+        return appliance
+
+    def reindex(self, appliance: Appliance):
+        """Update the indexes after the info of an appliance changed"""
+        self._unindex_info(appliance.said)
+        self._index_info(appliance)
+
+    def by_type(self, appliance_class: type[Appliance]) -> Mapping[str, Appliance]:
+        return self._types.get(appliance_class)
+
+    def by_category(self, category: str) -> Mapping[str, Appliance]:
+        return self._categories.get(category)
+
+    def by_data_model(self, data_model: str) -> Mapping[str, Appliance]:
+        return self._data_models.get(data_model)
+
+    def by_model_number(self, model_number: str) -> Mapping[str, Appliance]:
+        return self._model_numbers.get(model_number)
+
+    def by_online(self, online: bool | None) -> Mapping[str, Appliance]:
+        """Appliances by online state, None if it is not known yet"""
+        return self._online.get(online)
+
+    def typed_list(self, appliance_class: type[Appliance]) -> tuple[Appliance, ...]:
+        """Appliances of a class as a tuple, rebuilt only when they change"""
+        appliances = self._typed_lists.get(appliance_class)
+        if appliances is None:
+            appliances = tuple(self._types.get(appliance_class).values())
+            self._typed_lists[appliance_class] = appliances
+        return appliances
+
+    def _index_info(self, appliance: Appliance):
+        info = appliance.appliance_info
+        self._indexed_info[info.said] = info
+        self._categories.add(info.category, appliance)
+        self._data_models.add(info.data_model, appliance)
+        self._model_numbers.add(info.model_number, appliance)
+
+    def _unindex_info(self, said: str):
+        info = self._indexed_info.pop(said)
+        self._categories.remove(info.category, said)
+        self._data_models.remove(info.data_model, said)
+        self._model_numbers.remove(info.model_number, said)
+
+    def _on_online_change(self, appliance: Appliance, change: AttributeChange):
+        online = appliance.attr_value_to_bool(change.new_value)
+        said = appliance.said
+        old = self._online_state.get(said)
+        if said not in self._appliances or old == online:
+            return
+        self._online.remove(old, said)
+        self._online.add(online, appliance)
+        self._online_state[said] = online
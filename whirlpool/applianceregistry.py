@@ -0,0 +1,112 @@
+import re
+from collections.abc import Iterable
+
+from .aircon import Aircon
+from .appliance import Appliance
+from .dryer import Dryer
+from .oven import Oven
+from .refrigerator import Refrigerator
+from .washer import Washer
+
+OVEN_MODELS = (
+    "cooking_minerva",
+    "cooking_vsi",
+    "cooking_u2",
+    "ddm_cooking_bio_std_tourmaline_v2",
+    "ddm_cooking_bio_self_clean_tourmaline_v2",
+    "ddm_cooking_bio_g3evo_pyro_bk_v1",
+    "ddm_cooking_bio_self_clean_meat_probe_tourmaline_bk_v1",
+    "ddm_cooking_bio_self_clean_steam_tourmaline_v2",  # <-- W9 Ovens
+    "ddm_cooking_bi_mwo_self_clean_steam_tourmaline_v2",  # <-- W9 MWOs
+    "ddm_cooking_bio_std_meat_probe_indigo_v2",
+    "ddm_cooking_ka_trs_bio_single_v1",
+)
+
+REFRIGERATOR_MODELS = ("ddm_ted_refrigerator_v12",)
+
+
+class ApplianceRegistry:
+    """Maps appliance data model keys to the classes that handle them.
+
+    Data models are matched case-insensitively: first against the exact
+    models, then against the patterns in registration order. The result for
+    each data model is cached, so classifying an appliance is a dict lookup.
+    """
+
+    def __init__(self):
+        self._models: dict[str, type[Appliance]] = {}
+        self._patterns: list[tuple[re.Pattern[str], type[Appliance]]] = []
+        self._cache: dict[str, type[Appliance] | None] = {}
+
+    def register(
+        self,
+        appliance_class: type[Appliance],
+        models: Iterable[str] = (),
+        patterns: Iterable[str] = (),
+    ):
+        """Handle the given data models, and the data models that contain a
+        match of one of the regular expression `patterns`, with
+        `appliance_class`.
+        """
+        for model in models:
+            self._models[model.lower()] = appliance_class
+        for pattern in patterns:
+            self._patterns.append((re.compile(pattern, re.IGNORECASE), appliance_class))
+        self._cache.clear()
+
+    def unregister(self, appliance_class: type[Appliance]):
+        self._models = {
+            model: cls
+            for model, cls in self._models.items()
+            if cls is not appliance_class
+        }
+        self._patterns = [
+            (pattern, cls)
+            for pattern, cls in self._patterns
+            if cls is not appliance_class
+        ]
+        self._cache.clear()
+
+    @property
+    def appliance_classes(self) -> list[type[Appliance]]:
+        """Registered classes, in registration order"""
+        classes = [*self._models.values(), *(cls for _, cls in self._patterns)]
+        return list(dict.fromkeys(classes))
+
+    def classify(self, data_model: str) -> type[Appliance] | None:
+        """Return the class for a data model, or None if it is not supported"""
+        key = data_model.lower()
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        appliance_class = self._models.get(key)
+        if appliance_class is None:
+            appliance_class = next(
+                (cls for pattern, cls in self._patterns if pattern.search(key)), None
+            )
+        self._cache[key] = appliance_class
+        return appliance_class
+
+
+def create_default_registry() -> ApplianceRegistry:
+    registry = ApplianceRegistry()
+    registry.register(Aircon, patterns=["airconditioner"])
+    registry.register(Dryer, patterns=["dryer"])
+    registry.register(Washer, patterns=["washer"])
+    # Data models that extend a known model are matched too
+    registry.register(
+        Oven, OVEN_MODELS, patterns=[re.escape(model) for model in OVEN_MODELS]
+    )
+    registry.register(
+        Refrigerator,
+        REFRIGERATOR_MODELS,
+        patterns=[re.escape(model) for model in REFRIGERATOR_MODELS],
+    )
+    return registry
+
+
+# Registry used by AppliancesManager unless another one is given. Third-party
+# appliance classes can be registered here.
+APPLIANCE_REGISTRY = create_default_registry()
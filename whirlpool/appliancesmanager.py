@@ -1,31 +1,153 @@
 import asyncio
-import json
 import logging
+import math
+import time
+import zlib
+from collections.abc import Iterable, Mapping
 from contextlib import suppress
-from functools import cached_property
-from typing import Any
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any, TypeVar, cast
 
 import aiohttp
 
 from whirlpool.eventsocket import EventSocket
 
+from . import jsoncodec
 from .aircon import Aircon
 from .appliance import Appliance
+from .applianceindex import ApplianceIndex
+from .applianceregistry import APPLIANCE_REGISTRY, ApplianceRegistry
 from .auth import Auth
-from .backendselector import BackendSelector
+from .backendselector import (
+    ENDPOINT_OWNED_APPLIANCES,
+    ENDPOINT_SHARED_APPLIANCES,
+    ENDPOINT_USER_DETAILS,
+    ENDPOINT_WEBSOCKET,
+    BackendSelector,
+)
 from .dryer import Dryer
+from .eventdispatcher import EVENT_QUEUE_SIZE, EventDispatcher, OverflowPolicy
+from .eventrecorder import FrameRecorder, ReplayResult, replay_recording
+from .metrics import DispatchMetrics, EventSocketMetrics, Histogram, RequestMetrics
 from .oven import Oven
+from .reconnect import DEFAULT_RECONNECT_STRATEGY, ReconnectStrategy
 from .refrigerator import Refrigerator
+from .retrypolicy import DEFAULT_RETRY_POLICY, RetryPolicy
+from .snapshot import (
+    ApplianceSnapshot,
+    SnapshotFormatError,
+    read_snapshot,
+    write_snapshot,
+)
 from .types import ApplianceInfo
 from .washer import Washer
 
 LOGGER = logging.getLogger(__name__)
 
+ApplianceT = TypeVar("ApplianceT", bound=Appliance)
+
 # The backend stops sending events over the websocket after a while unless
-# there is some REST activity on the account, so periodically fetch data for
-# one appliance to keep the event subscription alive.
+# there is some REST activity on the account, so a request is sent whenever
+# there was none for this long to keep the event subscription alive.
 KEEPALIVE_INTERVAL_SECONDS = 5 * 60
 
+# Maximum number of appliance data requests in flight during fetch_all_data.
+FETCH_ALL_CONCURRENCY = 10
+
+# Appliances restored from a snapshot older than this are refetched when the
+# event listener starts; younger ones are refreshed by the keepalive.
+SNAPSHOT_MAX_AGE = 60 * 60
+
+# The snapshot is saved this often while the event listener runs, so a crash
+# still leaves a recent one.
+SNAPSHOT_SAVE_INTERVAL = 5 * 60
+
+
+@dataclass(frozen=True, kw_only=True)
+class GapFillPolicy:
+    """Which appliances to refetch when an event socket (re)connects.
+
+    After an outage longer than `full_refresh_after` seconds every appliance
+    is refetched. After a shorter one only appliances that had events within
+    `active_window` seconds before it are refetched right away; the others
+    are refreshed one at a time by the keepalive.
+    """
+
+    full_refresh_after: float = 5 * 60
+    active_window: float = 10 * 60
+
+
+DEFAULT_GAP_FILL_POLICY = GapFillPolicy()
+
+
+@dataclass(frozen=True, kw_only=True)
+class KeepalivePolicy:
+    """How the keepalive keeps events flowing and checks a quiet event stream.
+
+    A keepalive request is only sent after `interval` seconds without any REST
+    request for the account's appliances. It fetches the data of an appliance,
+    or with `account_ping` the smaller user details. The ping is opt-in, as it
+    has not been verified to keep the event subscriptions alive.
+
+    After `quiet_after` seconds without events, the data of one appliance is
+    fetched as a probe, and the delay between probes doubles up to
+    `max_probe_interval` while the stream stays quiet. If a probe finds
+    changes that no event reported, the event sockets are restarted.
+    """
+
+    interval: float = KEEPALIVE_INTERVAL_SECONDS
+    account_ping: bool = False
+    quiet_after: float = 15 * 60
+    max_probe_interval: float = 2 * 60 * 60
+
+
+DEFAULT_KEEPALIVE_POLICY = KeepalivePolicy()
+
+
+def event_socket_shard(said: str, shards: int) -> int:
+    """Index of the event socket an appliance is subscribed on"""
+    # crc32 is stable across runs, unlike hash()
+    return zlib.crc32(said.encode()) % shards
+
+
+@dataclass
+class FetchAllResult:
+    """Outcome of fetching data for every appliance"""
+
+    results: dict[str, bool] = field(default_factory=dict)
+    errors: dict[str, Exception] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return not self.errors and all(self.results.values())
+
+
+@dataclass
+class ApplianceDiff:
+    """Changes to the appliance list found by a discovery"""
+
+    added: list[ApplianceInfo] = field(default_factory=list)
+    removed: list[ApplianceInfo] = field(default_factory=list)
+    changed: list[ApplianceInfo] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def parse_appliance_info(appliance: dict[str, Any]) -> ApplianceInfo:
+    """Create the info of an appliance from its appliance list entry"""
+    return ApplianceInfo(
+        said=appliance["SAID"],
+        name=appliance["APPLIANCE_NAME"],
+        data_model=appliance["DATA_MODEL_KEY"],
+        category=appliance["CATEGORY_NAME"],
+        model_number=appliance.get("MODEL_NO", ""),
+        serial_number=appliance.get("SERIAL", ""),
+    )
+
 
 class AppliancesManager:
     def __init__(
@@ -33,163 +155,333 @@ class AppliancesManager:
         backend_selector: BackendSelector,
         auth: Auth,
         session: aiohttp.ClientSession,
+        fetch_concurrency: int = FETCH_ALL_CONCURRENCY,
+        command_coalesce_window: float = 0,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        request_metrics: RequestMetrics | None = None,
+        event_queue_size: int = EVENT_QUEUE_SIZE,
+        event_overflow_policy: OverflowPolicy = OverflowPolicy.DropOldest,
+        event_socket_shards: int = 1,
+        gap_fill_policy: GapFillPolicy = DEFAULT_GAP_FILL_POLICY,
+        reconnect_strategy: ReconnectStrategy = DEFAULT_RECONNECT_STRATEGY,
+        frame_recorder: FrameRecorder | None = None,
+        keepalive_phase: float | None = None,
+        keepalive_policy: KeepalivePolicy = DEFAULT_KEEPALIVE_POLICY,
+        appliance_registry: ApplianceRegistry = APPLIANCE_REGISTRY,
+        snapshot_path: str | Path | None = None,
+        snapshot_max_age: float = SNAPSHOT_MAX_AGE,
+        snapshot_save_interval: float = SNAPSHOT_SAVE_INTERVAL,
     ):
         self._backend_selector = backend_selector
         self._auth = auth
         self._session: aiohttp.ClientSession = session
-        self._event_socket: EventSocket | None = None
+        self._fetch_concurrency = fetch_concurrency
+        self._command_coalesce_window = command_coalesce_window
+        self._retry_policy = retry_policy
+        # Share the auth metrics by default, so all requests are collected
+        self._request_metrics = (
+            request_metrics if request_metrics is not None else auth.request_metrics
+        )
+        if event_socket_shards < 1:
+            raise ValueError("event_socket_shards must be at least 1")
+        self._event_socket_shards = event_socket_shards
+        self._event_sockets: dict[int, EventSocket] = {}
+        self._event_socket_url: str | None = None
+        self._gap_fill_policy = gap_fill_policy
+        self._reconnect_strategy = reconnect_strategy
+        self._frame_recorder = frame_recorder
+        # Delay of the first keepalive, so many managers can spread theirs out
+        self._keepalive_phase = keepalive_phase
+        self._keepalive_policy = keepalive_policy
+        self._last_keepalive_at = -math.inf
+        # Monotonic time of the last event on any appliance, and the probes
+        # sent since
+        self._last_event_at = -math.inf
+        self._last_probe_at = -math.inf
+        self._quiet_probes = 0
+        self._probe_cursor = 0
+        # Monotonic times of the last event and the last successful fetch
+        self._last_event_time: dict[str, float] = {}
+        self._last_fetch_time: dict[str, float] = {}
+        # Receive time minus event timestamp, per appliance
+        self._event_lag: dict[str, Histogram] = {}
+        # Appliances whose refetch was deferred after a short outage
+        self._stale_saids: dict[str, None] = {}
+        self._event_dispatcher = EventDispatcher(
+            self._event_socket_callback,
+            event_queue_size,
+            event_overflow_policy,
+            self._on_event_dropped,
+        )
+        # Appliances whose events were dropped, refetched by _refetch_task
+        self._dropped_saids: dict[str, None] = {}
+        self._refetch_task: asyncio.Task[None] | None = None
         self._keepalive_task: asyncio.Task[None] | None = None
-        self._aircons: dict[str, Any] = {}
-        self._dryers: dict[str, Any] = {}
-        self._washers: dict[str, Any] = {}
-        self._ovens: dict[str, Any] = {}
-        self._refrigerators: dict[str, Any] = {}
-
-    @cached_property
-    def all_appliances(self) -> dict[str, Appliance]:
+        self._snapshot_path = Path(snapshot_path) if snapshot_path is not None else None
+        self._snapshot_max_age = snapshot_max_age
+        self._snapshot_save_interval = snapshot_save_interval
+        self._snapshot_task: asyncio.Task[None] | None = None
+        # Keeps writes in order, even when a caller is cancelled mid-write
+        self._snapshot_lock = asyncio.Lock()
+        # Appliances restored from the snapshot and not revalidated yet
+        self._restored_saids: set[str] = set()
+        self._revalidate_task: asyncio.Task[None] | None = None
+        self._appliance_registry = appliance_registry
+        self._appliance_index = ApplianceIndex()
+
+    @property
+    def all_appliances(self) -> Mapping[str, Appliance]:
+        """Read-only view of the appliances by SAID"""
+        return self._appliance_index.appliances
+
+    @property
+    def appliance_index(self) -> ApplianceIndex:
+        """Appliances by type, category, data model, model number and online state"""
+        return self._appliance_index
+
+    @property
+    def dispatch_metrics(self) -> DispatchMetrics:
+        """Metrics of the queue between the event socket and appliances"""
+        return self._event_dispatcher.metrics
+
+    @property
+    def event_socket_metrics(self) -> list[EventSocketMetrics]:
+        """Metrics of each event socket shard"""
+        return [
+            self._event_sockets[shard].metrics for shard in sorted(self._event_sockets)
+        ]
+
+    @property
+    def event_lag_metrics(self) -> dict[str, Histogram]:
+        """Seconds between each appliance's event timestamps and receiving them"""
+        return self._event_lag
+
+    def event_stream_metrics(self) -> dict[str, Any]:
+        """Return the health metrics of the event stream as JSON-serializable data"""
         return {
-            **self._aircons,
-            **self._dryers,
-            **self._washers,
-            **self._ovens,
-            **self._refrigerators,
+            "event_sockets": [
+                metrics.as_dict() for metrics in self.event_socket_metrics
+            ],
+            "dispatch": self.dispatch_metrics.as_dict(),
+            "event_lag": {
+                said: histogram.as_dict() for said, histogram in self._event_lag.items()
+            },
         }
 
+    def appliances_of_type(self, appliance_class: type[ApplianceT]) -> list[ApplianceT]:
+        """Return a new list of the appliances handled by `appliance_class`"""
+        appliances = self._appliance_index.typed_list(appliance_class)
+        return cast(list[ApplianceT], list(appliances))
+
     @property
     def aircons(self) -> list[Aircon]:
-        return list(self._aircons.values())
+        return self.appliances_of_type(Aircon)
 
     @property
     def dryers(self) -> list[Dryer]:
-        return list(self._dryers.values())
+        return self.appliances_of_type(Dryer)
 
     @property
     def washers(self) -> list[Washer]:
-        return list(self._washers.values())
+        return self.appliances_of_type(Washer)
 
     @property
     def ovens(self) -> list[Oven]:
-        return list(self._ovens.values())
+        return self.appliances_of_type(Oven)
 
     @property
     def refrigerators(self) -> list[Refrigerator]:
-        return list(self._refrigerators.values())
-
-    def _add_appliance(self, appliance: dict[str, Any]) -> None:
-        appliance_data = ApplianceInfo(
-            said=appliance["SAID"],
-            name=appliance["APPLIANCE_NAME"],
-            data_model=appliance["DATA_MODEL_KEY"],
-            category=appliance["CATEGORY_NAME"],
-            model_number=appliance.get("MODEL_NO", ""),
-            serial_number=appliance.get("SERIAL", ""),
-        )
+        return self.appliances_of_type(Refrigerator)
 
-        data_model = appliance["DATA_MODEL_KEY"].lower()
-
-        oven_models = [
-            "cooking_minerva",
-            "cooking_vsi",
-            "cooking_u2",
-            "ddm_cooking_bio_std_tourmaline_v2",
-            "ddm_cooking_bio_self_clean_tourmaline_v2",
-            "ddm_cooking_bio_g3evo_pyro_bk_v1",
-            "ddm_cooking_bio_self_clean_meat_probe_tourmaline_bk_v1",
-            "ddm_cooking_bio_self_clean_steam_tourmaline_v2",  # <-- W9 Ovens
-            "ddm_cooking_bi_mwo_self_clean_steam_tourmaline_v2",  # <-- W9 MWOs
-            "ddm_cooking_bio_std_meat_probe_indigo_v2",
-            "ddm_cooking_ka_trs_bio_single_v1",
-        ]
+    def _add_appliance(self, appliance_data: ApplianceInfo) -> bool:
+        appliance_class = self._appliance_registry.classify(appliance_data.data_model)
+        if appliance_class is None:
+            LOGGER.warning(
+                "Unsupported appliance data model %s", appliance_data.data_model
+            )
+            return False
 
         LOGGER.debug("Adding appliance %s", appliance_data)
-        if "airconditioner" in data_model:
-            self._aircons[appliance_data.said] = Aircon(
-                self._backend_selector, self._auth, self._session, appliance_data
-            )
-        elif "dryer" in data_model:
-            self._dryers[appliance_data.said] = Dryer(
-                self._backend_selector, self._auth, self._session, appliance_data
-            )
-        elif "washer" in data_model:
-            self._washers[appliance_data.said] = Washer(
-                self._backend_selector, self._auth, self._session, appliance_data
-            )
-        elif any(model in data_model for model in oven_models):
-            self._ovens[appliance_data.said] = Oven(
-                self._backend_selector, self._auth, self._session, appliance_data
-            )
-        elif "ddm_ted_refrigerator_v12" in data_model:
-            self._refrigerators[appliance_data.said] = Refrigerator(
-                self._backend_selector, self._auth, self._session, appliance_data
-            )
-        else:
-            LOGGER.warning("Unsupported appliance data model %s", data_model)
+        appliance = appliance_class(
+            self._backend_selector,
+            self._auth,
+            self._session,
+            appliance_data,
+            command_coalesce_window=self._command_coalesce_window,
+            retry_policy=self._retry_policy,
+            request_metrics=self._request_metrics,
+        )
+        self._appliance_index.add(appliance)
+        return True
+
+    def _update_appliance(self, appliance: Appliance, appliance_data: ApplianceInfo):
+        """Update the info of an appliance, keeping its data and callbacks"""
+        appliance_class = self._appliance_registry.classify(appliance_data.data_model)
+        if appliance_class is type(appliance):
+            LOGGER.debug("Updating appliance %s", appliance_data)
+            appliance.appliance_info = appliance_data
+            self._appliance_index.reindex(appliance)
             return
 
-        # Invalidate cached property
-        self.__dict__.pop("all_appliances", None)
-
-    async def _get_owned_appliances(self, account_id: str) -> bool:
-        async with self._session.get(
+        # A different data model needs another class, so the object is replaced
+        self._remove_appliance(appliance_data.said)
+        self._add_appliance(appliance_data)
+
+    def _remove_appliance(self, said: str) -> None:
+        LOGGER.debug("Removing appliance %s", said)
+        self._appliance_index.remove(said)
+        self._last_event_time.pop(said, None)
+        self._last_fetch_time.pop(said, None)
+        self._event_lag.pop(said, None)
+        self._stale_saids.pop(said, None)
+        self._restored_saids.discard(said)
+
+    async def _get_owned_appliances(
+        self, account_id: str
+    ) -> list[ApplianceInfo] | None:
+        r = await self._retry_policy.request(
+            self._session,
+            "GET",
             self._backend_selector.get_owned_appliances_url(account_id),
-            headers=self._auth.create_headers(),
-        ) as r:
-            if r.status != 200:
-                LOGGER.error("Failed to get appliances: %s", r.status)
-                return False
-
-            data = await r.json()
-            LOGGER.debug("Owned appliances data: %s", data)
-            locations: dict[str, Any] = data[account_id]
-            appliances = [
-                appliance
-                for location in locations.values()
-                for appliance in [
-                    *location["legacyAppliance"],
-                    *location["tsAppliance"],
-                ]
+            auth=self._auth,
+            endpoint=ENDPOINT_OWNED_APPLIANCES,
+            metrics=self._request_metrics,
+        )
+        if not r.ok:
+            LOGGER.error("Failed to get appliances: %s", r.status)
+            return None
+
+        data = r.json()
+        LOGGER.debug("Owned appliances data: %s", data)
+        locations: dict[str, Any] = data[account_id]
+        return [
+            parse_appliance_info(appliance)
+            for location in locations.values()
+            for appliance in [
+                *location["legacyAppliance"],
+                *location["tsAppliance"],
             ]
-            for appliance in appliances:
-                self._add_appliance(appliance)
-
-            return True
-
-    async def _get_shared_appliances(self) -> bool:
-        headers = self._auth.create_headers()
-        headers["WP-CLIENT-BRAND"] = self._backend_selector.brand.name
-
-        async with self._session.get(
-            self._backend_selector.shared_appliances_url, headers=headers
-        ) as r:
-            if r.status != 200:
-                LOGGER.warning(
-                    "Failed to get shared appliances: %s. Not all regions/brands"
-                    " support sharing, so this can be ignored for those.",
-                    r.status,
-                )
-                return False
+        ]
 
-            data = await r.json()
-            locations: list[dict[str, Any]] = data["sharedAppliances"]
-            for appliances in locations:
-                for appliance in appliances["appliances"]:
-                    self._add_appliance(appliance)
+    async def _get_shared_appliances(self) -> list[ApplianceInfo] | None:
+        r = await self._retry_policy.request(
+            self._session,
+            "GET",
+            self._backend_selector.shared_appliances_url,
+            auth=self._auth,
+            headers={"WP-CLIENT-BRAND": self._backend_selector.brand.name},
+            endpoint=ENDPOINT_SHARED_APPLIANCES,
+            metrics=self._request_metrics,
+        )
+        if not r.ok:
+            LOGGER.warning(
+                "Failed to get shared appliances: %s. Not all regions/brands"
+                " support sharing, so this can be ignored for those.",
+                r.status,
+            )
+            return None
 
-            return True
+        locations: list[dict[str, Any]] = r.json()["sharedAppliances"]
+        return [
+            parse_appliance_info(appliance)
+            for appliances in locations
+            for appliance in appliances["appliances"]
+        ]
 
     async def fetch_appliances(self) -> bool:
-        account_id = await self._auth.get_account_id()
-        if not account_id:
-            return False
+        return await self.discover_appliances() is not None
 
-        success_owned = await self._get_owned_appliances(account_id)
-        success_shared = await self._get_shared_appliances()
+    async def discover_appliances(self) -> ApplianceDiff | None:
+        """Fetch the appliance list and apply the changes since the last one.
 
-        return success_owned or success_shared
+        Owned and shared appliances are listed concurrently. Appliances that
+        are still listed keep their object, data and callbacks. Returns None
+        if neither list could be fetched.
+        """
+        account_id = await self._auth.get_account_id()
+        if not account_id:
+            return None
 
-    async def fetch_all_data(self):
-        for appliance in self.all_appliances.values():
-            await appliance.fetch_data()
+        owned, shared = await asyncio.gather(
+            self._get_owned_appliances(account_id), self._get_shared_appliances()
+        )
+        if owned is None and shared is None:
+            return None
+        listed = {info.said: info for info in [*(owned or ()), *(shared or ())]}
+
+        known = dict(self.all_appliances)
+        diff = ApplianceDiff()
+        replaced: list[str] = []
+        for said, info in listed.items():
+            appliance = known.get(said)
+            if appliance is None:
+                if self._add_appliance(info):
+                    diff.added.append(info)
+            elif appliance.appliance_info != info:
+                self._update_appliance(appliance, info)
+                diff.changed.append(info)
+                if self.all_appliances.get(said) is not appliance:
+                    replaced.append(said)
+
+        # Only a complete listing tells which appliances were removed
+        if owned is not None and shared is not None:
+            for said in known.keys() - listed.keys():
+                diff.removed.append(known[said].appliance_info)
+                self._remove_appliance(said)
+
+        if diff:
+            LOGGER.debug(
+                "Discovered %d new, %d changed and %d removed appliances",
+                len(diff.added),
+                len(diff.changed),
+                len(diff.removed),
+            )
+        await self._update_event_subscriptions(set(known))
+        if replaced and self._event_socket_url is not None:
+            await self.fetch_data_for(replaced)
+        return diff
+
+    async def fetch_all_data(self, concurrency: int | None = None) -> FetchAllResult:
+        """Fetch data for all appliances, at most `concurrency` at a time.
+
+        A failing appliance is recorded in the result instead of aborting the
+        remaining fetches.
+        """
+        return await self.fetch_data_for(self.all_appliances, concurrency)
+
+    async def fetch_data_for(
+        self, saids: Iterable[str], concurrency: int | None = None
+    ) -> FetchAllResult:
+        """Fetch data for the given appliances, like fetch_all_data"""
+        appliances = [
+            self.all_appliances[said] for said in saids if said in self.all_appliances
+        ]
+        limit = max(1, concurrency or self._fetch_concurrency)
+        semaphore = asyncio.Semaphore(limit)
+        result = FetchAllResult()
+        start = time.monotonic()
+
+        async def fetch(appliance: Appliance) -> None:
+            async with semaphore:
+                try:
+                    ok = await appliance.fetch_data()
+                    result.results[appliance.said] = ok
+                    if ok:
+                        self._mark_fetched(appliance.said)
+                except Exception as ex:
+                    LOGGER.warning("Fetching data for %s failed: %s", appliance, ex)
+                    result.results[appliance.said] = False
+                    result.errors[appliance.said] = ex
+
+        await asyncio.gather(*(fetch(appliance) for appliance in appliances))
+        result.elapsed = time.monotonic() - start
+        LOGGER.debug(
+            "Fetched data for %d appliances in %.2fs (%d failed)",
+            len(result.results),
+            result.elapsed,
+            sum(not ok for ok in result.results.values()),
+        )
+        return result
 
     async def connect(self):
         """Connect to appliance event listener"""
@@ -201,24 +493,41 @@ class AppliancesManager:
 
     async def start_event_listener(self):
         """Start the appliance event listener"""
-        await self.fetch_all_data()
-        if self._event_socket is not None:
-            LOGGER.warning("Event socket not None when starting event listener")
-
-        self._event_socket = EventSocket(
-            await self._getWebsocketUrl(),
-            self._auth,
-            list(self.all_appliances.keys()),
-            self._event_socket_callback,
-            self.fetch_all_data,
-            self._session,
+        if self._restored_saids:
+            await self.fetch_data_for(
+                said for said in self.all_appliances if said not in self._restored_saids
+            )
+            self._revalidate_task = asyncio.get_event_loop().create_task(
+                self._revalidate_snapshot()
+            )
+        else:
+            await self.fetch_all_data()
+        if self._event_sockets:
+            LOGGER.warning("Event sockets exist when starting event listener")
+
+        self._event_dispatcher.start()
+        self._event_socket_url = await self._getWebsocketUrl()
+        self._last_event_at = time.monotonic()
+        shards: dict[int, list[str]] = {}
+        for said in self.all_appliances:
+            shard = event_socket_shard(said, self._event_socket_shards)
+            shards.setdefault(shard, []).append(said)
+        for shard, saids in shards.items():
+            self._start_event_socket(shard, saids)
+        LOGGER.debug(
+            "Started %d event sockets for %d appliances",
+            len(self._event_sockets),
+            len(self.all_appliances),
         )
-        self._event_socket.start()
 
         if self._keepalive_task is None:
             self._keepalive_task = asyncio.get_event_loop().create_task(
                 self._keepalive()
             )
+        if self._snapshot_path is not None and self._snapshot_task is None:
+            self._snapshot_task = asyncio.get_event_loop().create_task(
+                self._save_snapshot_periodically()
+            )
 
     async def stop_event_listener(self):
         """Stop the appliance event listener"""
@@ -227,44 +536,430 @@ class AppliancesManager:
             with suppress(asyncio.CancelledError):
                 await self._keepalive_task
             self._keepalive_task = None
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._snapshot_task
+            self._snapshot_task = None
+        if self._revalidate_task is not None:
+            self._revalidate_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._revalidate_task
+            self._revalidate_task = None
+        self._restored_saids.clear()
+        if self._refetch_task is not None:
+            self._refetch_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._refetch_task
+            self._refetch_task = None
+        self._dropped_saids.clear()
+
+        if not self._event_sockets:
+            LOGGER.warning("No event sockets to stop")
+        await asyncio.gather(
+            *(event_socket.stop() for event_socket in self._event_sockets.values())
+        )
+        self._event_sockets = {}
+        self._event_socket_url = None
+        await self._event_dispatcher.stop()
+        if self._snapshot_path is not None:
+            await self.save_snapshot()
+
+    def _start_event_socket(self, shard: int, saids: list[str]) -> EventSocket:
+        assert self._event_socket_url is not None
+        event_socket = EventSocket(
+            self._event_socket_url,
+            self._auth,
+            saids,
+            self._event_dispatcher.put,
+            partial(self._on_event_socket_up, shard),
+            self._session,
+            reconnect_strategy=self._reconnect_strategy,
+            recorder=self._frame_recorder,
+        )
+        event_socket.start()
+        self._event_sockets[shard] = event_socket
+        return event_socket
+
+    async def _on_event_socket_up(self, shard: int):
+        event_socket = self._event_sockets.get(shard)
+        if event_socket is not None:
+            saids = event_socket.said_list
+            if event_socket.disconnected_at is None and self._restored_saids:
+                # Restored appliances are revalidated by _revalidate_snapshot
+                saids = [said for said in saids if said not in self._restored_saids]
+            saids = self._gap_fill_saids(saids, event_socket.disconnected_at)
+            await self.fetch_data_for(saids)
+
+    def _gap_fill_saids(
+        self, saids: list[str], disconnected_at: float | None
+    ) -> list[str]:
+        """Appliances to refetch after a connection, most recently active first"""
+        now = time.monotonic()
+        selected: list[str] = []
+        for said in saids:
+            fetched = self._last_fetch_time.get(said)
+            if fetched is None:
+                selected.append(said)
+                continue
+            last_event = self._last_event_time.get(said)
+            # Events are missed from the disconnection (or, on the first
+            # connection, from the last update) until now
+            gap_start = disconnected_at or max(fetched, last_event or fetched)
+            active = (
+                last_event is not None
+                and gap_start - last_event <= self._gap_fill_policy.active_window
+            )
+            if active or now - gap_start > self._gap_fill_policy.full_refresh_after:
+                selected.append(said)
+            elif disconnected_at is not None:
+                self._stale_saids[said] = None
+            # On the first connection, an appliance fetched within the gap
+            # window missed nothing that the keepalive would need to refresh
+
+        # Appliances in a cycle send events often, so refresh them first
+        selected.sort(key=lambda said: -self._last_event_time.get(said, -math.inf))
+        LOGGER.debug(
+            "Gap fill refetches %d of %d appliances", len(selected), len(saids)
+        )
+        return selected
+
+    def _mark_fetched(self, said: str):
+        self._last_fetch_time[said] = time.monotonic()
+        self._stale_saids.pop(said, None)
+
+    async def _update_event_subscriptions(self, known_saids: set[str]):
+        """Update the live subscriptions after the appliance list changed"""
+        if self._event_socket_url is None:
+            return
+        current_saids = set(self.all_appliances)
+        added = current_saids - known_saids
+        removed = known_saids - current_saids
+        if not added and not removed:
+            return
+        LOGGER.debug("Subscribing to %s, unsubscribing from %s", added, removed)
 
-        if self._event_socket is None:
-            LOGGER.warning("Event socket is None")
+        for said in removed:
+            shard = event_socket_shard(said, self._event_socket_shards)
+            event_socket = self._event_sockets.get(shard)
+            if event_socket is None:
+                continue
+            await event_socket.unsubscribe(said)
+            if not event_socket.said_list:
+                del self._event_sockets[shard]
+                await event_socket.stop()
+
+        if not added:
             return
-        await self._event_socket.stop()
-        self._event_socket = None
+        await self.fetch_data_for(added)
+        for said in added:
+            shard = event_socket_shard(said, self._event_socket_shards)
+            event_socket = self._event_sockets.get(shard)
+            if event_socket is None:
+                self._start_event_socket(shard, [said])
+            else:
+                await event_socket.subscribe(said)
 
     async def _keepalive(self):
-        """Periodically fetch data for one appliance to keep events flowing."""
+        """Keep events flowing, and probe the event stream when it goes quiet"""
+        if self._keepalive_phase is not None:
+            await asyncio.sleep(self._keepalive_phase)
+            await self._keepalive_request()
         while True:
-            await asyncio.sleep(KEEPALIVE_INTERVAL_SECONDS)
+            await asyncio.sleep(self._keepalive_delay())
+            now = time.monotonic()
+            if now >= self._next_probe_at():
+                await self._probe_event_stream()
+            elif now - self._last_rest_activity() >= self._keepalive_policy.interval:
+                await self._keepalive_request()
+
+    def _last_rest_activity(self) -> float:
+        """Monotonic time of the last request for the account's appliances"""
+        last = self._last_keepalive_at
+        for appliance in self.all_appliances.values():
+            if appliance.last_request_at is not None:
+                last = max(last, appliance.last_request_at)
+        return last
+
+    def _quiet_probes_sent(self) -> int:
+        # Probes back off while the stream stays quiet, and restart after events
+        if self._last_probe_at < self._last_event_at:
+            return 0
+        return self._quiet_probes
+
+    def _next_probe_at(self) -> float:
+        policy = self._keepalive_policy
+        probes = min(self._quiet_probes_sent(), 32)
+        delay = min(policy.quiet_after * 2**probes, policy.max_probe_interval)
+        return max(self._last_event_at, self._last_probe_at) + delay
+
+    def _keepalive_delay(self) -> float:
+        due = min(
+            self._last_rest_activity() + self._keepalive_policy.interval,
+            self._next_probe_at(),
+        )
+        return max(0.0, due - time.monotonic())
+
+    async def _keepalive_request(self):
+        self._last_keepalive_at = time.monotonic()
+        # Prefer an appliance whose refetch was deferred by the gap fill
+        said = next(iter(self._stale_saids), None)
+        if said is None and self._keepalive_policy.account_ping:
+            await self._ping_account()
+            return
+        if said is not None:
+            appliance = self.all_appliances.get(said)
+        else:
             appliance = next(iter(self.all_appliances.values()), None)
-            if appliance is None:
+        if appliance is None:
+            return
+        try:
+            if await appliance.fetch_data():
+                self._mark_fetched(appliance.said)
+        except Exception as ex:
+            LOGGER.warning("Keepalive fetch failed: %s", ex)
+
+    async def _ping_account(self):
+        try:
+            r = await self._retry_policy.request(
+                self._session,
+                "GET",
+                self._backend_selector.user_details_url,
+                auth=self._auth,
+                endpoint=ENDPOINT_USER_DETAILS,
+                metrics=self._request_metrics,
+            )
+        except Exception as ex:
+            LOGGER.warning("Keepalive ping failed: %s", ex)
+            return
+        if not r.ok:
+            LOGGER.warning("Keepalive ping failed (%s)", r.status)
+
+    async def _probe_event_stream(self):
+        """Fetch an appliance and restart the event sockets if it missed events"""
+        self._quiet_probes = self._quiet_probes_sent() + 1
+        self._last_probe_at = time.monotonic()
+        saids = list(self.all_appliances)
+        if not saids:
+            return
+        said = next(iter(self._stale_saids), None)
+        if said is None:
+            said = saids[self._probe_cursor % len(saids)]
+            self._probe_cursor += 1
+        appliance = self.all_appliances[said]
+
+        changed = False
+
+        def on_change():
+            nonlocal changed
+            changed = True
+
+        appliance.register_attr_callback(on_change)
+        try:
+            if await appliance.fetch_data():
+                self._mark_fetched(said)
+        except Exception as ex:
+            LOGGER.warning("Event stream probe failed: %s", ex)
+            return
+        finally:
+            appliance.unregister_attr_callback(on_change)
+
+        if changed and self._last_event_at < self._last_probe_at:
+            LOGGER.warning(
+                "Probe of %s found changes without events, restarting event sockets",
+                said,
+            )
+            await self._restart_event_sockets()
+
+    async def _restart_event_sockets(self):
+        event_sockets = self._event_sockets
+        self._event_sockets = {}
+        await asyncio.gather(
+            *(event_socket.stop() for event_socket in event_sockets.values())
+        )
+        for shard, event_socket in event_sockets.items():
+            self._start_event_socket(shard, event_socket.said_list)
+        self._last_event_at = time.monotonic()
+
+    def restore_snapshot(self) -> bool:
+        """Restore appliances and their attributes from the snapshot file.
+
+        Call it before connecting, so the appliances can be used right away.
+        Appliances that were fetched already are left alone.
+        """
+        if self._snapshot_path is None:
+            return False
+        try:
+            snapshots = read_snapshot(self._snapshot_path)
+        except FileNotFoundError:
+            return False
+        except (OSError, SnapshotFormatError) as ex:
+            LOGGER.warning("Ignoring snapshot: %s", ex)
+            return False
+
+        now = time.monotonic()
+        wall_now = time.time()
+        for snapshot in snapshots:
+            said = snapshot.info.said
+            if said in self._last_fetch_time:
+                continue
+            if said not in self.all_appliances and not self._add_appliance(
+                snapshot.info
+            ):
+                continue
+            self.all_appliances[said].load_attributes(snapshot.attributes)
+            age = max(0.0, wall_now - snapshot.updated_at)
+            self._last_fetch_time[said] = now - age
+            self._restored_saids.add(said)
+        LOGGER.debug("Restored %d appliances from snapshot", len(self._restored_saids))
+        return bool(self._restored_saids)
+
+    async def save_snapshot(self) -> bool:
+        """Write the appliances with data and their attributes to the snapshot.
+
+        The attributes are copied on the event loop, and the file is written
+        from a thread, so a large fleet does not block the loop.
+        """
+        if self._snapshot_path is None:
+            return False
+        now = time.monotonic()
+        wall_now = time.time()
+        snapshots: list[ApplianceSnapshot] = []
+        for said, appliance in self.all_appliances.items():
+            # Events keep the attributes current after the last fetch
+            updated = max(
+                self._last_fetch_time.get(said, -math.inf),
+                self._last_event_time.get(said, -math.inf),
+            )
+            if updated == -math.inf:
                 continue
+            snapshots.append(
+                ApplianceSnapshot(
+                    appliance.appliance_info,
+                    appliance.export_attributes(),
+                    wall_now - (now - updated),
+                )
+            )
+        return await asyncio.shield(
+            self._write_snapshot(self._snapshot_path, snapshots)
+        )
+
+    async def _write_snapshot(
+        self, path: Path, snapshots: list[ApplianceSnapshot]
+    ) -> bool:
+        async with self._snapshot_lock:
             try:
-                await appliance.fetch_data()
-            except Exception as ex:
-                LOGGER.warning("Keepalive fetch failed: %s", ex)
+                await asyncio.to_thread(write_snapshot, path, snapshots)
+            except OSError as ex:
+                LOGGER.warning("Saving snapshot failed: %s", ex)
+                return False
+        return True
+
+    async def _save_snapshot_periodically(self):
+        while True:
+            await asyncio.sleep(self._snapshot_save_interval)
+            await self.save_snapshot()
+
+    async def _revalidate_snapshot(self):
+        """Refetch the restored appliances whose snapshot is too old"""
+        cutoff = time.monotonic() - self._snapshot_max_age
+        expired: list[str] = []
+        for said in self._restored_saids:
+            if self._last_fetch_time.get(said, -math.inf) < cutoff:
+                expired.append(said)
+            else:
+                self._stale_saids[said] = None
+        LOGGER.debug(
+            "Revalidating %d of %d restored appliances",
+            len(expired),
+            len(self._restored_saids),
+        )
+        await self.fetch_data_for(expired)
 
-    def _event_socket_callback(self, msg: str):
-        json_msg = json.loads(msg)
+    async def replay_events(
+        self, path: str | Path, speed: float | None = None
+    ) -> ReplayResult:
+        """Apply the events of a frame recording to the appliances.
+
+        Frames are parsed and applied like live events, but do not count as
+        appliance activity or add to the event lag. See replay_recording for
+        `speed`.
+        """
+        return await replay_recording(path, self._replay_event, speed)
+
+    def _decode_event(self, msg: str) -> tuple[Appliance, dict[str, Any]] | None:
+        json_msg = jsoncodec.loads(msg)
         said = json_msg["said"]
         app = self.all_appliances.get(said)
         if app is None:
             LOGGER.warning("Received message for unknown appliance %s", said)
+            return None
+        return app, json_msg
+
+    def _replay_event(self, msg: str):
+        event = self._decode_event(msg)
+        if event is not None:
+            app, json_msg = event
+            app.update_attributes(json_msg["attributeMap"], json_msg["timestamp"])
+
+    def _event_socket_callback(self, msg: str, received_at: float | None = None):
+        """Apply an event, received at Unix time `received_at` (default now)"""
+        event = self._decode_event(msg)
+        if event is None:
+            return
+        app, json_msg = event
+        said = app.said
+        self._last_event_time[said] = self._last_event_at = time.monotonic()
+        timestamp = json_msg["timestamp"]
+        lag = self._event_lag.get(said)
+        if lag is None:
+            lag = self._event_lag[said] = Histogram()
+        # Event timestamps are in milliseconds
+        if received_at is None:
+            received_at = time.time()
+        lag.observe(max(0.0, received_at - timestamp / 1000))
+        app.update_attributes(json_msg["attributeMap"], timestamp)
+
+    def _on_event_dropped(self, msg: str):
+        """Refetch the appliance of a dropped event, as its state is now unknown"""
+        try:
+            said = jsoncodec.loads(msg)["said"]
+        except (ValueError, TypeError, KeyError) as ex:
+            LOGGER.warning("Dropped an event without a SAID: %s", ex)
             return
-        app.update_attributes(json_msg["attributeMap"], json_msg["timestamp"])
+        if said not in self.all_appliances:
+            return
+        self._dropped_saids[said] = None
+        if self._refetch_task is None:
+            self._refetch_task = asyncio.get_event_loop().create_task(
+                self._refetch_dropped()
+            )
+
+    async def _refetch_dropped(self):
+        try:
+            # Events dropped during a fetch are refetched by the next round
+            while self._dropped_saids:
+                saids = list(self._dropped_saids)
+                self._dropped_saids.clear()
+                await self.fetch_data_for(saids)
+        finally:
+            self._refetch_task = None
 
     async def _getWebsocketUrl(self) -> str:
         DEFAULT_WS_URL = "wss://ws.emeaprod.aws.whrcloud.com/appliance/websocket"
-        async with self._session.get(
-            self._backend_selector.websocket_url, headers=self._auth.create_headers()
-        ) as r:
-            if r.status != 200:
-                LOGGER.error("Failed to get websocket url: %s", r.status)
-                return DEFAULT_WS_URL
-            try:
-                return json.loads(await r.text())["url"]
-            except KeyError:
-                LOGGER.exception("Failed to read websocket url")
-                return DEFAULT_WS_URL
+        r = await self._retry_policy.request(
+            self._session,
+            "GET",
+            self._backend_selector.websocket_url,
+            auth=self._auth,
+            endpoint=ENDPOINT_WEBSOCKET,
+            metrics=self._request_metrics,
+        )
+        if not r.ok:
+            LOGGER.error("Failed to get websocket url: %s", r.status)
+            return DEFAULT_WS_URL
+        try:
+            return r.json()["url"]
+        except KeyError:
+            LOGGER.exception("Failed to read websocket url")
+            return DEFAULT_WS_URL
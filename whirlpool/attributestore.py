@@ -0,0 +1,118 @@
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+_NOT_DECODED: Any = object()
+
+
+@dataclass(frozen=True, slots=True)
+class AttributeChange:
+    """Change of a single attribute value"""
+
+    name: str
+    old_value: str | None
+    new_value: str
+    timestamp: int
+
+
+class AttributeEntry:
+    """Single appliance attribute value with its update time"""
+
+    __slots__ = ("value", "update_time", "_int_value")
+
+    def __init__(self, value: str, update_time: int):
+        self.value = value
+        self.update_time = update_time
+        self._int_value: int | None = _NOT_DECODED
+
+    def __repr__(self):
+        return f"<AttributeEntry> {self.value} ({self.update_time})"
+
+    def set(self, value: str, update_time: int) -> bool:
+        """Write the entry. Returns True if the value changed."""
+        self.update_time = update_time
+        if value == self.value:
+            return False
+        self.value = value
+        self._int_value = _NOT_DECODED
+        return True
+
+    def as_int(self) -> int:
+        """Return the value as int, decoding it only once per write"""
+        if self._int_value is _NOT_DECODED:
+            self._int_value = int(self.value)
+        return self._int_value  # type: ignore[return-value]
+
+
+class AttributeStore:
+    """Attribute table of an appliance, keyed by attribute name"""
+
+    __slots__ = ("_entries",)
+
+    def __init__(self):
+        self._entries: dict[str, AttributeEntry] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def load(self, attributes: dict[str, dict[str, Any]]) -> list[AttributeChange]:
+        """Replace all entries with the `attributes` map of a data payload.
+
+        Entries whose value did not change are kept, along with their decoded
+        value. Returns the attributes that are new or changed value.
+        """
+        old_entries = self._entries
+        entries: dict[str, AttributeEntry] = {}
+        changes: list[AttributeChange] = []
+        for name, attr in attributes.items():
+            value = attr["value"]
+            update_time = attr["updateTime"]
+            entry = old_entries.get(name)
+            if entry is None:
+                entry = AttributeEntry(value, update_time)
+                changes.append(AttributeChange(name, None, value, update_time))
+            else:
+                old_value = entry.value
+                if entry.set(value, update_time):
+                    changes.append(AttributeChange(name, old_value, value, update_time))
+            entries[name] = entry
+        self._entries = entries
+        return changes
+
+    def set(self, name: str, value: str, update_time: int) -> AttributeChange | None:
+        """Update an existing entry.
+
+        Returns the change, or None if the attribute is unknown or its value
+        did not change.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        old_value = entry.value
+        if not entry.set(value, update_time):
+            return None
+        return AttributeChange(name, old_value, value, update_time)
+
+    def get_entry(self, name: str) -> AttributeEntry | None:
+        return self._entries.get(name)
+
+    def get(self, name: str) -> str | None:
+        entry = self._entries.get(name)
+        return None if entry is None else entry.value
+
+    def get_int(self, name: str) -> int | None:
+        entry = self._entries.get(name)
+        return None if entry is None else entry.as_int()
+
+    def to_dict(self) -> dict[str, dict[str, Any]]:
+        """Return the entries in the backend's JSON shape"""
+        return {
+            name: {"value": entry.value, "updateTime": entry.update_time}
+            for name, entry in self._entries.items()
+        }
@@ -1,17 +1,32 @@
-import json
+import asyncio
 import logging
+import random
+from contextlib import suppress
 from datetime import datetime
 from typing import Any
 
 import aiohttp
-import async_timeout
 
-from .backendselector import BackendConfig, BackendSelector
+from . import jsoncodec
+from .backendselector import (
+    ENDPOINT_OAUTH_TOKEN,
+    ENDPOINT_USER_DETAILS,
+    BackendConfig,
+    BackendSelector,
+)
+from .metrics import RequestMetrics
+from .retrypolicy import DEFAULT_RETRY_POLICY, RetryPolicy
 
 LOGGER = logging.getLogger(__name__)
 
 AUTH_JSON_FILE = ".whirlpool_auth.json"
 
+# Renew the access token this many seconds before it expires.
+TOKEN_REFRESH_MARGIN_SECONDS = 10 * 60
+# Failed proactive renewals are retried with a jittered exponential backoff.
+TOKEN_REFRESH_RETRY_DELAY = 30
+TOKEN_REFRESH_MAX_RETRY_DELAY = 10 * 60
+
 
 class AccountLockedError(Exception):
     """Exception for authentication failure due to account being locked."""
@@ -24,18 +39,26 @@ class Auth:
         username: str,
         password: str,
         session: aiohttp.ClientSession,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        request_metrics: RequestMetrics | None = None,
     ):
         self._backend_selector = backend_selector
         self._username = username
         self._password = password
         self._auth_dict: dict[str, Any] = {}
         self._session: aiohttp.ClientSession = session
+        self._retry_policy = retry_policy
+        self.request_metrics = request_metrics
 
+        # Set when the backend refused the credentials on the last renewal
+        self._credentials_rejected = False
         self._renew_time: datetime | None = None
+        self._auth_task: asyncio.Task[bool] | None = None
+        self._refresh_task: asyncio.Task[None] | None = None
 
     def _save_auth_data(self):
-        with open(AUTH_JSON_FILE, "w") as f:
-            json.dump(self._auth_dict, f)
+        with open(AUTH_JSON_FILE, "wb") as f:
+            f.write(jsoncodec.dumps(self._auth_dict))
 
     def _get_auth_body(
         self, refresh_token: str | None, client_creds: BackendConfig
@@ -61,36 +84,91 @@ class Auth:
 
         return auth_data
 
-    async def _do_auth(self, refresh_token: str | None) -> dict[str, str] | None:
+    async def _do_auth(
+        self, refresh_token: str | None
+    ) -> tuple[dict[str, str] | None, bool]:
+        """Request a token. On failure, also returns whether the backend
+        rejected the credentials, as opposed to failing to answer.
+        """
         auth_url = self._backend_selector.oauth_token_url
         auth_header = {
             "Content-Type": "application/x-www-form-urlencoded",
             "User-Agent": "okhttp/3.12.0",
         }
 
+        rejected = True
         for client_creds in self._backend_selector.client_credentials:
             auth_data: dict[str, str] = self._get_auth_body(refresh_token, client_creds)
-            async with async_timeout.timeout(30):
-                async with self._session.post(
-                    auth_url, data=auth_data, headers=auth_header
-                ) as r:
-                    LOGGER.debug("Auth status: " + str(r.status))
-                    if r.status == 200:
-                        return await r.json()
-                    if r.status == 423:
-                        raise AccountLockedError()
-                    elif refresh_token:
-                        return await self._do_auth(refresh_token=None)
-
-        return None
+            r = await self._retry_policy.request(
+                self._session,
+                "POST",
+                auth_url,
+                data=auth_data,
+                headers=auth_header,
+                endpoint=ENDPOINT_OAUTH_TOKEN,
+                metrics=self.request_metrics,
+            )
+            LOGGER.debug("Auth status: " + str(r.status))
+            if r.ok:
+                return r.json(), False
+            if r.status == 423:
+                raise AccountLockedError()
+            elif refresh_token:
+                return await self._do_auth(refresh_token=None)
+            rejected = rejected and r.status not in self._retry_policy.retry_statuses
+
+        return None, rejected
 
     async def do_auth(self, store: bool = False) -> bool:
-        fetched_auth_data = await self._do_auth(
-            self._auth_dict.get("refresh_token", None)
-        )
+        """Authenticate, sharing the result with concurrent callers.
+
+        Only one authentication request is in flight at a time. Callers that
+        arrive while it runs wait for it instead of starting their own.
+        """
+        if self._auth_task is None:
+            self._auth_task = asyncio.get_running_loop().create_task(self._renew_auth())
+        else:
+            LOGGER.debug("Authentication already in progress, waiting for it")
+
+        success = await asyncio.shield(self._auth_task)
+        if success and store:
+            self._save_auth_data()
+        return success
 
+    @property
+    def credentials_rejected(self) -> bool:
+        """Whether the last authentication failed because it was refused.
+
+        Retrying with the same credentials cannot succeed, and repeated
+        attempts can get the account locked.
+        """
+        return self._credentials_rejected
+
+    async def renew_access_token(self, rejected_token: str | None) -> bool:
+        """Renew the access token after `rejected_token` was refused.
+
+        If the token was already renewed since the rejected request was made,
+        the new token is used as is.
+        """
+        if rejected_token != self.get_access_token() and self.is_access_token_valid():
+            LOGGER.debug("Access token already renewed")
+            return True
+        return await self.do_auth()
+
+    async def _renew_auth(self) -> bool:
+        try:
+            fetched_auth_data, rejected = await self._do_auth(
+                self._auth_dict.get("refresh_token", None)
+            )
+        finally:
+            self._auth_task = None
+
+        self._credentials_rejected = not fetched_auth_data and rejected
         if not fetched_auth_data:
-            self._auth_dict = {}
+            # An outage of the OAuth endpoint must not discard a token that
+            # still works, or every request would be rejected until it is over
+            if rejected or not self.is_access_token_valid():
+                self._auth_dict = {}
             LOGGER.error("Authentication failed")
             return False
 
@@ -102,15 +180,72 @@ class Auth:
             "accountId": fetched_auth_data.get("accountId", ""),
             "SAID": fetched_auth_data.get("SAID", ""),
         }
-        if store:
-            self._save_auth_data()
         return True
 
+    def start_token_refresh(
+        self, margin: float = TOKEN_REFRESH_MARGIN_SECONDS, store: bool = False
+    ):
+        """Start renewing the access token `margin` seconds before it expires"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            LOGGER.warning("Token refresh already running")
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(
+            self._token_refresh_loop(margin, store)
+        )
+
+    async def stop_token_refresh(self):
+        """Stop the background token renewal"""
+        if self._refresh_task is None:
+            return
+        self._refresh_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._refresh_task
+        self._refresh_task = None
+
+    def _seconds_until_refresh(self, margin: float) -> float:
+        expire_date = self._auth_dict.get("expire_date", 0)
+        return expire_date - margin - datetime.now().timestamp()
+
+    async def _token_refresh_loop(self, margin: float, store: bool):
+        retry_delay = TOKEN_REFRESH_RETRY_DELAY
+        while True:
+            delay = self._seconds_until_refresh(margin)
+            if delay > 0:
+                # The token may be renewed by someone else in the meantime, so
+                # check the expiration date again after sleeping.
+                await asyncio.sleep(delay)
+                continue
+
+            LOGGER.info("Access token about to expire. Renewing.")
+            try:
+                success = await self.do_auth(store=store)
+            except AccountLockedError:
+                LOGGER.error("Account locked, stopping token refresh")
+                return
+            except (aiohttp.ClientError, TimeoutError) as ex:
+                LOGGER.warning("Token refresh failed: %s", ex)
+                success = False
+
+            if self._credentials_rejected:
+                LOGGER.error("Credentials rejected, stopping token refresh")
+                return
+
+            if success:
+                retry_delay = TOKEN_REFRESH_RETRY_DELAY
+                # Do not spin if the token lifetime is shorter than the margin
+                await asyncio.sleep(
+                    max(self._seconds_until_refresh(margin), retry_delay)
+                )
+                continue
+
+            await asyncio.sleep(random.uniform(retry_delay / 2, retry_delay))
+            retry_delay = min(retry_delay * 2, TOKEN_REFRESH_MAX_RETRY_DELAY)
+
     async def load_auth_file(self):
         try:
-            with open(AUTH_JSON_FILE) as f:
+            with open(AUTH_JSON_FILE, "rb") as f:
                 LOGGER.info("Loading auth from file")
-                self._auth_dict = json.load(f)
+                self._auth_dict = jsoncodec.loads(f.read())
         except FileNotFoundError:
             pass
 
@@ -134,23 +269,19 @@ class Auth:
         if self._auth_dict.get("accountId"):
             return str(self._auth_dict.get("accountId"))
 
-        headers = {
-            "Authorization": f"Bearer {self.get_access_token()}",
-            "Content-Type": "application/json",
-            "User-Agent": "okhttp/3.12.0",
-            "Pragma": "no-cache",
-            "Cache-Control": "no-cache",
-        }
-
-        async with self._session.get(
-            self._backend_selector.user_details_url, headers=headers
-        ) as r:
-            if r.status != 200:
-                LOGGER.error(f"Failed to get account id: {r.status}")
-                return None
-            data = await r.json()
-            self._auth_dict["accountId"] = data["accountId"]
-            return str(self._auth_dict["accountId"])
+        r = await self._retry_policy.request(
+            self._session,
+            "GET",
+            self._backend_selector.user_details_url,
+            auth=self,
+            endpoint=ENDPOINT_USER_DETAILS,
+            metrics=self.request_metrics,
+        )
+        if not r.ok:
+            LOGGER.error(f"Failed to get account id: {r.status}")
+            return None
+        self._auth_dict["accountId"] = r.json()["accountId"]
+        return str(self._auth_dict["accountId"])
 
     def get_said_list(self):
         return self._auth_dict.get("SAID", None)
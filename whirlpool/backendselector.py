@@ -61,6 +61,15 @@ CREDENTIALS: dict[Region, dict[Brand, list[BackendConfig]]] = {
     },
 }
 
+# Names of the URL families below, used to aggregate request metrics
+ENDPOINT_OAUTH_TOKEN = "oauth_token"
+ENDPOINT_WEBSOCKET = "websocket"
+ENDPOINT_APPLIANCE_COMMAND = "appliance_command"
+ENDPOINT_USER_DETAILS = "user_details"
+ENDPOINT_SHARED_APPLIANCES = "shared_appliances"
+ENDPOINT_APPLIANCE_DATA = "appliance_data"
+ENDPOINT_OWNED_APPLIANCES = "owned_appliances"
+
 URLS: dict[Region, str] = {
     Region.EU: "https://prod-api.whrcloud.eu",
     Region.US: "https://api.whrcloud.com",
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from contextlib import suppress
+from enum import Enum
+
+from .metrics import DispatchMetrics
+
+LOGGER = logging.getLogger(__name__)
+
+EVENT_QUEUE_SIZE = 1000
+
+
+class OverflowPolicy(Enum):
+    """What to do with a new event when the dispatch queue is full"""
+
+    DropOldest = 0
+    DropNewest = 1
+    # Wait for room, which stops reading from the socket meanwhile
+    Block = 2
+
+
+class EventDispatcher:
+    """Hands event socket messages to a handler from a separate task.
+
+    The socket read loop only enqueues messages, and the dispatcher yields to
+    the event loop after each one, so the socket is read between events and
+    bursts are absorbed by the queue. Handlers still run on the event loop, so
+    a slow handler delays reading by up to the time it takes for one event.
+
+    The handler gets each message with the Unix time it was received at, so
+    queueing delay is not mistaken for delivery lag. Messages dropped on
+    overflow are passed to `on_drop`, so their effect can be recovered.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, float], None],
+        queue_size: int = EVENT_QUEUE_SIZE,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DropOldest,
+        on_drop: Callable[[str], None] | None = None,
+    ):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self._handler = handler
+        self._on_drop = on_drop
+        # Items are (monotonic receive time, Unix receive time, message)
+        self._queue: asyncio.Queue[tuple[float, float, str]] = asyncio.Queue(queue_size)
+        self._overflow_policy = overflow_policy
+        self._task: asyncio.Task[None] | None = None
+        self.metrics = DispatchMetrics()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def put(self, msg: str):
+        """Queue a message, applying the overflow policy if the queue is full"""
+        item = (time.monotonic(), time.time(), msg)
+        if self._queue.full():
+            if self._overflow_policy is OverflowPolicy.Block:
+                await self._queue.put(item)
+                self._count_enqueued()
+                return
+            self.metrics.dropped += 1
+            if self._overflow_policy is OverflowPolicy.DropNewest:
+                LOGGER.warning("Event queue full, dropping new event")
+                self._dropped(msg)
+                return
+            LOGGER.warning("Event queue full, dropping oldest event")
+            _, _, dropped = self._queue.get_nowait()
+            self._queue.task_done()
+            self._dropped(dropped)
+        self._queue.put_nowait(item)
+        self._count_enqueued()
+
+    def _dropped(self, msg: str):
+        if self._on_drop is None:
+            return
+        try:
+            self._on_drop(msg)
+        except Exception:
+            LOGGER.exception("Error handling dropped event")
+
+    def _count_enqueued(self):
+        self.metrics.enqueued += 1
+        self.metrics.depth = self._queue.qsize()
+        self.metrics.max_depth = max(self.metrics.max_depth, self.metrics.depth)
+
+    async def join(self):
+        """Wait until every queued message has been handled"""
+        await self._queue.join()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop dispatching. Messages still queued are discarded."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+        self.metrics.depth = 0
+
+    async def _run(self):
+        while True:
+            received, received_at, msg = await self._queue.get()
+            self.metrics.depth = self._queue.qsize()
+            self.metrics.queue_latency.observe(time.monotonic() - received)
+            start = time.perf_counter()
+            try:
+                self._handler(msg, received_at)
+                self.metrics.dispatched += 1
+            except Exception:
+                self.metrics.errors += 1
+                LOGGER.exception("Error handling event")
+            finally:
+                self.metrics.dispatch_time.observe(time.perf_counter() - start)
+                self._queue.task_done()
+            # Queue.get does not yield while items are queued, so let the
+            # socket reader run before handling the next event
+            await asyncio.sleep(0)
@@ -0,0 +1,172 @@
+import asyncio
+import struct
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from .stomp import StompParseError, StompParser
+
+RECORDING_MAGIC = b"WPFRAMES2\n"
+
+# Receive time (unix seconds), payload length, stream id and flags of each record
+RECORD_HEADER = struct.Struct("<dIIB")
+
+# The record marks a new connection of its stream and has no payload
+RECORD_CONNECTED = 1
+
+
+class RecordingFormatError(Exception):
+    """Exception for files that are not valid frame recordings."""
+
+
+@dataclass(frozen=True, slots=True)
+class RecordedFrame:
+    received: float
+    data: bytes
+    # Connection the frame was received on, see FrameRecorder.new_stream
+    stream: int = 0
+    # Marks a new connection of the stream rather than received data
+    connected: bool = False
+
+
+class FrameRecorder:
+    """Appends raw websocket messages to a recording file.
+
+    Each record is the receive time, the payload length, the stream and the
+    payload, so the log can be appended to while it is being read. Sockets
+    sharing a recorder record to their own stream and mark each connection,
+    so frames split across messages are reassembled per connection.
+    """
+
+    def __init__(self, path: str | Path):
+        self._path = Path(path)
+        self._file: BinaryIO | None = None
+        self._streams = 0
+        self.frames = 0
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def open(self):
+        if self._file is not None:
+            return
+        self._file = self._path.open("ab")
+        if self._file.tell() == 0:
+            self._file.write(RECORDING_MAGIC)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def new_stream(self) -> int:
+        """Allocate a stream id for a socket recording to this file"""
+        self._streams += 1
+        return self._streams
+
+    def record(self, data: str | bytes, received: float | None = None, stream: int = 0):
+        payload = data.encode() if isinstance(data, str) else data
+        self._write(payload, received, stream, 0)
+        self.frames += 1
+
+    def record_connected(self, stream: int = 0, received: float | None = None):
+        """Mark a new connection, whose data does not continue the previous one"""
+        self._write(b"", received, stream, RECORD_CONNECTED)
+
+    def _write(self, payload: bytes, received: float | None, stream: int, flags: int):
+        if self._file is None:
+            self.open()
+        assert self._file is not None
+        received = time.time() if received is None else received
+        self._file.write(RECORD_HEADER.pack(received, len(payload), stream, flags))
+        self._file.write(payload)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_recording(path: str | Path) -> Iterator[RecordedFrame]:
+    """Yield the frames of a recording. A truncated last record is skipped."""
+    with Path(path).open("rb") as f:
+        if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise RecordingFormatError(f"{path} is not a frame recording")
+        while header := f.read(RECORD_HEADER.size):
+            if len(header) < RECORD_HEADER.size:
+                return
+            received, length, stream, flags = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield RecordedFrame(received, data, stream, bool(flags & RECORD_CONNECTED))
+
+
+@dataclass
+class ReplayResult:
+    frames: int = 0
+    events: int = 0
+    # Records that could not be parsed, after which their stream starts over
+    parse_errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+
+async def replay_recording(
+    path: str | Path,
+    msg_listener: Callable[[str], None],
+    speed: float | None = None,
+) -> ReplayResult:
+    """Feed a recording through the STOMP parser to `msg_listener`.
+
+    MESSAGE bodies are passed on like EventSocket does, with a parser per
+    stream that is reset on each connection. With a `speed`, frames are paced
+    by their receive times (1 is real time); without one they are replayed as
+    fast as possible.
+    """
+    parsers: dict[int, StompParser] = {}
+    result = ReplayResult()
+    start = time.monotonic()
+    first_received: float | None = None
+    for frame in read_recording(path):
+        if speed is not None:
+            if first_received is None:
+                first_received = frame.received
+            due = start + (frame.received - first_received) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        parser = parsers.get(frame.stream)
+        if parser is None:
+            parser = parsers[frame.stream] = StompParser()
+        if frame.connected:
+            parser.reset()
+            continue
+
+        result.frames += 1
+        try:
+            stomp_frames = parser.feed(frame.data)
+        except StompParseError:
+            # The live socket reconnects after an invalid frame, so start over
+            result.parse_errors += 1
+            parser.reset()
+            continue
+        for stomp_frame in stomp_frames:
+            if stomp_frame.command == "MESSAGE":
+                msg_listener(stomp_frame.body)
+                result.events += 1
+    result.elapsed = time.monotonic() - start
+    return result
@@ -0,0 +1,271 @@
+"""In-process stand-in for the cloud's STOMP-over-websocket event backend.
+
+It lets EventSocket be exercised end to end, e.g. for tests and benchmarks of
+reconnects, dispatch and throughput, without network access.
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+import time
+from collections.abc import Iterable
+from contextlib import suppress
+from dataclasses import dataclass, field
+
+from aiohttp import WSMsgType, web
+
+from .eventsocket import TOKEN_INVALID_MSG, WS_STATUS_GOING_AWAY
+from .jsoncodec import dumps
+from .stomp import StompFrame, StompParseError, StompParser, encode_frame
+
+LOGGER = logging.getLogger(__name__)
+
+EVENT_SERVER_PATH = "/appliance/websocket"
+
+# Attributes and values used for generated events
+GENERATED_ATTRIBUTES = {
+    "Online": ("0", "1"),
+    "Cavity_TimeStatusEstTimeRemaining": tuple(str(i) for i in range(0, 3600, 60)),
+    "WashCavity_OpStatusDoorOpen": ("0", "1"),
+    "Sys_OpSetMachineState": tuple(str(i) for i in range(10)),
+}
+
+
+@dataclass
+class EventServerConnection:
+    """A client connected to the event server"""
+
+    ws: web.WebSocketResponse
+    token: str | None = None
+    connected: bool = False
+    # Subscription id of each subscribed said
+    subscriptions: dict[str, str] = field(default_factory=dict)
+    received: list[StompFrame] = field(default_factory=list)
+    # Websocket messages received, which may hold several frames
+    messages: int = 0
+
+
+@dataclass
+class EventServerStats:
+    connections: int = 0
+    frames_received: int = 0
+    events_sent: int = 0
+
+
+class EventServer:
+    """Emulates the websocket protocol of the appliance event backend.
+
+    Clients CONNECT with a `wcloudtoken` header, SUBSCRIBE to `/topic/<said>`
+    and receive MESSAGE frames with `{said, attributeMap, timestamp}` bodies.
+    If `tokens` is given, a CONNECT with another token is answered with a
+    "Token Invalid" ERROR frame, like the backend does with expired tokens.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", tokens: Iterable[str] | None = None):
+        self._host = host
+        self.tokens = set(tokens) if tokens is not None else None
+        self.connections: list[EventServerConnection] = []
+        self.stats = EventServerStats()
+        self._runner: web.AppRunner | None = None
+        self._port = 0
+        self._message_ids = itertools.count()
+        self._generator_task: asyncio.Task[None] | None = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self._host}:{self._port}{EVENT_SERVER_PATH}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get(EVENT_SERVER_PATH, self._handle_connection)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, 0)
+        await site.start()
+        self._port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        await self.stop_events()
+        await self.close_all()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def subscribers(self, said: str) -> list[EventServerConnection]:
+        return [
+            connection
+            for connection in self.connections
+            if said in connection.subscriptions
+        ]
+
+    async def publish(
+        self,
+        said: str,
+        attributes: dict[str, str],
+        timestamp: int | None = None,
+    ) -> int:
+        """Send an event to the subscribers of `said`. Returns how many got it."""
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        body = dumps(
+            {"said": said, "attributeMap": attributes, "timestamp": timestamp}
+        ).decode()
+        sent = 0
+        for connection in self.subscribers(said):
+            frame = encode_frame(
+                "MESSAGE",
+                {
+                    "destination": f"/topic/{said}",
+                    "content-type": "application/json",
+                    "subscription": connection.subscriptions[said],
+                    "message-id": str(next(self._message_ids)),
+                },
+                body,
+            )
+            if await self._send(connection, frame):
+                sent += 1
+        self.stats.events_sent += sent
+        return sent
+
+    async def close_all(self, code: int = WS_STATUS_GOING_AWAY):
+        """Close every connection, by default as going away (server restart)"""
+        await asyncio.gather(
+            *(connection.ws.close(code=code) for connection in self.connections)
+        )
+
+    async def invalidate_tokens(self):
+        """Reject the tokens in use, telling connected clients their token is invalid"""
+        self.tokens = set()
+        for connection in list(self.connections):
+            await self._send_token_invalid(connection)
+
+    def start_events(
+        self, rate: float, saids: Iterable[str] | None = None, attributes: int = 2
+    ):
+        """Publish `rate` events per second, spread over `saids`.
+
+        By default events are generated for every subscribed said.
+        """
+        if self._generator_task is not None:
+            raise RuntimeError("Event generator already running")
+        self._generator_task = asyncio.get_event_loop().create_task(
+            self._generate_events(rate, list(saids) if saids else None, attributes)
+        )
+
+    async def stop_events(self):
+        if self._generator_task is None:
+            return
+        self._generator_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._generator_task
+        self._generator_task = None
+
+    async def _generate_events(
+        self, rate: float, saids: list[str] | None, attributes: int
+    ):
+        interval = 1 / rate
+        next_time = time.monotonic()
+        names = list(GENERATED_ATTRIBUTES)
+        while True:
+            targets = saids or [
+                said
+                for connection in self.connections
+                for said in connection.subscriptions
+            ]
+            if targets:
+                said = random.choice(targets)
+                await self.publish(
+                    said,
+                    {
+                        name: random.choice(GENERATED_ATTRIBUTES[name])
+                        for name in random.sample(names, min(attributes, len(names)))
+                    },
+                )
+            next_time += interval
+            # Send bursts instead of sleeping when running behind
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -1:
+                next_time = time.monotonic()
+            else:
+                await asyncio.sleep(0)
+
+    async def _send(self, connection: EventServerConnection, frame: str) -> bool:
+        if connection.ws.closed:
+            return False
+        try:
+            await connection.ws.send_str(frame)
+        except ConnectionResetError:
+            return False
+        return True
+
+    async def _send_token_invalid(self, connection: EventServerConnection):
+        await self._send(
+            connection, encode_frame("ERROR", {"message": TOKEN_INVALID_MSG})
+        )
+        await connection.ws.close()
+
+    async def _handle_connection(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        connection = EventServerConnection(ws)
+        self.connections.append(connection)
+        self.stats.connections += 1
+        parser = StompParser()
+        try:
+            async for msg in ws:
+                if msg.type not in (WSMsgType.TEXT, WSMsgType.BINARY):
+                    continue
+                connection.messages += 1
+                try:
+                    frames = parser.feed(msg.data)
+                except StompParseError as ex:
+                    LOGGER.warning("Closing connection with invalid frame: %s", ex)
+                    break
+                for frame in frames:
+                    self.stats.frames_received += 1
+                    connection.received.append(frame)
+                    await self._handle_frame(connection, frame)
+        finally:
+            self.connections.remove(connection)
+        return ws
+
+    async def _handle_frame(self, connection: EventServerConnection, frame: StompFrame):
+        if frame.command == "CONNECT":
+            connection.token = frame.headers.get("wcloudtoken")
+            if self.tokens is not None and connection.token not in self.tokens:
+                await self._send_token_invalid(connection)
+                return
+            connection.connected = True
+            await self._send(
+                connection,
+                encode_frame("CONNECTED", {"version": "1.2", "heart-beat": "0,0"}),
+            )
+        elif not connection.connected:
+            # Frames pipelined behind a rejected CONNECT are ignored
+            return
+        elif frame.command == "SUBSCRIBE":
+            said = frame.headers["destination"].removeprefix("/topic/")
+            connection.subscriptions[said] = frame.headers["id"]
+        elif frame.command == "UNSUBSCRIBE":
+            subscription_id = frame.headers["id"]
+            connection.subscriptions = {
+                said: sid
+                for said, sid in connection.subscriptions.items()
+                if sid != subscription_id
+            }
+
+        receipt = frame.headers.get("receipt")
+        if receipt is not None:
+            await self._send(
+                connection, encode_frame("RECEIPT", {"receipt-id": receipt})
+            )
@@ -1,29 +1,39 @@
 import asyncio
+import inspect
 import logging
-import re
+import time
 import uuid
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
 from socket import gaierror
 
 import aiohttp
 
 from .auth import Auth
+from .eventrecorder import FrameRecorder
+from .metrics import EventSocketMetrics
+from .reconnect import (
+    DEFAULT_RECONNECT_STRATEGY,
+    RECONNECT_LONG_DELAY,
+    DisconnectReason,
+    ReconnectStrategy,
+)
+from .stomp import StompFrame, StompParseError, StompParser, encode_frame
 
 LOGGER = logging.getLogger(__name__)
 
-MSG_TERMINATION = "\n\n\0"
+# Frames are batched into websocket messages of up to this many characters
+MAX_WS_MESSAGE_SIZE = 32 * 1024
 
-DATA_MSG_MATCHER = re.compile("{(.*)}\\x00")
-TOKEN_INVALID_MSG_MATCHER = re.compile(".*Token Invalid.*")
+TOKEN_INVALID_MSG = "Token Invalid"
+
+# A session counts as established once it has stayed connected this long, so a
+# server that accepts and then drops connections does not reset the backoff
+HEALTHY_SESSION_TIME = 30
 
 WS_STATUS_GOING_AWAY = 1001
 WS_STATUS_UNAUTHORIZED = 3000
 
-RECONNECT_COUNT = 3
-RECONNECT_SHORT_DELAY = 30
-RECONNECT_LONG_DELAY = 60 * 4
-GOING_AWAY_DELAY = (60 * 5) - RECONNECT_SHORT_DELAY
-
 
 class EventSocket:
     """Event socket listener class"""
@@ -33,47 +43,223 @@ class EventSocket:
         url: str,
         auth: Auth,
         said_list: list[str],
-        msg_listener: Callable[[str], None],
+        msg_listener: Callable[[str], Awaitable[None] | None],
         con_up_listener: Callable,
         session: aiohttp.ClientSession,
+        pipeline_subscribe: bool = True,
+        reconnect_strategy: ReconnectStrategy = DEFAULT_RECONNECT_STRATEGY,
+        recorder: FrameRecorder | None = None,
     ):
         self._url = url
         self._auth = auth
-        self._said_list = said_list
+        self._said_list = list(said_list)
+        # Subscription id of each said on the current connection
+        self._subscriptions: dict[str, str] = {}
+        self._subscribed = False
         self._msg_listener = msg_listener
         self._running = False
         self._websocket: aiohttp.ClientWebSocketResponse | None = None
         self._run_future = None
         self._con_up_listener = con_up_listener
-        self._reconnect_tries = RECONNECT_COUNT
+        self._reconnect_strategy = reconnect_strategy
+        self._recorder = recorder
+        self._record_stream = recorder.new_stream() if recorder is not None else 0
+        # Reconnections since the last established session
+        self._reconnect_attempt = 0
         self._session = session
+        self._connect_token: str | None = None
+        self._parser = StompParser()
+        self._pipeline_subscribe = pipeline_subscribe
+        self._connect_time: float | None = None
+        self._subscribe_receipt: str | None = None
+        self._subscribe_latency: float | None = None
+        # When the server accepted the current connection
+        self._connected_at: float | None = None
+        self._disconnected_at: float | None = None
+        # Set while reconnecting after an established connection was lost
+        self._down_since: float | None = None
+        self.metrics = EventSocketMetrics(subscriptions=len(said_list))
+
+    @property
+    def subscribe_latency(self) -> float | None:
+        """Seconds from connecting to the server confirming the subscriptions.
+
+        None until the first subscription receipt arrives, and for servers that
+        do not send receipts.
+        """
+        return self._subscribe_latency
+
+    @property
+    def disconnected_at(self) -> float | None:
+        """Monotonic time the last established connection was lost, if any"""
+        return self._disconnected_at
+
+    @property
+    def said_list(self) -> list[str]:
+        return list(self._said_list)
+
+    async def subscribe(self, said: str):
+        """Subscribe to the events of an appliance.
+
+        If connected, the subscription is added to the live connection.
+        Otherwise it is made on the next connection.
+        """
+        if said in self._said_list:
+            return
+        self._said_list.append(said)
+        self.metrics.subscriptions = len(self._said_list)
+        await self._send_live(self._create_subscribe_frame(said))
 
-    def _create_connect_msg(self):
-        return (
-            "CONNECT\naccept-version:1.1,1.2\nheart-beat:30000,0\nwcloudtoken:"
-            f"{self._auth.get_access_token()}"
+    async def unsubscribe(self, said: str):
+        """Stop receiving the events of an appliance"""
+        if said not in self._said_list:
+            return
+        self._said_list.remove(said)
+        self.metrics.subscriptions = len(self._said_list)
+        subscription_id = self._subscriptions.pop(said, None)
+        if subscription_id is not None:
+            await self._send_live(encode_frame("UNSUBSCRIBE", {"id": subscription_id}))
+
+    async def _send_live(self, frame: str):
+        if self._websocket is None or not self._subscribed:
+            return
+        try:
+            await self._send_frames(self._websocket, [frame])
+        except (aiohttp.ClientError, ConnectionResetError) as ex:
+            # The subscriptions are made again when reconnecting
+            LOGGER.debug(f"Could not update subscriptions: {ex}")
+
+    def _create_connect_frame(self) -> str:
+        self._connect_token = self._auth.get_access_token()
+        return encode_frame(
+            "CONNECT",
+            {
+                "accept-version": "1.1,1.2",
+                "heart-beat": "30000,0",
+                "wcloudtoken": self._connect_token or "",
+            },
         )
 
-    async def _send_subscribe_messages(self, ws: aiohttp.ClientWebSocketResponse):
-        # send one subscribe message for each said, with a unique id
-        for said in self._said_list:
-            id = uuid.uuid4()
-            msg = f"SUBSCRIBE\nid:{id}\ndestination:/topic/{said}\nack:auto"
-            await self._send_msg(ws, msg)
-
-    async def _send_msg(self, websocket: aiohttp.ClientWebSocketResponse, msg):
+    def _create_subscribe_frame(self, said: str, receipt: str | None = None) -> str:
+        # each subscription has a unique id, which is needed to unsubscribe
+        subscription_id = str(uuid.uuid4())
+        self._subscriptions[said] = subscription_id
+        headers = {
+            "id": subscription_id,
+            "destination": f"/topic/{said}",
+            "ack": "auto",
+        }
+        if receipt is not None:
+            headers["receipt"] = receipt
+        return encode_frame("SUBSCRIBE", headers)
+
+    def _create_subscribe_frames(self) -> list[str]:
+        self._subscriptions = {}
+        self._subscribed = True
+        if not self._said_list:
+            self._subscribe_receipt = None
+            return []
+
+        # Frames are processed in order, so a receipt for the last one confirms all
+        self._subscribe_receipt = f"subscribe-{uuid.uuid4()}"
+        *saids, last = self._said_list
+        frames = [self._create_subscribe_frame(said) for said in saids]
+        frames.append(self._create_subscribe_frame(last, self._subscribe_receipt))
+        return frames
+
+    async def _send_frames(
+        self, websocket: aiohttp.ClientWebSocketResponse, frames: list[str]
+    ):
+        """Send frames using as few websocket messages as possible"""
+        batch: list[str] = []
+        batch_size = 0
+        for frame in frames:
+            if batch and batch_size + len(frame) > MAX_WS_MESSAGE_SIZE:
+                await self._send_msg(websocket, "".join(batch))
+                batch, batch_size = [], 0
+            batch.append(frame)
+            batch_size += len(frame)
+        if batch:
+            await self._send_msg(websocket, "".join(batch))
+
+    async def _send_msg(self, websocket: aiohttp.ClientWebSocketResponse, msg: str):
         LOGGER.debug(f"> {msg}")
-        await websocket.send_str(msg + MSG_TERMINATION)
+        await websocket.send_str(msg)
 
     async def _recv_msg(self, websocket: aiohttp.ClientWebSocketResponse):
         msg = await websocket.receive()
         LOGGER.debug(f"< {msg}")
         return msg
 
+    async def _reauth(self):
+        while not await self._auth.renew_access_token(self._connect_token):
+            await asyncio.sleep(RECONNECT_LONG_DELAY)
+
+    async def _handle_frames(
+        self, ws: aiohttp.ClientWebSocketResponse, frames: list[StompFrame]
+    ) -> bool:
+        """Handle received frames. Returns False if the connection must close."""
+        for frame in frames:
+            if frame.command == "MESSAGE":
+                self.metrics.events += 1
+                result = self._msg_listener(frame.body)
+                if inspect.isawaitable(result):
+                    await result
+                continue
+
+            if (
+                TOKEN_INVALID_MSG in frame.headers.get("message", "")
+                or TOKEN_INVALID_MSG in frame.body
+            ):
+                LOGGER.debug("received invalid token msg, doing reauth now")
+                await self._reauth()
+                return False
+
+            if frame.command == "CONNECTED":
+                self._connected_at = time.monotonic()
+                self.metrics.connects += 1
+                if self._down_since is not None:
+                    self.metrics.reconnects += 1
+                    self.metrics.downtime += time.monotonic() - self._down_since
+                    self._down_since = None
+                self.metrics.connected = True
+                if not self._pipeline_subscribe:
+                    await self._send_frames(ws, self._create_subscribe_frames())
+                await self._con_up_listener()
+            elif frame.command == "RECEIPT":
+                self._handle_receipt(frame)
+            elif frame.command == "ERROR":
+                # The server closes the connection after an ERROR frame
+                LOGGER.error(
+                    "Received error frame: %s %s",
+                    frame.headers.get("message", ""),
+                    frame.body,
+                )
+                return False
+            else:
+                LOGGER.debug("Ignoring %s frame", frame.command)
+        return True
+
+    def _handle_receipt(self, frame: StompFrame):
+        receipt = frame.headers.get("receipt-id")
+        if receipt is None or receipt != self._subscribe_receipt:
+            LOGGER.debug("Ignoring receipt %s", receipt)
+            return
+        self._subscribe_receipt = None
+        if self._connect_time is not None:
+            self._subscribe_latency = time.monotonic() - self._connect_time
+            LOGGER.info(
+                "Subscribed to %d appliances in %.3f seconds",
+                len(self._said_list),
+                self._subscribe_latency,
+            )
+
     async def _run(self):
         while self._running:
+            reason = DisconnectReason.Error
             try:
                 LOGGER.debug(f"Connecting to {self._url}")
+                self._connect_time = time.monotonic()
                 async with self._session.ws_connect(
                     self._url,
                     timeout=aiohttp.ClientWSTimeout(ws_receive=60, ws_close=60),  # type: ignore # ClientWSTimeout uses attr.s which pyright does not support
@@ -82,16 +268,17 @@ class EventSocket:
                     heartbeat=45,
                 ) as ws:
                     self._websocket = ws
-                    self._reconnect_tries = RECONNECT_COUNT
-                    connected_msg_done = False
-                    subscribe_msg_done = False
+                    self._parser.reset()
+                    if self._recorder is not None:
+                        self._recorder.record_connected(self._record_stream)
+                    # Subscriptions are pipelined right behind CONNECT, saving
+                    # a round-trip on every (re)connection
+                    frames = [self._create_connect_frame()]
+                    if self._pipeline_subscribe:
+                        frames.extend(self._create_subscribe_frames())
+                    await self._send_frames(ws, frames)
 
                     while not ws.closed:
-                        if not connected_msg_done:
-                            await self._send_msg(ws, self._create_connect_msg())
-                        elif not subscribe_msg_done:
-                            await self._send_subscribe_messages(ws)
-
                         msg = await self._recv_msg(ws)
                         if not msg:
                             continue
@@ -106,77 +293,77 @@ class EventSocket:
                             LOGGER.info(
                                 f"Stopping receiving. Message type: {str(msg.type)}"
                             )
+                            if not self._running:
+                                break
 
                             if (
                                 not self._auth.is_access_token_valid()
                                 or msg.data == WS_STATUS_UNAUTHORIZED
                             ):
                                 LOGGER.debug("auth key expired, doing reauth now")
-                                while not await self._auth.do_auth():
-                                    await asyncio.sleep(RECONNECT_LONG_DELAY)
+                                await self._reauth()
+                                reason = DisconnectReason.Unauthorized
 
                             elif msg.data == WS_STATUS_GOING_AWAY:
-                                LOGGER.info(
-                                    (
-                                        "Received Going Away message: Waiting for %s"
-                                        " seconds"
-                                    ),
-                                    GOING_AWAY_DELAY,
-                                )
-                                # Give server some time to come back up.
-                                await asyncio.sleep(GOING_AWAY_DELAY)
+                                LOGGER.info("Received Going Away message")
+                                reason = DisconnectReason.GoingAway
 
                             break
 
-                        invalid_token_match = TOKEN_INVALID_MSG_MATCHER.findall(
-                            msg.data
-                        )
-                        if invalid_token_match:
-                            LOGGER.debug("received invalid token msg, doing reauth now")
-                            while not await self._auth.do_auth():
-                                await asyncio.sleep(RECONNECT_LONG_DELAY)
-                            break
-
-                        if not connected_msg_done:
-                            connected_msg_done = True
-                            continue
-
-                        if not subscribe_msg_done:
-                            subscribe_msg_done = True
-                            await self._con_up_listener()
-                            continue
-
-                        if msg.type != aiohttp.WSMsgType.TEXT:
+                        if msg.type not in [
+                            aiohttp.WSMsgType.TEXT,
+                            aiohttp.WSMsgType.BINARY,
+                        ]:
                             LOGGER.error(
                                 f"Socket message type is invalid: {str(msg.type)}"
                             )
+                            self.metrics.messages_dropped += 1
                             continue
 
-                        match = DATA_MSG_MATCHER.findall(msg.data)
-                        if not match:
-                            continue
-                        self._msg_listener("{" + match[0] + "}")
+                        data: str | bytes = msg.data
+                        self.metrics.messages += 1
+                        # ASCII text is one byte per character, so only other
+                        # text needs encoding to be measured
+                        self.metrics.bytes_received += (
+                            len(data.encode())
+                            if isinstance(data, str) and not data.isascii()
+                            else len(data)
+                        )
+                        if self._recorder is not None:
+                            self._recorder.record(data, stream=self._record_stream)
+                        start = time.perf_counter()
+                        try:
+                            frames = self._parser.feed(data)
+                        except StompParseError as ex:
+                            # The stream cannot be resynchronized, so reconnect
+                            LOGGER.error(f"Invalid STOMP frame: {ex}")
+                            self.metrics.messages_dropped += 1
+                            break
+                        self.metrics.parse_time.observe(time.perf_counter() - start)
+                        self.metrics.frames_parsed += len(frames)
+
+                        if not await self._handle_frames(ws, frames):
+                            break
             except (aiohttp.ClientError, TimeoutError, gaierror) as ex:
                 LOGGER.error(f"Websocket could not connect: {ex}")
 
             self._websocket = None
+            self._subscribed = False
+            if self.metrics.connected:
+                self._disconnected_at = self._down_since = time.monotonic()
+            self.metrics.connected = False
+            if (
+                self._connected_at is not None
+                and time.monotonic() - self._connected_at >= HEALTHY_SESSION_TIME
+            ):
+                self._reconnect_attempt = 0
+            self._connected_at = None
 
             if self._running:
-                self._reconnect_tries -= 1
-                if self._reconnect_tries < 0:
-                    self._reconnect_tries = 0
-                    LOGGER.info(
-                        f"Waiting to reconnect long delay {RECONNECT_LONG_DELAY}"
-                        " seconds"
-                    )
-
-                    # Give server some time to come back up.
-                    await asyncio.sleep(RECONNECT_LONG_DELAY)
-
-                LOGGER.info(
-                    f"Waiting to reconnect short delay {RECONNECT_SHORT_DELAY} seconds"
-                )
-                await asyncio.sleep(RECONNECT_SHORT_DELAY)
+                delay = self._reconnect_strategy.delay(self._reconnect_attempt, reason)
+                self._reconnect_attempt += 1
+                LOGGER.info(f"Waiting {delay:.1f} seconds to reconnect ({reason.name})")
+                await asyncio.sleep(delay)
 
                 LOGGER.info("Reconnecting...")
 
@@ -188,11 +375,16 @@ class EventSocket:
     async def stop(self):
         """Stop the event socket listener"""
         self._running = False
-        if not self._websocket:
-            return
-        await self._websocket.close()
-        self._websocket = None
-        if not self._run_future:
+        if self._recorder is not None:
+            self._recorder.flush()
+        if not self._run_future or self._run_future.done():
             return
-        if not self._run_future.done():
+        if self._websocket:
+            await self._websocket.close()
+            self._websocket = None
             await self._run_future
+        else:
+            # Waiting to reconnect
+            self._run_future.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._run_future
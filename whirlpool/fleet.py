@@ -0,0 +1,226 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field, replace
+
+import aiohttp
+
+from .appliance import Appliance
+from .appliancesmanager import KEEPALIVE_INTERVAL_SECONDS, AppliancesManager
+from .auth import Auth
+from .backendselector import BackendSelector
+from .metrics import RequestMetrics
+from .retrypolicy import DEFAULT_RETRY_POLICY, RetryPolicy
+from .types import Brand, Region
+
+LOGGER = logging.getLogger(__name__)
+
+# REST requests in flight across every account of a fleet. Event websockets
+# are not counted, as each holds its connection for as long as it is open.
+FLEET_CONNECTION_LIMIT = 100
+# Accounts authenticating and discovering appliances at the same time
+FLEET_STARTUP_CONCURRENCY = 10
+# Seconds between starting consecutive accounts
+FLEET_STARTUP_INTERVAL = 0.2
+
+
+@dataclass(frozen=True, kw_only=True)
+class AccountConfig:
+    brand: Brand
+    region: Region
+    username: str
+    password: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.brand.name}/{self.region.name}/{self.username}"
+
+
+@dataclass
+class FleetAccount:
+    """An account hosted by a FleetManager"""
+
+    config: AccountConfig
+    auth: Auth
+    manager: AppliancesManager
+    started: bool = False
+    error: Exception | None = None
+    saids: set[str] = field(default_factory=set)
+
+
+class FleetManager:
+    """Hosts many accounts, across brands and regions, over one connection pool.
+
+    All accounts share a session and a retry policy whose limiter caps the
+    concurrent REST requests of the whole fleet. Account startup runs with a concurrency
+    limit and a fixed interval between accounts, and keepalives are spread
+    over their interval, so the backend does not see bursts from the fleet.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession | None = None,
+        connection_limit: int = FLEET_CONNECTION_LIMIT,
+        startup_concurrency: int = FLEET_STARTUP_CONCURRENCY,
+        startup_interval: float = FLEET_STARTUP_INTERVAL,
+        request_metrics: RequestMetrics | None = None,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    ):
+        self._session = session
+        self._owns_session = session is None
+        self.retry_policy = replace(
+            retry_policy, limiter=asyncio.Semaphore(connection_limit)
+        )
+        self._startup_semaphore = asyncio.Semaphore(startup_concurrency)
+        self._startup_interval = startup_interval
+        self.request_metrics = (
+            request_metrics if request_metrics is not None else RequestMetrics()
+        )
+        self._accounts: dict[str, FleetAccount] = {}
+        self._appliances: dict[str, Appliance] = {}
+        self._appliance_accounts: dict[str, str] = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            # Requests are limited by the retry policy, so the connector only
+            # needs to be unlimited for the event websockets
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0)
+            )
+        return self._session
+
+    @property
+    def accounts(self) -> dict[str, FleetAccount]:
+        return self._accounts
+
+    @property
+    def appliances(self) -> dict[str, Appliance]:
+        """Appliances of every account, by SAID"""
+        return self._appliances
+
+    def get_appliance(self, said: str) -> Appliance | None:
+        return self._appliances.get(said)
+
+    def get_account(self, said: str) -> FleetAccount | None:
+        """Return the account an appliance belongs to"""
+        key = self._appliance_accounts.get(said)
+        return self._accounts.get(key) if key is not None else None
+
+    def add_account(self, config: AccountConfig) -> FleetAccount:
+        if config.key in self._accounts:
+            raise ValueError(f"Account {config.key} already added")
+        backend_selector = BackendSelector(config.brand, config.region)
+        auth = Auth(
+            backend_selector,
+            config.username,
+            config.password,
+            self.session,
+            retry_policy=self.retry_policy,
+            request_metrics=self.request_metrics,
+        )
+        manager = AppliancesManager(
+            backend_selector,
+            auth,
+            self.session,
+            retry_policy=self.retry_policy,
+            keepalive_phase=self._keepalive_phase(len(self._accounts)),
+        )
+        account = FleetAccount(config, auth, manager)
+        self._accounts[config.key] = account
+        return account
+
+    def _keepalive_phase(self, index: int) -> float:
+        # Spread keepalives evenly, using the bit-reversed index so the
+        # accounts added so far are spread whatever their number
+        fraction = 0.0
+        step = 0.5
+        while index:
+            if index & 1:
+                fraction += step
+            index >>= 1
+            step /= 2
+        return fraction * KEEPALIVE_INTERVAL_SECONDS
+
+    async def remove_account(self, key: str):
+        account = self._accounts.pop(key)
+        if account.started:
+            await account.manager.disconnect()
+        self._unindex(account)
+
+    async def start(self) -> dict[str, bool]:
+        """Start every account that is not running. Returns the outcomes by key."""
+        pending = [
+            account for account in self._accounts.values() if not account.started
+        ]
+        results = await asyncio.gather(
+            *(
+                self._start_account(account, index * self._startup_interval)
+                for index, account in enumerate(pending)
+            )
+        )
+        return {
+            account.config.key: result
+            for account, result in zip(pending, results, strict=True)
+        }
+
+    async def _start_account(self, account: FleetAccount, delay: float) -> bool:
+        await asyncio.sleep(delay)
+        async with self._startup_semaphore:
+            account.error = None
+            try:
+                if not await account.auth.do_auth():
+                    LOGGER.error("Authentication failed for %s", account.config.key)
+                    return False
+                if not await account.manager.fetch_appliances():
+                    LOGGER.error("No appliances found for %s", account.config.key)
+                    return False
+                await account.manager.connect()
+            except Exception as ex:
+                LOGGER.exception("Starting %s failed", account.config.key)
+                account.error = ex
+                return False
+        account.started = True
+        self._index(account)
+        return True
+
+    async def refresh_account(self, key: str) -> bool:
+        """Rediscover the appliances of an account and update the index"""
+        account = self._accounts[key]
+        result = await account.manager.fetch_appliances()
+        self._index(account)
+        return result
+
+    async def stop(self):
+        """Stop every account, and close the session if the fleet created it"""
+        await asyncio.gather(
+            *(
+                account.manager.disconnect()
+                for account in self._accounts.values()
+                if account.started
+            )
+        )
+        for account in self._accounts.values():
+            account.started = False
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _index(self, account: FleetAccount):
+        self._unindex(account)
+        appliances = account.manager.all_appliances
+        for said, appliance in appliances.items():
+            other = self._appliance_accounts.get(said)
+            if other is not None and other != account.config.key:
+                LOGGER.warning(
+                    "%s is shared by %s and %s", said, other, account.config.key
+                )
+            self._appliances[said] = appliance
+            self._appliance_accounts[said] = account.config.key
+        account.saids = set(appliances)
+
+    def _unindex(self, account: FleetAccount):
+        for said in account.saids:
+            if self._appliance_accounts.get(said) == account.config.key:
+                del self._appliances[said]
+                del self._appliance_accounts[said]
+        account.saids = set()
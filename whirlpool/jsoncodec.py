@@ -0,0 +1,81 @@
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class JsonCodec:
+    """JSON decoder/encoder pair. `loads` accepts both bytes and str."""
+
+    name: str
+    loads: Callable[[bytes | str], Any]
+    dumps: Callable[[Any], bytes]
+
+
+def _json_codec() -> JsonCodec:
+    return JsonCodec(
+        name="json",
+        loads=json.loads,
+        dumps=lambda obj: json.dumps(obj, separators=(",", ":")).encode(),
+    )
+
+
+def _orjson_codec() -> JsonCodec:
+    import orjson  # pyright: ignore[reportMissingImports]
+
+    return JsonCodec(name="orjson", loads=orjson.loads, dumps=orjson.dumps)
+
+
+def _msgspec_codec() -> JsonCodec:
+    import msgspec  # pyright: ignore[reportMissingImports]
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+    return JsonCodec(name="msgspec", loads=decoder.decode, dumps=encoder.encode)
+
+
+# In order of preference
+CODEC_FACTORIES: dict[str, Callable[[], JsonCodec]] = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "json": _json_codec,
+}
+
+
+def create_codec(name: str | None = None) -> JsonCodec:
+    """Create the named codec, or the fastest installed one if no name is given"""
+    if name is not None:
+        return CODEC_FACTORIES[name]()
+
+    for factory in CODEC_FACTORIES.values():
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return _json_codec()
+
+
+_codec = create_codec()
+LOGGER.debug("Using %s JSON codec", _codec.name)
+
+
+def get_codec() -> JsonCodec:
+    return _codec
+
+
+def set_codec(codec: JsonCodec | str | None = None):
+    """Select the codec used by the library. None picks the fastest installed."""
+    global _codec
+    _codec = codec if isinstance(codec, JsonCodec) else create_codec(codec)
+
+
+def loads(data: bytes | str) -> Any:
+    return _codec.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    return _codec.dumps(obj)
@@ -0,0 +1,194 @@
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+
+# Upper bounds, in seconds, of the buckets for in-process work like parsing
+PROCESSING_TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, math.inf)
+
+
+class Histogram:
+    """Fixed-bucket histogram"""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * len(self.bounds)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the `pct` percentile"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts, strict=True):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "buckets": {
+                str(bound): count
+                for bound, count in zip(self.bounds, self.counts, strict=True)
+            },
+        }
+
+
+@dataclass
+class EndpointMetrics:
+    """Outcome counters and latency of the requests to one endpoint"""
+
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    bytes_received: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+    latency: Histogram = field(default_factory=Histogram)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "bytes_received": self.bytes_received,
+            "statuses": dict(self.statuses),
+            "latency": self.latency.as_dict(),
+        }
+
+
+class RequestMetrics:
+    """Collects per-endpoint metrics of REST requests.
+
+    Endpoints are the logical URL families of BackendSelector, e.g.
+    `appliance_data`, so requests for different appliances are aggregated.
+    """
+
+    def __init__(self):
+        self._endpoints: dict[str, EndpointMetrics] = {}
+
+    @property
+    def endpoints(self) -> dict[str, EndpointMetrics]:
+        return self._endpoints
+
+    def get(self, endpoint: str) -> EndpointMetrics | None:
+        return self._endpoints.get(endpoint)
+
+    def record(
+        self,
+        endpoint: str,
+        latency: float,
+        attempts: int,
+        status: int | None = None,
+        bytes_received: int = 0,
+    ):
+        """Record a request. A `status` of None means it failed with an error."""
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = EndpointMetrics()
+        metrics.requests += 1
+        metrics.retries += attempts - 1
+        metrics.bytes_received += bytes_received
+        metrics.latency.observe(latency)
+        if status is None:
+            metrics.errors += 1
+        else:
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def reset(self):
+        self._endpoints = {}
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics as JSON-serializable data"""
+        return {name: metrics.as_dict() for name, metrics in self._endpoints.items()}
+
+
+@dataclass
+class DispatchMetrics:
+    """Counters of the event dispatch queue"""
+
+    enqueued: int = 0
+    dispatched: int = 0
+    dropped: int = 0
+    errors: int = 0
+    depth: int = 0
+    max_depth: int = 0
+    # Time events spent waiting in the queue
+    queue_latency: Histogram = field(default_factory=Histogram)
+    # Time spent handling each event
+    dispatch_time: Histogram = field(
+        default_factory=lambda: Histogram(PROCESSING_TIME_BUCKETS)
+    )
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "enqueued": self.enqueued,
+            "dispatched": self.dispatched,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "queue_latency": self.queue_latency.as_dict(),
+            "dispatch_time": self.dispatch_time.as_dict(),
+        }
+
+
+@dataclass
+class EventSocketMetrics:
+    """Counters of one event socket connection"""
+
+    subscriptions: int = 0
+    connects: int = 0
+    reconnects: int = 0
+    # Seconds spent reconnecting after established connections were lost
+    downtime: float = 0.0
+    connected: bool = False
+    messages: int = 0
+    bytes_received: int = 0
+    frames_parsed: int = 0
+    # Messages that could not be parsed or had an unexpected type
+    messages_dropped: int = 0
+    events: int = 0
+    # Time spent parsing each websocket message
+    parse_time: Histogram = field(
+        default_factory=lambda: Histogram(PROCESSING_TIME_BUCKETS)
+    )
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "subscriptions": self.subscriptions,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "downtime": self.downtime,
+            "connected": self.connected,
+            "messages": self.messages,
+            "bytes_received": self.bytes_received,
+            "frames_parsed": self.frames_parsed,
+            "messages_dropped": self.messages_dropped,
+            "events": self.events,
+            "parse_time": self.parse_time.as_dict(),
+        }
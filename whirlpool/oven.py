@@ -211,17 +211,15 @@ class Oven(Appliance):
         )
 
     def get_display_brightness_percent(self) -> int | None:
-        brightness = self._get_attribute(ATTR_DISPLAY_BRIGHTNESS)
-        return int(brightness) if brightness is not None else None
+        return self._get_int_attribute(ATTR_DISPLAY_BRIGHTNESS)
 
     async def set_display_brightness_percent(self, pct: int) -> bool:
         return await self.send_attributes({ATTR_DISPLAY_BRIGHTNESS: str(pct)})
 
     def get_cook_time(self, cavity: Cavity = Cavity.Upper):
-        time = self._get_attribute(
+        return self._get_int_attribute(
             CAVITY_PREFIX_MAP[cavity] + "_" + ATTR_POSTFIX_COOK_TIME
         )
-        return int(time) if time is not None else None
 
     def get_control_locked(self):
         return self.attr_value_to_bool(self._get_attribute(ATTR_CONTROL_LOCK))
@@ -0,0 +1,74 @@
+import random
+from dataclasses import dataclass
+from enum import Enum
+from typing import Protocol
+
+RECONNECT_COUNT = 3
+RECONNECT_SHORT_DELAY = 30
+RECONNECT_LONG_DELAY = 60 * 4
+GOING_AWAY_DELAY = (60 * 5) - RECONNECT_SHORT_DELAY
+
+
+class DisconnectReason(Enum):
+    Error = 0
+    GoingAway = 1
+    Unauthorized = 2
+
+
+class ReconnectStrategy(Protocol):
+    def delay(self, attempt: int, reason: DisconnectReason) -> float:
+        """Seconds to wait before reconnection `attempt` (0-based).
+
+        `attempt` counts the reconnections since the last established session.
+        """
+        ...
+
+
+@dataclass(frozen=True, kw_only=True)
+class FixedReconnectStrategy:
+    """Fixed delays: a short one, plus a long one after `count` failed attempts.
+
+    Going away (server restart) adds `going_away_delay`.
+    """
+
+    short_delay: float = RECONNECT_SHORT_DELAY
+    long_delay: float = RECONNECT_LONG_DELAY
+    going_away_delay: float = GOING_AWAY_DELAY
+    count: int = RECONNECT_COUNT
+
+    def delay(self, attempt: int, reason: DisconnectReason) -> float:
+        delay = self.short_delay
+        if attempt >= self.count:
+            delay += self.long_delay
+        if reason is DisconnectReason.GoingAway:
+            delay += self.going_away_delay
+        return delay
+
+
+@dataclass(frozen=True, kw_only=True)
+class ExponentialReconnectStrategy:
+    """Fast first retry, then exponential backoff with full jitter.
+
+    Jitter spreads the reconnections of many clients, so they do not hit a
+    restarted backend in lockstep.
+    """
+
+    first_delay: float = 1
+    base_delay: float = 5
+    max_delay: float = 5 * 60
+    # Lower bound of the backoff window when the server is going away
+    going_away_delay: float = 60
+    jitter: bool = True
+
+    def delay(self, attempt: int, reason: DisconnectReason) -> float:
+        if attempt == 0 and reason is not DisconnectReason.GoingAway:
+            delay = self.first_delay
+        else:
+            exponent = min(max(attempt - 1, 0), 32)
+            delay = min(self.base_delay * 2**exponent, self.max_delay)
+        if reason is DisconnectReason.GoingAway:
+            delay = max(delay, self.going_away_delay)
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+DEFAULT_RECONNECT_STRATEGY = ExponentialReconnectStrategy()
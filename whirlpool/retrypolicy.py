@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+import async_timeout
+from multidict import CIMultiDictProxy
+
+from . import jsoncodec
+from .metrics import RequestMetrics
+
+if TYPE_CHECKING:
+    from .auth import Auth
+
+LOGGER = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class RestResponse:
+    """Status, headers and body of a completed REST request"""
+
+    status: int
+    headers: CIMultiDictProxy[str]
+    body: bytes
+    attempts: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+    def json(self) -> Any:
+        return jsoncodec.loads(self.body)
+
+    def text(self) -> str:
+        return self.body.decode(errors="replace")
+
+
+@dataclass(frozen=True, kw_only=True)
+class RetryPolicy:
+    """How REST requests are retried.
+
+    Retryable statuses, timeouts and connection errors are retried with
+    exponential backoff. A 401 renews the access token and retries right away.
+    """
+
+    attempts: int = 3
+    base_delay: float = 1
+    max_delay: float = 60
+    jitter: bool = True
+    # Deadline for a single attempt, including reading the body
+    attempt_timeout: float = 30
+    retry_statuses: frozenset[int] = RETRYABLE_STATUSES
+    respect_retry_after: bool = True
+    # Caps the attempts in flight across everything using this policy
+    limiter: asyncio.Semaphore | None = field(default=None, compare=False)
+
+    def __post_init__(self):
+        if self.attempts < 1:
+            raise ValueError("RetryPolicy needs at least one attempt")
+
+    def backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        """Seconds to wait before retrying after the failed `attempt` (0-based)"""
+        if self.respect_retry_after and retry_after:
+            delay = parse_retry_after(retry_after)
+            if delay is not None:
+                return min(delay, self.max_delay)
+
+        delay = min(self.base_delay * 2**attempt, self.max_delay)
+        return random.uniform(0, delay) if self.jitter else delay
+
+    async def request(
+        self,
+        session: aiohttp.ClientSession,
+        method: str,
+        url: str,
+        *,
+        auth: Auth | None = None,
+        headers: dict[str, str] | None = None,
+        endpoint: str | None = None,
+        metrics: RequestMetrics | None = None,
+        **kwargs: Any,
+    ) -> RestResponse:
+        """Send a request, retrying according to the policy.
+
+        With `auth`, authorization headers are created for every attempt and
+        the token is renewed when the backend rejects it. Returns the last
+        response, or raises the last error if the final attempt failed with one.
+
+        With `metrics`, the outcome is recorded under `endpoint`.
+        """
+        start = time.monotonic()
+        try:
+            response = await self._request(
+                session, method, url, auth=auth, headers=headers, **kwargs
+            )
+        except Exception:
+            if metrics is not None:
+                metrics.record(endpoint or url, time.monotonic() - start, self.attempts)
+            raise
+
+        if metrics is not None:
+            metrics.record(
+                endpoint or url,
+                time.monotonic() - start,
+                response.attempts,
+                response.status,
+                len(response.body),
+            )
+        return response
+
+    async def _request(
+        self,
+        session: aiohttp.ClientSession,
+        method: str,
+        url: str,
+        *,
+        auth: Auth | None,
+        headers: dict[str, str] | None,
+        **kwargs: Any,
+    ) -> RestResponse:
+        for attempt in range(self.attempts):
+            last_attempt = attempt == self.attempts - 1
+            token = auth.get_access_token() if auth else None
+            request_headers = {
+                **(auth.create_headers() if auth else {}),
+                **(headers or {}),
+            }
+            try:
+                async with (
+                    self.limiter or nullcontext(),
+                    async_timeout.timeout(self.attempt_timeout),
+                ):
+                    async with session.request(
+                        method, url, headers=request_headers, **kwargs
+                    ) as r:
+                        response = RestResponse(
+                            r.status, r.headers, await r.read(), attempt + 1
+                        )
+            except (aiohttp.ClientError, TimeoutError) as ex:
+                if last_attempt:
+                    raise
+                delay = self.backoff(attempt)
+                LOGGER.warning(
+                    "%s %s failed (%r), retrying in %.1fs", method, url, ex, delay
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if response.ok or last_attempt:
+                return response
+
+            if response.status == 401 and auth is not None:
+                LOGGER.warning("%s %s unauthorized, renewing token", method, url)
+                await auth.renew_access_token(token)
+                continue
+
+            if response.status not in self.retry_statuses:
+                return response
+
+            delay = self.backoff(attempt, response.headers.get("Retry-After"))
+            LOGGER.warning(
+                "%s %s failed (%s), retrying in %.1fs",
+                method,
+                url,
+                response.status,
+                delay,
+            )
+            await asyncio.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+
+def parse_retry_after(value: str) -> float | None:
+    """Parse a Retry-After header, given either in seconds or as an HTTP date"""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except ValueError:
+        return None
+    return max(0.0, retry_date.timestamp() - datetime.now().timestamp())
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
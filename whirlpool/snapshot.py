@@ -0,0 +1,81 @@
+import os
+import time
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from . import jsoncodec
+from .types import ApplianceInfo
+
+# Bumped when the snapshot layout changes; other versions are not restored
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotFormatError(Exception):
+    """Exception for files that are not valid appliance snapshots."""
+
+
+@dataclass(frozen=True, slots=True)
+class ApplianceSnapshot:
+    info: ApplianceInfo
+    # Attributes in the backend's JSON shape, as returned by AttributeStore
+    attributes: dict[str, dict[str, Any]]
+    # Unix time the attributes were last known to be current
+    updated_at: float
+
+
+def write_snapshot(path: str | Path, snapshots: Iterable[ApplianceSnapshot]):
+    """Write a snapshot atomically, so a crash never leaves a partial file"""
+    path = Path(path)
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "created": time.time(),
+        "appliances": [
+            {
+                "info": asdict(snapshot.info),
+                "attributes": snapshot.attributes,
+                "updated_at": snapshot.updated_at,
+            }
+            for snapshot in snapshots
+        ],
+    }
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(jsoncodec.dumps(data))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _check_attributes(attributes: Any):
+    if not isinstance(attributes, dict):
+        raise TypeError("attributes must be an object")
+    for name, attr in attributes.items():
+        if not isinstance(attr, dict) or not attr.keys() >= {"value", "updateTime"}:
+            raise TypeError(f"invalid attribute {name}")
+
+
+def read_snapshot(path: str | Path) -> list[ApplianceSnapshot]:
+    """Read a snapshot written by write_snapshot"""
+    try:
+        data = jsoncodec.loads(Path(path).read_bytes())
+        version = data["version"]
+    except (ValueError, TypeError, KeyError) as ex:
+        raise SnapshotFormatError(f"{path} is not an appliance snapshot") from ex
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotFormatError(f"Unsupported snapshot version {version}")
+    try:
+        snapshots = [
+            ApplianceSnapshot(
+                ApplianceInfo(**appliance["info"]),
+                appliance["attributes"],
+                appliance["updated_at"],
+            )
+            for appliance in data["appliances"]
+        ]
+        for snapshot in snapshots:
+            _check_attributes(snapshot.attributes)
+    except (TypeError, KeyError) as ex:
+        raise SnapshotFormatError(f"Invalid appliance in snapshot {path}") from ex
+    return snapshots
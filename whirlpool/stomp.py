@@ -0,0 +1,141 @@
+from dataclasses import dataclass, field
+
+FRAME_TERMINATOR = "\0"
+
+# Header values of these frames are not escaped (STOMP 1.2)
+UNESCAPED_COMMANDS = frozenset({"CONNECT", "CONNECTED"})
+
+HEADER_ESCAPES = {"\\n": "\n", "\\r": "\r", "\\c": ":", "\\\\": "\\"}
+
+
+class StompParseError(Exception):
+    """Exception for frames that do not follow the STOMP protocol."""
+
+
+@dataclass(slots=True)
+class StompFrame:
+    command: str
+    headers: dict[str, str] = field(default_factory=dict)
+    body: str = ""
+
+
+def encode_frame(command: str, headers: dict[str, str], body: str = "") -> str:
+    """Encode a frame, including its terminating NULL character"""
+    header_lines = "".join(f"{name}:{value}\n" for name, value in headers.items())
+    return f"{command}\n{header_lines}\n{body}{FRAME_TERMINATOR}"
+
+
+def _unescape_header(value: str) -> str:
+    if "\\" not in value:
+        return value
+    result = []
+    i = 0
+    while i < len(value):
+        if value[i] == "\\":
+            escape = value[i : i + 2]
+            if escape not in HEADER_ESCAPES:
+                raise StompParseError(f"Invalid header escape {escape!r}")
+            result.append(HEADER_ESCAPES[escape])
+            i += 2
+        else:
+            result.append(value[i])
+            i += 1
+    return "".join(result)
+
+
+class StompParser:
+    """Incremental STOMP 1.2 frame parser.
+
+    Websocket messages are fed as they are received. A message may carry
+    several frames, and a frame may be split across messages; the incomplete
+    tail is buffered until the rest arrives.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    @property
+    def buffered(self) -> int:
+        """Number of characters waiting for the rest of their frame"""
+        return len(self._buffer)
+
+    def reset(self):
+        self._buffer = ""
+
+    def feed(self, data: str | bytes) -> list[StompFrame]:
+        """Parse `data` and return the frames completed by it"""
+        if isinstance(data, bytes):
+            data = data.decode()
+        buffer = self._buffer + data if self._buffer else data
+
+        frames: list[StompFrame] = []
+        pos = 0
+        size = len(buffer)
+        while pos < size:
+            # Heart-beats are bare EOLs between frames
+            if buffer[pos] in "\r\n":
+                pos += 1
+                continue
+
+            frame, end = self._parse_frame(buffer, pos)
+            if frame is None:
+                break
+            frames.append(frame)
+            pos = end
+
+        self._buffer = buffer[pos:] if pos < size else ""
+        return frames
+
+    def _parse_frame(self, buffer: str, pos: int) -> tuple[StompFrame | None, int]:
+        # The headers end with a blank line, which may use CRLF
+        headers_end = buffer.find("\n\n", pos)
+        crlf_end = buffer.find("\n\r\n", pos, headers_end if headers_end >= 0 else None)
+        if crlf_end >= 0:
+            headers_end, body_start = crlf_end, crlf_end + 3
+        elif headers_end >= 0:
+            body_start = headers_end + 2
+        else:
+            return None, pos
+
+        lines = buffer[pos:headers_end].split("\n")
+        command = lines[0].rstrip("\r")
+        escaped = command not in UNESCAPED_COMMANDS
+        headers: dict[str, str] = {}
+        for line in lines[1:]:
+            name, sep, value = line.rstrip("\r").partition(":")
+            if not sep:
+                raise StompParseError(f"Invalid header line {line!r}")
+            if escaped:
+                name = _unescape_header(name)
+                value = _unescape_header(value)
+            # Only the first occurrence of a repeated header is used
+            headers.setdefault(name, value)
+
+        content_length = headers.get("content-length")
+        if content_length is None:
+            body_end = buffer.find(FRAME_TERMINATOR, body_start)
+            if body_end < 0:
+                return None, pos
+        else:
+            body_end = self._find_body_end(buffer, body_start, int(content_length))
+            if body_end < 0:
+                return None, pos
+            if buffer[body_end] != FRAME_TERMINATOR:
+                raise StompParseError("Frame body longer than its content-length")
+
+        return StompFrame(command, headers, buffer[body_start:body_end]), body_end + 1
+
+    def _find_body_end(self, buffer: str, start: int, length: int) -> int:
+        """Index right after `length` octets of body, or -1 if incomplete"""
+        end = start + length
+        # content-length counts UTF-8 octets, which match characters for ASCII
+        if end < len(buffer) and buffer[start:end].isascii():
+            return end
+
+        encoded = buffer[start:].encode()
+        if len(encoded) <= length:
+            return -1
+        try:
+            return start + len(encoded[:length].decode())
+        except UnicodeDecodeError as ex:
+            raise StompParseError("content-length splits a character") from ex